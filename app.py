@@ -5,14 +5,47 @@ Provides a web interface for uploading PO files and visualizing routes.
 
 import os
 import json
+import time
 import uuid
-import shutil
-from glob import glob
+import logging
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template, send_from_directory, redirect, url_for
+from flask import Flask, request, jsonify, render_template, send_from_directory, redirect, url_for, Response
 from werkzeug.utils import secure_filename
 
+from vehi_rout.config import MAX_TIME_PER_VEHICLE
 from vehi_rout.controller import VRPController
+from vehi_rout.core.job_registry import JobRegistry
+from vehi_rout.core.log_config import configure_logging
+from vehi_rout.core.progress import ProgressRegistry
+from vehi_rout.core.cancellation import CancellationToken, watch_cancellation
+from vehi_rout.core.metrics import (
+    current_job_timings,
+    metrics_snapshot,
+    metrics_updates,
+    record_job_finished,
+    render_metrics,
+    timed,
+    track_job
+)
+from vehi_rout.core.batch import make_scenario, run_batch, COMPARISON_FILE
+from vehi_rout.utils.archive_utils import stream_zip
+from vehi_rout.utils.data_utils import (
+    get_demand_df,
+    get_master_data,
+    get_spatial_index,
+    orders_to_demand_df,
+    preload_master_data
+)
+from vehi_rout.utils.helper_utils import fleet_limits
+from vehi_rout.utils.matrix_update import start_pending_update
+from vehi_rout.utils.route_utils import summarize_routes
+
+# Route package log records through the background log writer
+configure_logging()
+# A child of the package logger, so the app's records use the same writer
+logger = logging.getLogger('vehi_rout.app')
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='static', template_folder='templates')
@@ -22,43 +55,94 @@ app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'output'
 app.config['ALLOWED_EXTENSIONS'] = {'csv'}
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
+app.config['JOB_DB'] = os.path.join(app.config['UPLOAD_FOLDER'], 'jobs.db')
+app.config['JOBS_PER_PAGE'] = 20
+app.config['SOLVER_WORKERS'] = int(os.environ.get('SOLVER_WORKERS', 2))
+app.config['PROGRESS_HEARTBEAT_SECONDS'] = 15
+# Seconds between two reads of a job's stored progress events by a progress stream
+app.config['PROGRESS_POLL_SECONDS'] = 0.5
+app.config['DEFAULT_MATRIX_PATH'] = 'data/master/osrm_distance_matrix.csv'
+app.config['DEFAULT_GPS_PATH'] = 'data/master/master_gps.csv'
+app.config['DEFAULT_DURATION_PATH'] = 'data/master/osrm_duration_matrix.csv'
+# Extend the master matrices in the background when a PO has stores missing from them
+app.config['UPDATE_PENDING_STORES'] = os.environ.get('UPDATE_PENDING_STORES', '1') == '1'
+# JSON solves with at most this many orders run synchronously; larger ones are queued
+app.config['SYNC_SOLVE_MAX_ORDERS'] = int(os.environ.get('SYNC_SOLVE_MAX_ORDERS', 150))
+app.config['SYNC_SOLVE_TIME_BUDGET'] = 10
+# Worker processes per batch; 0 uses all CPUs
+app.config['BATCH_WORKERS'] = int(os.environ.get('BATCH_WORKERS', 0))
+# Parse the default master data when the app is created, before a server forks its workers
+app.config['PRELOAD_MASTER_DATA'] = os.environ.get('PRELOAD_MASTER_DATA', '1') == '1'
 
 # Ensure upload and output directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 
+# Job registry; job folders created before the registry existed are imported once
+job_registry = JobRegistry(app.config['JOB_DB'])
+if job_registry.count() == 0:
+    job_registry.import_job_folders(app.config['UPLOAD_FOLDER'])
+
 # Global variables
-controller = None
 current_job_id = None
 current_results = {}
 
-def create_output_directories(output_folder):
-    """Create output directories for the job.
+# Background solver and the progress channels of the jobs it runs. Events are
+# also stored in the job registry, so any server process can stream them
+solver_executor = ThreadPoolExecutor(max_workers=app.config['SOLVER_WORKERS'])
+progress_channels = ProgressRegistry(on_publish=job_registry.add_event)
 
-    Args:
-        output_folder: Path to the job output folder
-    """
-    os.makedirs(os.path.join(output_folder, 'summaries'), exist_ok=True)
-    os.makedirs(os.path.join(output_folder, 'csv'), exist_ok=True)
-    os.makedirs(os.path.join(output_folder, 'maps'), exist_ok=True)
+# Registry entry of this process's metrics; renewed in a forked child process
+_process_metrics = {'pid': None, 'process_id': None, 'updates': None}
+
+def save_process_metrics():
+    """Store the metrics of this process in the job registry if they changed since the last call.
 
-def copy_output_files(output_folder):
-    """Copy output files to the job output folder using platform-independent code.
+    /metrics adds up the stored metrics of all server processes.
+    """
+    if _process_metrics['pid'] != os.getpid():
+        _process_metrics.update(pid=os.getpid(), process_id=f'{os.getpid()}-{uuid.uuid4().hex}', updates=None)
+    updates = metrics_updates()
+    if updates != _process_metrics['updates']:
+        job_registry.save_metrics(_process_metrics['process_id'], metrics_snapshot())
+        _process_metrics['updates'] = updates
+
+@app.after_request
+def save_request_metrics(response):
+    """Store the metrics recorded while serving a request."""
+    save_process_metrics()
+    return response
+
+def save_job_info(job_folder, job_info, filename='job_info.json'):
+    """Write job_info.json for a job.
 
     Args:
-        output_folder: Path to the job output folder
+        job_folder: Path to the job upload folder
+        job_info: Job information dictionary
+        filename: Name of the info file
     """
-    # Copy summaries
-    for file in glob('output/summaries/*'):
-        shutil.copy2(file, os.path.join(output_folder, 'summaries', os.path.basename(file)))
+    with open(os.path.join(job_folder, filename), 'w') as f:
+        json.dump(job_info, f)
 
-    # Copy CSV files
-    for file in glob('output/csv/*'):
-        shutil.copy2(file, os.path.join(output_folder, 'csv', os.path.basename(file)))
+def set_job_status(job_folder, job_info, status, **results):
+    """Move a job to a new status in job_info.json and the job registry.
 
-    # Copy map files
-    for file in glob('output/maps/*'):
-        shutil.copy2(file, os.path.join(output_folder, 'maps', os.path.basename(file)))
+    Args:
+        job_folder: Path to the job upload folder
+        job_info: Job information dictionary
+        status: New job status
+        **results: Result statistics stored in the registry
+    """
+    job_info['status'] = status
+    if 'error' in results:
+        job_info['error'] = results['error']
+    timings = current_job_timings()
+    if timings is not None:
+        job_info['timing'] = timings.as_dict()
+    if status in ('completed', 'failed', 'cancelled'):
+        record_job_finished(status)
+    save_job_info(job_folder, job_info)
+    job_registry.update_status(job_info['job_id'], status, job_info=job_info, **results)
 
 def allowed_file(filename):
     """Check if the file extension is allowed."""
@@ -77,7 +161,7 @@ def jobs():
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Handle file upload and initialize the routing process."""
-    global controller, current_job_id
+    global current_job_id
 
     # Check if files are provided
     if 'po_file' not in request.files:
@@ -92,6 +176,45 @@ def upload_file():
     if not allowed_file(po_file.filename):
         return jsonify({'error': 'File type not allowed'}), 400
 
+    # Get form parameters
+    try:
+        use_time = request.form.get('use_time') == 'true'
+        multi_day = request.form.get('multi_day') == 'true'
+        days = int(request.form.get('days', 1))
+        max_nodes = int(request.form.get('max_nodes', 300))
+        time_budget = request.form.get('time_budget', '').strip()
+        time_budget = float(time_budget) if time_budget else None
+
+        # Get vehicle configuration
+        num_vehicles = int(request.form.get('num_vehicles', 8))
+
+        # Get max visits per vehicle
+        max_visits = []
+        for i in range(num_vehicles):
+            visit_key = f'max_visits[{i}]'
+            if visit_key in request.form:
+                max_visits.append(int(request.form[visit_key]))
+            else:
+                max_visits.append(15)  # Default value
+
+        # Get max distance per vehicle
+        max_distance = []
+        for i in range(num_vehicles):
+            distance_key = f'max_distance[{i}]'
+            if distance_key in request.form:
+                max_distance.append(int(request.form[distance_key]))
+            else:
+                max_distance.append(100)  # Default value
+
+        # Get max time per vehicle; used when routing by time
+        max_time = default_max_time(num_vehicles)
+        for i in range(num_vehicles):
+            time_key = f'max_time[{i}]'
+            if time_key in request.form:
+                max_time[i] = float(request.form[time_key])
+    except ValueError as e:
+        return jsonify({'error': f'Invalid upload request: {str(e)}'}), 400
+
     # Generate a unique job ID
     current_job_id = str(uuid.uuid4())
     job_folder = os.path.join(app.config['UPLOAD_FOLDER'], current_job_id)
@@ -102,188 +225,516 @@ def upload_file():
     po_path = os.path.join(job_folder, po_filename)
     po_file.save(po_path)
 
-    # Get form parameters
-    use_time = request.form.get('use_time') == 'true'
-    multi_day = request.form.get('multi_day') == 'true'
-    days = int(request.form.get('days', 1))
-    max_nodes = int(request.form.get('max_nodes', 300))
-
-    # Get vehicle configuration
-    num_vehicles = int(request.form.get('num_vehicles', 8))
-
-    # Get max visits per vehicle
-    max_visits = []
-    for i in range(num_vehicles):
-        visit_key = f'max_visits[{i}]'
-        if visit_key in request.form:
-            max_visits.append(int(request.form[visit_key]))
-        else:
-            max_visits.append(15)  # Default value
-
-    # Get max distance per vehicle
-    max_distance = []
-    for i in range(num_vehicles):
-        distance_key = f'max_distance[{i}]'
-        if distance_key in request.form:
-            max_distance.append(int(request.form[distance_key]))
-        else:
-            max_distance.append(100)  # Default value
-
-    # Initialize controller
-    controller = VRPController(use_distance=not use_time)
-
     # Load data
-    matrix_path = request.form.get('matrix_path', 'data/master/osrm_distance_matrix.csv')
-    gps_path = request.form.get('gps_path', 'data/master/master_gps.csv')
-    
+    matrix_path = request.form.get('matrix_path', app.config['DEFAULT_MATRIX_PATH'])
+    gps_path = request.form.get('gps_path', app.config['DEFAULT_GPS_PATH'])
+
     # Create job info
     job_info = {
         'job_id': current_job_id,
         'po_file': po_filename,
+        'matrix_path': matrix_path,
+        'gps_path': gps_path,
         'use_time': use_time,
         'multi_day': multi_day,
         'days': days,
         'max_nodes': max_nodes,
+        'time_budget': time_budget,
         'num_vehicles': num_vehicles,
         'max_visits': max_visits,
         'max_distance': max_distance,
+        'max_time': max_time,
         'status': 'initialized',
         'timestamp': datetime.now().isoformat()
     }
 
+    # Load the job once to reject invalid input now; the server process that
+    # runs the job loads it again
     try:
-        controller.update_vehicle_config(
-            num_vehicles=job_info['num_vehicles'],
-            max_visits=job_info['max_visits'],
-            max_distance=job_info['max_distance']
-        )
-        controller.load_data(
-            demand_path=po_path,
-            matrix_path=matrix_path,
-            gps_path=gps_path
-        )
+        with track_job() as timings:
+            build_controller(job_folder, job_info)
+        job_info['timing'] = timings.as_dict()
+    except ValueError as e:
+        # Invalid input, e.g. a PO file without valid rows or required columns
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Error loading data: {str(e)}'}), 500
-    
-
-    # # Create job info
-    # job_info = {
-    #     'job_id': current_job_id,
-    #     'po_file': po_filename,
-    #     'use_time': use_time,
-    #     'multi_day': multi_day,
-    #     'days': days,
-    #     'max_nodes': max_nodes,
-    #     'num_vehicles': num_vehicles,
-    #     'max_visits': max_visits,
-    #     'max_distance': max_distance,
-    #     'status': 'initialized',
-    #     'timestamp': datetime.now().isoformat()
-    # }
-
-    # Save job info
-    with open(os.path.join(job_folder, 'job_info.json'), 'w') as f:
-        json.dump(job_info, f)
+
+    # Save job info and register the job
+    save_job_info(job_folder, job_info)
+    job_registry.upsert_job(job_info)
 
     # Redirect directly to the solve page instead of returning JSON
     return redirect(url_for('solve', job_id=current_job_id))
 
+def build_controller(job_folder, job_info, demand_df=None):
+    """Create a controller for a job and load its data.
+
+    Master data comes from the per-process cache, so only the PO is parsed per job.
+
+    Args:
+        job_folder: Path to the job upload folder
+        job_info: Job information dictionary
+        demand_df: Demand data to use instead of the job's PO file (optional)
+
+    Returns:
+        VRPController: Controller writing its artifacts to the job output folder
+    """
+    controller = VRPController(
+        use_distance=not job_info['use_time'],
+        output_dir=os.path.join(app.config['OUTPUT_FOLDER'], job_info['job_id'])
+    )
+    controller.update_vehicle_config(
+        num_vehicles=job_info['num_vehicles'],
+        max_visits=job_info['max_visits'],
+        max_distance=job_info['max_distance'],
+        max_time=job_info.get('max_time')
+    )
+    with timed('load'):
+        if demand_df is None:
+            demand_df = get_demand_df(today_path=os.path.join(job_folder, job_info['po_file']))
+        master_mat_df, master_gps_df = get_master_data(
+            job_info.get('matrix_path', app.config['DEFAULT_MATRIX_PATH']),
+            job_info.get('gps_path', app.config['DEFAULT_GPS_PATH'])
+        )
+        controller.set_data(demand_df, master_mat_df, master_gps_df)
+
+    # Stores routed with provisional estimates are queued; fetch their real entries
+    if controller.provisional_codes and app.config['UPDATE_PENDING_STORES']:
+        start_pending_update(
+            distance_path=app.config['DEFAULT_MATRIX_PATH'],
+            duration_path=app.config['DEFAULT_DURATION_PATH'],
+            gps_path=app.config['DEFAULT_GPS_PATH']
+        )
+    return controller
+
+def routes_payload(controller, all_visited_nodes, all_route_dicts):
+    """Build the JSON-serialisable route result of a solve.
+
+    Args:
+        controller: Controller that ran the solve
+        all_visited_nodes: List of sets of visited nodes, one per day
+        all_route_dicts: List of route dictionaries, one per day
+
+    Returns:
+        dict: Routes per day, the PO stores that were not visited and the
+            stores routed with provisional matrix estimates
+    """
+    return {
+        'days': [
+            {'day': day + 1, 'visited_nodes': sorted(visited), 'route_dict': route_dict}
+            for day, (visited, route_dict) in enumerate(zip(all_visited_nodes, all_route_dicts))
+        ],
+        'unvisited_nodes': controller.horizon.unvisited_codes(),
+        'provisional_codes': controller.provisional_codes
+    }
+
+def run_job(job_id, controller=None):
+    """Run the routing algorithm for a job and generate its results.
+
+    Runs on the solver executor; progress is published to the job's progress
+    channel. A cancellation requested through the job registry, from any
+    server process, stops the job.
+
+    Args:
+        job_id: Job identifier
+        controller: Controller already loaded with the job's data; the job is
+            loaded from its folder when not given (optional)
+    """
+    global current_results
+
+    job_folder = os.path.join(app.config['UPLOAD_FOLDER'], job_id)
+    with open(os.path.join(job_folder, 'job_info.json'), 'r') as f:
+        job_info = json.load(f)
+
+    # Stage timings of the solve are added to those recorded when the
+    # controller was loaded; a job loaded here starts a fresh timing block
+    with track_job(job_info.get('timing') if controller is not None else None):
+        progress = progress_channels.get(job_id)
+
+        # A job cancelled while it was still queued never starts
+        if job_registry.is_cancel_requested(job_id):
+            set_job_status(job_folder, job_info, 'cancelled')
+            progress.close('cancelled')
+            progress_channels.discard(job_id)
+            save_process_metrics()
+            return
+
+        cancel_token = CancellationToken()
+        stop_watching = watch_cancellation(
+            cancel_token,
+            lambda: job_registry.is_cancel_requested(job_id),
+            on_cancel=lambda: progress.publish('cancelling')
+        )
+
+        # Create output folder for this job
+        output_folder = os.path.join(app.config['OUTPUT_FOLDER'], job_id)
+        os.makedirs(output_folder, exist_ok=True)
+
+        try:
+            if controller is None:
+                progress.publish('load')
+                controller = build_controller(job_folder, job_info)
+            controller.progress = progress
+            controller.cancel_token = cancel_token
+            controller.time_budget = job_info.get('time_budget')
+
+            # Run the solver; maps are rendered once the routes are saved
+            if job_info['multi_day']:
+                all_visited_nodes, all_route_dicts = controller.solve_multi_day(
+                    total_days=job_info['days'],
+                    max_nodes=job_info['max_nodes']
+                )
+
+                # Store results
+                current_results = {
+                    'job_id': job_id,
+                    'multi_day': True,
+                    'days': job_info['days'],
+                    'num_vehicles': job_info['num_vehicles'],
+                    'max_visits': job_info['max_visits'],
+                    'max_distance': job_info['max_distance'],
+                    'all_visited_nodes': [list(nodes) for nodes in all_visited_nodes],
+                    'all_route_dicts': all_route_dicts,
+                    'timestamp': datetime.now().isoformat()
+                }
+
+            else:
+                visited_nodes, route_dict = controller.solve_single_day(
+                    day=0,
+                    max_nodes=job_info['max_nodes']
+                )
+                all_visited_nodes, all_route_dicts = [visited_nodes], [route_dict]
+
+                # Store results
+                current_results = {
+                    'job_id': job_id,
+                    'multi_day': False,
+                    'num_vehicles': job_info['num_vehicles'],
+                    'max_visits': job_info['max_visits'],
+                    'max_distance': job_info['max_distance'],
+                    'visited_nodes': list(visited_nodes),
+                    'route_dict': route_dict,
+                    'timestamp': datetime.now().isoformat()
+                }
+            stats = summarize_routes(all_route_dicts, all_visited_nodes,
+                                     controller.get_po_node_indices(), controller.use_distance)
+
+            # Keep the routes as JSON for API clients
+            payload = routes_payload(controller, all_visited_nodes, all_route_dicts)
+            with open(os.path.join(output_folder, 'routes.json'), 'w') as f:
+                json.dump(payload, f)
+
+            # Update job status; a cancelled job keeps the best plan found before it stopped
+            status = 'cancelled' if controller.cancelled else 'completed'
+            set_job_status(job_folder, job_info, status, **stats)
+
+            # Maps need the routing server; the saved routes stand if they cannot be drawn
+            if job_info.get('save_visualization', True):
+                try:
+                    for day, route_dict in enumerate(all_route_dicts):
+                        controller.render_maps(route_dict, day)
+                except Exception as e:
+                    logger.exception("Maps of job %s could not be rendered", job_id)
+                    job_info['map_error'] = str(e)
+                    save_job_info(job_folder, job_info)
+            progress.close(status, **stats)
+
+        except Exception as e:
+            # Update job status
+            set_job_status(job_folder, job_info, 'failed', error=str(e))
+            progress.close('failed', error=str(e))
+
+        finally:
+            # Progress streams read the events stored in the registry
+            stop_watching.set()
+            progress_channels.discard(job_id)
+            save_process_metrics()
+
+def queue_job(job_folder, job_info, controller=None):
+    """Mark a job as running and hand it to the solver executor.
+
+    Args:
+        job_folder: Path to the job upload folder
+        job_info: Job information dictionary
+        controller: Controller already loaded with the job's data (optional)
+    """
+    job_id = job_info['job_id']
+    set_job_status(job_folder, job_info, 'running')
+    # Events of an earlier run are dropped; the new run numbers its events from 1
+    job_registry.clear_events(job_id)
+    progress_channels.open(job_id).publish('queued')
+    solver_executor.submit(run_job, job_id, controller)
+
 @app.route('/solve/<job_id>', methods=['GET'])
 def solve(job_id):
-    """Run the routing algorithm and generate results."""
-    global controller, current_results
-
+    """Queue the routing algorithm for a job and show its progress."""
     # Check if job exists
     job_folder = os.path.join(app.config['UPLOAD_FOLDER'], job_id)
-    if not os.path.exists(job_folder):
+    if not os.path.exists(os.path.join(job_folder, 'job_info.json')):
         return jsonify({'error': 'Job not found'}), 404
 
     # Load job info
     with open(os.path.join(job_folder, 'job_info.json'), 'r') as f:
         job_info = json.load(f)
 
-    # Update job status
-    job_info['status'] = 'running'
-    with open(os.path.join(job_folder, 'job_info.json'), 'w') as f:
-        json.dump(job_info, f)
+    # A job that is already queued or running is not started twice; the
+    # registry is checked, since the job may run in another server process
+    if job_registry.get_job(job_id) is None:
+        job_registry.upsert_job(job_info)
+    if not job_registry.start_job(job_id):
+        return redirect(url_for('results', job_id=job_id))
 
-    # Create output folder for this job
-    output_folder = os.path.join(app.config['OUTPUT_FOLDER'], job_id)
-    os.makedirs(output_folder, exist_ok=True)
+    # Update job status and hand the job to the solver executor
+    queue_job(job_folder, job_info)
+
+    return redirect(url_for('results', job_id=job_id))
+
+def default_max_time(num_vehicles):
+    """Configured time limits sized to a fleet; vehicles past the configured list get its last limit.
+
+    Args:
+        num_vehicles: Number of vehicles
+
+    Returns:
+        list: Maximum time in minutes per vehicle
+    """
+    return fleet_limits(MAX_TIME_PER_VEHICLE, num_vehicles)
+
+def parse_vehicle_config(params):
+    """Read and validate the vehicle configuration of a JSON solve request.
+
+    Args:
+        params: Request JSON
+
+    Returns:
+        tuple: (num_vehicles, max_visits, max_distance, max_time)
+
+    Raises:
+        ValueError: If there is no vehicle, or a limit list is not one positive value per vehicle
+    """
+    num_vehicles = int(params.get('num_vehicles', 8))
+    if num_vehicles < 1:
+        raise ValueError("num_vehicles must be at least 1")
+    max_visits = [int(v) for v in params.get('max_visits', [15] * num_vehicles)]
+    max_distance = [int(v) for v in params.get('max_distance', [100] * num_vehicles)]
+    max_time = [float(v) for v in params.get('max_time', default_max_time(num_vehicles))]
+    for name, limits in (('max_visits', max_visits), ('max_distance', max_distance), ('max_time', max_time)):
+        if len(limits) != num_vehicles:
+            raise ValueError(f"{name} needs one value per vehicle ({num_vehicles})")
+        if any(limit <= 0 for limit in limits):
+            raise ValueError(f"{name} values must be positive")
+    return num_vehicles, max_visits, max_distance, max_time
+
+@app.route('/api/solve', methods=['POST'])
+def api_solve():
+    """Solve a routing problem given as JSON with inline orders.
+
+    Small single-day problems (up to SYNC_SOLVE_MAX_ORDERS orders) are solved
+    in the request and answered with the routes. Larger problems are queued as
+    a job and answered with 202 and the URLs to follow it.
+    """
+    params = request.get_json(silent=True)
+    if not isinstance(params, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
 
     try:
-        # Update controller configuration with vehicle parameters
-        # controller.update_vehicle_config(
-        #     num_vehicles=job_info['num_vehicles'],
-        #     max_visits=job_info['max_visits'],
-        #     max_distance=job_info['max_distance']
-        # )
-        
-        print(job_info['num_vehicles'])
-        print(job_info['max_visits'])
-        print(job_info['max_distance'])
-
-        # Run the solver
-        if job_info['multi_day']:
-            all_visited_nodes, all_route_dicts = controller.solve_multi_day(
-                total_days=job_info['days'],
-                max_nodes=job_info['max_nodes'],
-                save_visualization=True
-            )
-
-            # Store results
-            current_results = {
-                'job_id': job_id,
-                'multi_day': True,
-                'days': job_info['days'],
-                'num_vehicles': job_info['num_vehicles'],
-                'max_visits': job_info['max_visits'],
-                'max_distance': job_info['max_distance'],
-                'all_visited_nodes': [list(nodes) for nodes in all_visited_nodes],
-                'all_route_dicts': all_route_dicts,
-                'timestamp': datetime.now().isoformat()
-            }
-
-        else:
-            visited_nodes, route_dict = controller.solve_single_day(
-                day=0,
-                max_nodes=job_info['max_nodes'],
-                save_visualization=True
-            )
-
-            # Store results
-            current_results = {
-                'job_id': job_id,
-                'multi_day': False,
-                'num_vehicles': job_info['num_vehicles'],
-                'max_visits': job_info['max_visits'],
-                'max_distance': job_info['max_distance'],
-                'visited_nodes': list(visited_nodes),
-                'route_dict': route_dict,
-                'timestamp': datetime.now().isoformat()
-            }
-
-        # Create subdirectories in the job output folder
-        create_output_directories(output_folder)
-
-        # Copy output files to job output folder
-        copy_output_files(output_folder)
-
-        # Update job status
-        job_info['status'] = 'completed'
-        with open(os.path.join(job_folder, 'job_info.json'), 'w') as f:
-            json.dump(job_info, f)
+        demand_df = orders_to_demand_df(params.get('orders'))
+        num_vehicles, max_visits, max_distance, max_time = parse_vehicle_config(params)
+        time_budget = params.get('time_budget')
+        job_info = {
+            'job_id': str(uuid.uuid4()),
+            'po_file': 'orders.csv',
+            'matrix_path': app.config['DEFAULT_MATRIX_PATH'],
+            'gps_path': app.config['DEFAULT_GPS_PATH'],
+            'use_time': bool(params.get('use_time', False)),
+            'multi_day': bool(params.get('multi_day', False)),
+            'days': int(params.get('days', 1)),
+            'max_nodes': int(params['max_nodes']) if params.get('max_nodes') else None,
+            'time_budget': float(time_budget) if time_budget else None,
+            'num_vehicles': num_vehicles,
+            'max_visits': max_visits,
+            'max_distance': max_distance,
+            'max_time': max_time,
+            # API clients read the routes; queued jobs skip the maps
+            'save_visualization': False,
+            'status': 'initialized',
+            'timestamp': datetime.now().isoformat()
+        }
+        job_folder = os.path.join(app.config['UPLOAD_FOLDER'], job_info['job_id'])
+        with track_job() as timings:
+            controller = build_controller(job_folder, job_info, demand_df=demand_df)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid solve request: {str(e)}'}), 400
+
+    # Small single-day problems: solve now, without touching the disk
+    if not job_info['multi_day'] and len(demand_df) <= app.config['SYNC_SOLVE_MAX_ORDERS']:
+        controller.time_budget = job_info['time_budget'] or app.config['SYNC_SOLVE_TIME_BUDGET']
+        try:
+            with track_job(timings.as_dict()) as timings:
+                visited_nodes, route_dict = controller.solve_single_day(
+                    day=0,
+                    max_nodes=job_info['max_nodes'],
+                    save_reports=False
+                )
+        except ValueError as e:
+            return jsonify({'error': f'Invalid solve request: {str(e)}'}), 400
+        payload = routes_payload(controller, [visited_nodes], [route_dict])
+        return jsonify(dict(payload, status='completed', route_dict=route_dict, timing=timings.as_dict()))
+
+    # Larger problems: keep the orders with the job and queue it
+    job_info['timing'] = timings.as_dict()
+    os.makedirs(job_folder, exist_ok=True)
+    demand_df.to_csv(os.path.join(job_folder, job_info['po_file']), index=False)
+    save_job_info(job_folder, job_info)
+    job_registry.upsert_job(job_info)
 
-        return redirect(url_for('results', job_id=job_id))
+    queue_job(job_folder, job_info, controller)
+
+    job_id = job_info['job_id']
+    return jsonify({
+        'job_id': job_id,
+        'status': 'running',
+        'status_url': url_for('get_job', job_id=job_id),
+        'progress_url': url_for('job_progress', job_id=job_id),
+        'routes_url': url_for('job_routes', job_id=job_id)
+    }), 202
 
+def run_batch_job(batch_id):
+    """Solve the scenarios of a batch in worker processes.
+
+    Runs on the solver executor. Workers are started with 'spawn' since
+    forking the multi-threaded web server is not safe.
+
+    Args:
+        batch_id: Batch identifier
+    """
+    batch_folder = os.path.join(app.config['UPLOAD_FOLDER'], batch_id)
+    with open(os.path.join(batch_folder, 'batch_info.json'), 'r') as f:
+        batch_info = json.load(f)
+
+    batch_info['status'] = 'running'
+    save_job_info(batch_folder, batch_info, 'batch_info.json')
+    try:
+        comparison = run_batch(
+            batch_info['scenarios'],
+            matrix_path=batch_info['matrix_path'],
+            gps_path=batch_info['gps_path'],
+            output_dir=os.path.join(app.config['OUTPUT_FOLDER'], batch_id),
+            workers=app.config['BATCH_WORKERS'] or None,
+            mp_context='spawn'
+        )
+        batch_info['status'] = 'completed'
+        batch_info['failed'] = int((comparison['status'] == 'failed').sum())
     except Exception as e:
-        # Update job status
-        job_info['status'] = 'failed'
-        job_info['error'] = str(e)
-        with open(os.path.join(job_folder, 'job_info.json'), 'w') as f:
-            json.dump(job_info, f)
+        batch_info['status'] = 'failed'
+        batch_info['error'] = str(e)
+    save_job_info(batch_folder, batch_info, 'batch_info.json')
 
-        return jsonify({'error': f'Error solving routing problem: {str(e)}'}), 500
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """Solve many PO files in parallel and compare the results.
+
+    Takes several files in the 'po_files' field plus the same solve options as
+    /upload, shared by all files. The batch runs in the background; its status
+    and comparison are available from /api/batch/<batch_id>.
+    """
+    po_files = [f for f in request.files.getlist('po_files') if f.filename]
+    if not po_files:
+        return jsonify({'error': 'No PO files provided'}), 400
+    if not all(allowed_file(f.filename) for f in po_files):
+        return jsonify({'error': 'File type not allowed'}), 400
+
+    # Files are stored, and their scenarios named, by file name, so names must be unique
+    po_filenames = [secure_filename(f.filename) for f in po_files]
+    names = [os.path.splitext(filename)[0] for filename in po_filenames]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        return jsonify({'error': f"PO file names must be unique: {', '.join(duplicates)}"}), 400
+
+    batch_id = f'batch-{uuid.uuid4()}'
+    batch_folder = os.path.join(app.config['UPLOAD_FOLDER'], batch_id)
+    os.makedirs(batch_folder, exist_ok=True)
+
+    try:
+        time_budget = request.form.get('time_budget', '').strip()
+        max_nodes = request.form.get('max_nodes', '').strip()
+        num_vehicles = request.form.get('num_vehicles', '').strip()
+        options = {
+            'use_time': request.form.get('use_time') == 'true',
+            'multi_day': request.form.get('multi_day') == 'true',
+            'days': int(request.form.get('days', 1)),
+            'max_nodes': int(max_nodes) if max_nodes else None,
+            'time_budget': float(time_budget) if time_budget else None,
+            'num_vehicles': int(num_vehicles) if num_vehicles else None
+        }
+    except ValueError as e:
+        return jsonify({'error': f'Invalid batch request: {str(e)}'}), 400
+
+    scenarios = []
+    for po_file, po_filename in zip(po_files, po_filenames):
+        po_path = os.path.join(batch_folder, po_filename)
+        po_file.save(po_path)
+        scenarios.append(make_scenario(po_path, **options))
+
+    batch_info = {
+        'batch_id': batch_id,
+        'matrix_path': request.form.get('matrix_path', app.config['DEFAULT_MATRIX_PATH']),
+        'gps_path': request.form.get('gps_path', app.config['DEFAULT_GPS_PATH']),
+        'scenarios': scenarios,
+        'status': 'queued',
+        'timestamp': datetime.now().isoformat()
+    }
+    save_job_info(batch_folder, batch_info, 'batch_info.json')
+    solver_executor.submit(run_batch_job, batch_id)
+
+    return jsonify({
+        'batch_id': batch_id,
+        'status': 'queued',
+        'status_url': url_for('get_batch', batch_id=batch_id)
+    }), 202
+
+@app.route('/api/batch/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """Get the status of a batch and, once finished, its comparison."""
+    info_file = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(batch_id), 'batch_info.json')
+    if not os.path.exists(info_file):
+        return jsonify({'error': 'Batch not found'}), 404
+
+    with open(info_file, 'r') as f:
+        batch_info = json.load(f)
+
+    comparison_file = os.path.join(app.config['OUTPUT_FOLDER'], secure_filename(batch_id), COMPARISON_FILE)
+    if batch_info['status'] == 'completed' and os.path.exists(comparison_file):
+        comparison = pd.read_csv(comparison_file, dtype={'scenario': str})
+        batch_info['comparison'] = json.loads(comparison.to_json(orient='records'))
+        batch_info['download_url'] = url_for('download_job', job_id=batch_id)
+
+    return jsonify(batch_info)
+
+@app.route('/api/job/<job_id>/routes', methods=['GET'])
+def job_routes(job_id):
+    """Get the routes of a finished job as JSON."""
+    routes_file = os.path.join(app.config['OUTPUT_FOLDER'], secure_filename(job_id), 'routes.json')
+    if not os.path.exists(routes_file):
+        return jsonify({'error': 'Routes not available'}), 404
+
+    with open(routes_file, 'r') as f:
+        return jsonify(json.load(f))
+
+@app.route('/api/job/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Ask a queued or running job to stop.
+
+    The request is stored in the job registry, and the server process that
+    runs the job stops it within moments. The search keeps the best plan found
+    so far, if any; no further days are planned. The job is marked cancelled
+    once it has stopped.
+    """
+    if not job_registry.request_cancel(job_id):
+        return jsonify({'error': 'Job is not running'}), 409
+
+    return jsonify({'job_id': job_id, 'status': 'cancelling'}), 202
 
 @app.route('/results/<job_id>', methods=['GET'])
 def results(job_id):
@@ -297,9 +748,9 @@ def results(job_id):
     with open(os.path.join(job_folder, 'job_info.json'), 'r') as f:
         job_info = json.load(f)
 
-    # Check if job is completed
-    if job_info['status'] != 'completed':
-        return jsonify({'error': 'Job is not completed yet'}), 400
+    # Show live progress until the job has finished
+    if job_info['status'] not in ('completed', 'cancelled'):
+        return render_template('progress.html', job_id=job_id, job_info=job_info)
 
     # Get output files
     output_folder = os.path.join(app.config['OUTPUT_FOLDER'], job_id)
@@ -335,18 +786,169 @@ def get_file(job_id, file_type, filename):
     output_folder = os.path.join(app.config['OUTPUT_FOLDER'], job_id, file_type)
     return send_from_directory(output_folder, filename)
 
+@app.route('/download/<job_id>')
+def download_job(job_id):
+    """Stream all artifacts of a job as a zip archive."""
+    output_folder = os.path.join(app.config['OUTPUT_FOLDER'], secure_filename(job_id))
+    if not os.path.isdir(output_folder):
+        return jsonify({'error': 'Job not found'}), 404
+
+    return Response(
+        stream_zip(output_folder),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename=job_{job_id}.zip'}
+    )
+
 @app.route('/api/jobs', methods=['GET'])
 def list_jobs():
-    """List all jobs."""
-    jobs = []
-    for job_id in os.listdir(app.config['UPLOAD_FOLDER']):
-        job_folder = os.path.join(app.config['UPLOAD_FOLDER'], job_id)
-        if os.path.isdir(job_folder) and os.path.exists(os.path.join(job_folder, 'job_info.json')):
-            with open(os.path.join(job_folder, 'job_info.json'), 'r') as f:
-                job_info = json.load(f)
-                jobs.append(job_info)
+    """List jobs from the job registry, one page at a time.
+
+    Query parameters: page, per_page, status, from, to (ISO dates),
+    sort (timestamp, finished_at, status, duration) and order (asc, desc).
+    """
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = min(int(request.args.get('per_page', app.config['JOBS_PER_PAGE'])), 200)
+        jobs, total = job_registry.list_jobs(
+            page=page,
+            per_page=per_page,
+            status=request.args.get('status') or None,
+            date_from=request.args.get('from') or None,
+            date_to=request.args.get('to') or None,
+            sort=request.args.get('sort', 'timestamp'),
+            order=request.args.get('order', 'desc')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'jobs': jobs,
+        'total': total,
+        'page': page,
+        'per_page': per_page
+    })
+
+@app.route('/api/job/<job_id>/progress')
+def job_progress(job_id):
+    """Stream the progress of a job as Server-Sent Events."""
+    # A reconnecting browser sends the id of the last event it saw; anything
+    # else replays the stream from the start
+    try:
+        last_seq = max(int(request.headers.get('Last-Event-ID', 0) or 0), 0)
+    except ValueError:
+        last_seq = 0
+
+    def format_event(event):
+        return f"id: {event['seq']}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+
+    def stream():
+        # The job may run in another server process, so its events are read
+        # from the job registry
+        seq = last_seq
+        idle_since = time.monotonic()
+        while True:
+            events = job_registry.events_after(job_id, seq)
+            for event in events:
+                seq = event['seq']
+                yield format_event(event)
+                if event['stage'] == 'done':
+                    return
+
+            if not events:
+                # Nothing streams for the job, or its end was already seen:
+                # report the stored status once and finish
+                latest = job_registry.latest_event(job_id)
+                if latest is None or latest['stage'] == 'done':
+                    job = job_registry.get_job(job_id)
+                    status = job['status'] if job else 'unknown'
+                    yield format_event({'seq': seq + 1, 'stage': 'done', 'status': status})
+                    return
+                if time.monotonic() - idle_since >= app.config['PROGRESS_HEARTBEAT_SECONDS']:
+                    yield ': keep-alive\n\n'
+                    idle_since = time.monotonic()
+            else:
+                idle_since = time.monotonic()
+            time.sleep(app.config['PROGRESS_POLL_SECONDS'])
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def float_args(*names):
+    """Read required float query parameters.
+
+    Raises:
+        ValueError: If a parameter is missing or not a number
+    """
+    try:
+        return [float(request.args[name]) for name in names]
+    except (KeyError, ValueError):
+        raise ValueError(f"Query parameters {', '.join(names)} are required numbers")
+
+def stores_payload(stores):
+    """Build the JSON response of a store query from a DataFrame of stores."""
+    return jsonify({'stores': json.loads(stores.to_json(orient='records')), 'count': len(stores)})
+
+@app.route('/api/stores/nearest', methods=['GET'])
+def nearest_stores():
+    """Find the k nearest stores of a point.
 
-    return jsonify(jobs)
+    Query parameters: lat, lon and k (default 5).
+    """
+    try:
+        lat, lon = float_args('lat', 'lon')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        k = int(request.args.get('k', 5))
+    except ValueError:
+        k = 0
+    if k < 1:
+        return jsonify({'error': 'Query parameter k must be a positive integer'}), 400
+
+    index = get_spatial_index(app.config['DEFAULT_GPS_PATH'])
+    distances, positions = index.nearest(lat, lon, k=k)
+    return stores_payload(index.records(positions[0], distances[0]))
+
+@app.route('/api/stores/within', methods=['GET'])
+def stores_within():
+    """Find the stores within a radius of a point, nearest first.
+
+    Query parameters: lat, lon and radius_km.
+    """
+    try:
+        lat, lon, radius_km = float_args('lat', 'lon', 'radius_km')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not radius_km > 0:
+        return jsonify({'error': 'Query parameter radius_km must be positive'}), 400
+
+    index = get_spatial_index(app.config['DEFAULT_GPS_PATH'])
+    distances, positions = index.within_radius(lat, lon, radius_km)[0]
+    return stores_payload(index.records(positions, distances))
+
+@app.route('/api/stores/bbox', methods=['GET'])
+def stores_in_bbox():
+    """Find the stores inside a latitude/longitude box.
+
+    Query parameters: min_lat, min_lon, max_lat and max_lon.
+    """
+    try:
+        bounds = float_args('min_lat', 'min_lon', 'max_lat', 'max_lon')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    index = get_spatial_index(app.config['DEFAULT_GPS_PATH'])
+    return stores_payload(index.records(index.in_bbox(*bounds)))
+
+@app.route('/metrics')
+def metrics():
+    """Expose stage durations, solver results and cache hits in the Prometheus text format.
+
+    The metrics of all server processes are added up from the job registry.
+    """
+    save_process_metrics()
+    return Response(render_metrics(job_registry.load_metrics()),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/api/job/<job_id>', methods=['GET'])
 def get_job(job_id):
@@ -360,5 +962,24 @@ def get_job(job_id):
 
     return jsonify(job_info)
 
+def preload_default_master_data():
+    """Load the default master data and spatial index into this process's cache.
+
+    Run in the gunicorn master before it forks (see gunicorn.conf.py), it
+    lets the workers inherit the parsed data, so no job parses the matrix.
+    Run again on a reload, it swaps in the matrix files changed since.
+    """
+    preload_master_data(app.config['DEFAULT_MATRIX_PATH'], app.config['DEFAULT_GPS_PATH'])
+
+def create_app():
+    """Return the Flask app, preloading the default master data when PRELOAD_MASTER_DATA is set.
+
+    Returns:
+        Flask: The application, e.g. for `gunicorn 'app:create_app()'`
+    """
+    if app.config['PRELOAD_MASTER_DATA']:
+        preload_default_master_data()
+    return app
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5096)
+    create_app().run(debug=True, host='0.0.0.0', port=5096)
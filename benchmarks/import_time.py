@@ -0,0 +1,157 @@
+"""
+Import-time benchmark for the Vehicle Routing Problem.
+Imports each entry module in a fresh interpreter, records the best wall time
+over a few runs and the slowest modules reported by `python -X importtime`,
+and checks that the heavy optional dependencies (folium, requests, OR-Tools,
+SciPy) are not imported until they are used.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --max-ms 600 --output benchmarks/results/import_time.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Repository root, so the entry modules import from any folder
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported by the command line, the web app and the batch runner
+DEFAULT_MODULES = ['vehi_rout.controller', 'main', 'app']
+
+# Top-level packages that must be imported on first use, not at import time
+DEFERRED_PACKAGES = ['folium', 'requests', 'ortools', 'scipy']
+
+# Fresh interpreters started per module; the fastest run is reported
+DEFAULT_REPEATS = 5
+
+# Import time (ms) above which a module fails the benchmark
+DEFAULT_MAX_MS = 800
+
+# Slowest imported modules listed per entry module
+TOP_MODULES = 10
+
+# Imports the module, then prints its wall time and the packages it loaded
+PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'ms': elapsed * 1000, 'loaded': sorted({{name.split('.')[0] for name in sys.modules}})}}))
+"""
+
+
+def _run(args):
+    """Run a Python command from the repository root and return the completed process."""
+    result = subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed')
+    return result
+
+
+def measure_import(module, repeats=DEFAULT_REPEATS):
+    """
+    Time the import of a module in fresh interpreters.
+
+    Args:
+        module: Dotted module name
+        repeats: Number of interpreters to start
+
+    Returns:
+        dict: best and median wall time in ms, and the top-level packages loaded
+    """
+    runs = [json.loads(_run(['-c', PROBE.format(module=module)]).stdout.strip().splitlines()[-1])
+            for _ in range(repeats)]
+    times = sorted(run['ms'] for run in runs)
+    return {
+        'best_ms': round(times[0], 1),
+        'median_ms': round(times[len(times) // 2], 1),
+        'loaded': runs[0]['loaded']
+    }
+
+
+def slowest_imports(module, top=TOP_MODULES):
+    """
+    List the modules with the largest cumulative import time.
+
+    Args:
+        module: Dotted module name
+        top: Number of modules to return
+
+    Returns:
+        list: (module name, cumulative ms) pairs, slowest first
+    """
+    stderr = _run(['-X', 'importtime', '-c', f'import {module}']).stderr
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, total, name = line[len('import time:'):].split('|')
+        if total.strip().isdigit():
+            cumulative[name.strip()] = int(total) / 1000
+    return sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def run_suite(modules, repeats, max_ms):
+    """
+    Benchmark the import of each module.
+
+    Args:
+        modules: Dotted module names
+        repeats: Fresh interpreters per module
+        max_ms: Import time above which a module fails
+
+    Returns:
+        tuple: (results per module, list of failure messages)
+    """
+    results, failures = {}, []
+    for module in modules:
+        result = measure_import(module, repeats)
+        result['slowest'] = slowest_imports(module)
+        result['deferred_loaded'] = [package for package in DEFERRED_PACKAGES if package in result['loaded']]
+        results[module] = result
+
+        print(f"{module}: best {result['best_ms']:.0f} ms, median {result['median_ms']:.0f} ms")
+        for name, ms in result['slowest']:
+            print(f"  {ms:8.1f} ms  {name}")
+        if result['best_ms'] > max_ms:
+            failures.append(f"{module}: {result['best_ms']:.0f} ms > {max_ms:.0f} ms")
+        if result['deferred_loaded']:
+            failures.append(f"{module}: imports {', '.join(result['deferred_loaded'])} at import time")
+    return results, failures
+
+
+def main():
+    """Run the import-time benchmark from the command line."""
+    parser = argparse.ArgumentParser(description='Vehicle Routing import-time benchmark')
+    parser.add_argument('--modules', type=str, nargs='+', default=DEFAULT_MODULES,
+                        help='Modules to import')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                        help='Fresh interpreters per module; the fastest run is reported')
+    parser.add_argument('--max-ms', type=float, default=DEFAULT_MAX_MS,
+                        help='Import time above which a module fails; exits with status 1')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Result file to write (optional)')
+    args = parser.parse_args()
+
+    results, failures = run_suite(args.modules, args.repeats, args.max_ms)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if failures:
+        print(f"\n{len(failures)} import-time failure(s):")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print(f"All imports under {args.max_ms:.0f} ms without deferred packages")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+"""
+Benchmark suite for the Vehicle Routing Problem.
+Runs the end-to-end controller on each order file with fixed seeds and time
+budgets, records wall time, peak memory, per-stage timings and solution
+quality, and writes the results to JSON so runs can be compared over time.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --synthetic 2000 5000 10000 --time-budget 10
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/baseline.json --threshold 0.1
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Allow running the script from any folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vehi_rout.controller import VRPController
+from vehi_rout.core.log_config import configure_logging
+from vehi_rout.core.metrics import track_job
+from vehi_rout.utils.route_utils import summarize_routes
+from vehi_rout.utils.synthetic_data import write_instance
+
+# Seed of the Python and NumPy random generators in every case
+DEFAULT_SEED = 42
+
+# Search time per solved day, in seconds
+DEFAULT_TIME_BUDGET = 5
+
+# Relative change that counts as a regression when comparing with a baseline
+DEFAULT_THRESHOLD = 0.10
+
+# Metrics compared against the baseline: name -> True if higher is better
+COMPARED_METRICS = {
+    'stops_served': True,
+    'objective': False,
+    'wall_seconds': False,
+    'overhead_seconds': False,
+    'peak_rss_mb': False
+}
+
+# Absolute changes below these are noise and never count as a regression
+NOISE_FLOOR = {
+    'stops_served': 0,
+    'objective': 0,
+    'wall_seconds': 0.25,
+    'overhead_seconds': 0.05,
+    'peak_rss_mb': 5.0
+}
+
+
+def discover_cases(orders, matrix_path, gps_path):
+    """
+    Build the benchmark cases for a set of order files.
+
+    Args:
+        orders: List of order file paths or glob patterns
+        matrix_path: Path to the distance/time matrix file
+        gps_path: Path to the GPS coordinates file
+
+    Returns:
+        list: List of case dictionaries (name, demand_path, matrix_path, gps_path)
+    """
+    cases = []
+    for pattern in orders:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            cases.append({
+                'name': os.path.splitext(os.path.basename(path))[0],
+                'demand_path': path,
+                'matrix_path': matrix_path,
+                'gps_path': gps_path
+            })
+    return cases
+
+
+def synthetic_cases(sizes, output_dir, num_orders=None, use_time=False, seed=DEFAULT_SEED):
+    """
+    Generate synthetic instances and build a benchmark case for each.
+
+    Instances that already exist in the output folder with the same size,
+    order count and seed are reused instead of generated again.
+
+    Args:
+        sizes: List of store counts
+        output_dir: Folder holding one instance sub-folder per size
+        num_orders: Number of stores with an order (default: 10% of the stores)
+        use_time: Boolean indicating whether the cases route by time
+        seed: Seed of the instance generator
+
+    Returns:
+        list: List of case dictionaries (name, demand_path, matrix_path, gps_path, stores)
+    """
+    cases = []
+    for size in sizes:
+        instance_dir = os.path.join(output_dir, f'stores_{size}')
+        instance_file = os.path.join(instance_dir, 'instance.json')
+        instance = None
+        if os.path.isfile(instance_file):
+            with open(instance_file, 'r') as f:
+                instance = json.load(f)
+            if (instance.get('seed') != seed or
+                    (num_orders is not None and instance.get('num_orders') != num_orders)):
+                instance = None
+        if instance is None:
+            print(f"Generating synthetic instance with {size} stores ...", flush=True)
+            instance = write_instance(instance_dir, size, num_orders=num_orders, seed=seed)
+
+        cases.append({
+            'name': f'synthetic-{size}',
+            'demand_path': instance['orders_path'],
+            'matrix_path': instance['duration_path'] if use_time else instance['distance_path'],
+            'gps_path': instance['gps_path'],
+            'stores': size
+        })
+    return cases
+
+
+def _peak_rss_mb():
+    """Return the peak resident set size of this process in MB."""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(case, time_budget, max_nodes=None, use_time=False, days=1, seed=DEFAULT_SEED):
+    """
+    Run one case end to end and measure it.
+
+    Runs in a fresh worker process, so peak memory belongs to this case alone.
+
+    Args:
+        case: Case dictionary as built by discover_cases
+        time_budget: Search time per day in seconds
+        max_nodes: Maximum number of nodes to visit per day
+        use_time: Boolean indicating whether to route by time instead of distance
+        days: Number of days to plan; more than 1 runs the multi-day solver
+        seed: Seed of the Python and NumPy random generators
+
+    Returns:
+        dict: Case result with wall time, peak memory, stage timings and solution quality
+    """
+    configure_logging('WARNING')
+    random.seed(seed)
+    np.random.seed(seed)
+
+    output_dir = tempfile.mkdtemp(prefix='vrp_bench_')
+    try:
+        started = time.perf_counter()
+        with track_job() as timings:
+            controller = VRPController(use_distance=not use_time, output_dir=output_dir,
+                                       time_budget=time_budget * days)
+            controller.load_data(case['demand_path'], case['matrix_path'], case['gps_path'])
+            if days > 1:
+                all_visited_nodes, all_route_dicts = controller.solve_multi_day(
+                    total_days=days, max_nodes=max_nodes)
+            else:
+                visited_nodes, route_dict = controller.solve_single_day(day=0, max_nodes=max_nodes)
+                all_visited_nodes, all_route_dicts = [visited_nodes], [route_dict]
+        wall_seconds = time.perf_counter() - started
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    timing = timings.as_dict()
+    stats = summarize_routes(all_route_dicts, all_visited_nodes,
+                             controller.get_po_node_indices(), controller.use_distance)
+    search_seconds = timing['stages'].get('search', {}).get('seconds', 0.0)
+    return {
+        'name': case['name'],
+        'demand_path': case['demand_path'],
+        'stores': case.get('stores', len(controller.master_gps_df) - 1),
+        'nodes': max((run['nodes'] for run in timing['solver']), default=0),
+        'wall_seconds': round(wall_seconds, 4),
+        'overhead_seconds': round(wall_seconds - search_seconds, 4),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'solutions': sum(run['solutions'] or 0 for run in timing['solver']),
+        'objective': sum(run['objective'] for run in timing['solver']),
+        'total_metric': stats['total_metric'],
+        'metric_unit': 'mins' if use_time else 'km',
+        'stops_served': stats['total_stops'],
+        'unvisited_count': stats['unvisited_count'],
+        'stores_per_second': round(stats['total_stops'] / wall_seconds, 3) if wall_seconds else None,
+        'stages': timing['stages']
+    }
+
+
+def run_suite(cases, time_budget, max_nodes=None, use_time=False, days=1, seed=DEFAULT_SEED):
+    """
+    Run every case in its own worker process, one at a time.
+
+    Args:
+        cases: List of case dictionaries
+        time_budget: Search time per day in seconds
+        max_nodes: Maximum number of nodes to visit per day
+        use_time: Boolean indicating whether to route by time instead of distance
+        days: Number of days to plan
+        seed: Seed of the Python and NumPy random generators
+
+    Returns:
+        dict: Run metadata and one result per case
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        print(f"Running {case['name']} ...", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                result = pool.submit(run_case, case, time_budget, max_nodes, use_time, days, seed).result()
+            except Exception as e:
+                result = {'name': case['name'], 'demand_path': case['demand_path'], 'error': str(e)}
+        results.append(result)
+        if 'error' in result:
+            print(f"  failed: {result['error']}")
+        else:
+            print(f"  {result['wall_seconds']:.2f}s, {result['peak_rss_mb']:.0f} MB, "
+                  f"{result['stops_served']} stops, {result['total_metric']:.0f} {result['metric_unit']}")
+
+    return {'meta': run_metadata(time_budget, max_nodes, use_time, days, seed), 'cases': results}
+
+
+def run_metadata(time_budget, max_nodes, use_time, days, seed):
+    """Describe the environment and settings of a benchmark run."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    try:
+        from ortools import __version__ as ortools_version
+    except ImportError:
+        ortools_version = None
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'ortools': ortools_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'time_budget': time_budget,
+        'max_nodes': max_nodes,
+        'use_time': use_time,
+        'days': days,
+        'seed': seed
+    }
+
+
+def compare_with_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Find cases that got slower, heavier or worse than in a baseline run.
+
+    Args:
+        results: Results of this run as returned by run_suite
+        baseline: Results of an earlier run
+        threshold: Relative change that counts as a regression
+
+    Returns:
+        list: Human-readable regression messages; empty if there are none
+    """
+    baseline_cases = {case['name']: case for case in baseline['cases'] if 'error' not in case}
+    regressions = []
+    for case in results['cases']:
+        if 'error' in case:
+            regressions.append(f"{case['name']}: failed ({case['error']})")
+            continue
+        before = baseline_cases.get(case['name'])
+        if before is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), case.get(metric)
+            if old is None or new is None:
+                continue
+            change = (old - new) if higher_is_better else (new - old)
+            if change > NOISE_FLOOR[metric] and change > abs(old) * threshold:
+                regressions.append(f"{case['name']}: {metric} {old} -> {new} "
+                                   f"({'-' if higher_is_better else '+'}{change / max(abs(old), 1e-9):.1%})")
+    return regressions
+
+
+def main():
+    """Run the benchmark suite from the command line."""
+    parser = argparse.ArgumentParser(description='Vehicle Routing benchmark suite')
+    parser.add_argument('--orders', type=str, nargs='+', default=['data/orders/*-PO.csv'],
+                        help='Order files or glob patterns to benchmark')
+    parser.add_argument('--synthetic', type=int, nargs='+', default=None,
+                        help='Benchmark synthetic instances with these store counts instead of the order files')
+    parser.add_argument('--synthetic-orders', type=int, default=None,
+                        help='Number of stores with an order in each synthetic instance (default: 10%% of the stores)')
+    parser.add_argument('--synthetic-dir', type=str, default='data/synthetic',
+                        help='Folder to generate the synthetic instances in')
+    parser.add_argument('--matrix', type=str, default='data/master/osrm_distance_matrix.csv',
+                        help='Path to the distance/time matrix file')
+    parser.add_argument('--gps', type=str, default='data/master/master_gps.csv',
+                        help='Path to the GPS coordinates file')
+    parser.add_argument('--time-budget', type=float, default=DEFAULT_TIME_BUDGET,
+                        help='Search time per day in seconds')
+    parser.add_argument('--max-nodes', type=int, default=300,
+                        help='Maximum number of nodes to visit per day')
+    parser.add_argument('--use-time', action='store_true',
+                        help='Route by time instead of distance')
+    parser.add_argument('--days', type=int, default=1,
+                        help='Number of days to plan')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help='Seed of the Python and NumPy random generators')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Result file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Earlier result file to compare with; exits with status 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Relative change that counts as a regression')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        cases = synthetic_cases(args.synthetic, args.synthetic_dir, args.synthetic_orders,
+                                args.use_time, args.seed)
+    else:
+        cases = discover_cases(args.orders, args.matrix, args.gps)
+    results = run_suite(cases, args.time_budget, args.max_nodes, args.use_time, args.days, args.seed)
+
+    output = args.output or os.path.join(
+        'benchmarks', 'results', f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == '__main__':
+    main()
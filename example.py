@@ -7,9 +7,12 @@ detailed route information, and visualizations.
 """
 
 from vehi_rout.controller import VRPController
+from vehi_rout.core.log_config import configure_logging
 
 def main():
     """Main function to demonstrate the vehicle routing solution."""
+    configure_logging()
+
     # Create controller (using distance by default)
     controller = VRPController(use_distance=True)
 
@@ -52,21 +55,13 @@ def main():
 
     # Print summary of multi-day routing
     print("\n=== Multi-Day Summary ===")
-    total_nodes = sum(len(visited) for visited in all_visited_nodes)
-    print(f"Total nodes visited across all days: {total_nodes}")
+    print(f"Total nodes visited across all days: {controller.horizon.visited_count}")
 
     # Print unvisited nodes
-    all_visited = set()
-    for visited in all_visited_nodes:
-        all_visited.update(visited)
-
-    # Get all nodes from the demand data (PO file) instead of master data
-    all_po_nodes = controller.get_po_node_indices()
-    unvisited = all_po_nodes - all_visited
-
+    unvisited = controller.horizon.unvisited_codes()
     if unvisited:
         print(f"Unvisited nodes: {len(unvisited)}")
-        print(f"Unvisited node codes: {[controller.master_mat_df.index[i] for i in unvisited if i < len(controller.master_mat_df.index)]}")
+        print(f"Unvisited node codes: {unvisited}")
 
 if __name__ == '__main__':
     main()
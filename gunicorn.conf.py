@@ -0,0 +1,44 @@
+"""
+Gunicorn settings for the Vehicle Routing web app.
+
+    gunicorn -c gunicorn.conf.py
+
+The master process imports the app and parses the default master data once
+(preload_app) before it forks the workers, which share the parsed data
+copy-on-write. `kill -HUP <master pid>` loads the matrix files changed since
+and replaces the workers without restarting the server.
+"""
+
+import os
+import multiprocessing
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5096')
+preload_app = True
+
+# One worker per CPU. Job status, cancellation requests, progress events and
+# metrics are kept in the job registry, so any worker can serve any request
+# of a job; the job itself runs in the worker that queued it.
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def on_reload(server):
+    """Load changed master data in the master before the new workers are forked."""
+    import app
+
+    app.preload_default_master_data()
+
+
+def post_fork(server, worker):
+    """Start the worker's own log writer and metrics.
+
+    The master's writer thread is not inherited, and the metrics the master
+    recorded while preloading would otherwise be counted once per worker.
+    """
+    from vehi_rout.core.log_config import configure_logging
+    from vehi_rout.core.metrics import reset_metrics
+
+    configure_logging()
+    reset_metrics()
@@ -3,7 +3,88 @@ Main script to run the Vehicle Routing Problem solution.
 """
 
 import argparse
+import glob
+import json
 from vehi_rout.controller import VRPController
+from vehi_rout.core.log_config import configure_logging
+
+def build_batch_scenarios(args):
+    """
+    Build the batch scenarios from the command line arguments.
+
+    Demand files given with --batch share the command line solve options;
+    entries of a --scenarios file override them per scenario.
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        list: List of scenario dictionaries
+    """
+    from vehi_rout.core.batch import make_scenario
+
+    options = {
+        'use_time': args.use_time,
+        'multi_day': args.multi_day,
+        'days': args.days,
+        'max_nodes': args.max_nodes,
+        'time_budget': args.time_budget
+    }
+
+    scenarios = []
+    for pattern in args.batch or []:
+        paths = sorted(glob.glob(pattern)) or [pattern]
+        for path in paths:
+            scenarios.append(make_scenario(path, **options))
+
+    if args.scenarios:
+        with open(args.scenarios, 'r') as f:
+            for entry in json.load(f):
+                entry = dict(options, **entry)
+                scenarios.append(make_scenario(entry.pop('demand_path'), **entry))
+
+    return scenarios
+
+def run_batch_mode(args):
+    """Solve many demand files or scenarios in parallel and print the comparison."""
+    from vehi_rout.core.batch import run_batch
+
+    scenarios = build_batch_scenarios(args)
+    if not scenarios:
+        print("No scenarios to solve.")
+        return
+
+    comparison = run_batch(
+        scenarios,
+        matrix_path=args.matrix,
+        gps_path=args.gps,
+        output_dir=args.output,
+        workers=args.workers,
+        save_visualization=args.save_viz
+    )
+
+    print("\n=== Batch Summary ===")
+    print(comparison[['scenario', 'status', 'po_stores', 'nodes_visited', 'unvisited_count',
+                      'total_metric', 'solve_seconds']].to_string(index=False))
+
+def run_sweep_mode(args):
+    """Solve the demand file with a grid of fleet configurations and print the table."""
+    from vehi_rout.core.sweep import fleet_grid
+
+    controller = VRPController(use_distance=not args.use_time, output_dir=args.output,
+                               time_budget=args.time_budget)
+    controller.load_data(args.demand, args.matrix, args.gps, duration_path=args.duration_matrix)
+
+    fleets = fleet_grid(
+        num_vehicles=args.sweep_vehicles,
+        max_visits=args.sweep_visits,
+        max_limit=args.sweep_limits,
+        limit_key='max_time' if args.use_time else 'max_distance'
+    )
+    sweep_df = controller.sweep_fleet(fleets, max_nodes=args.max_nodes, workers=args.workers)
+
+    print("\n=== Fleet Sweep ===")
+    print(sweep_df.to_string(index=False))
 
 def main():
     """Main function to run the VRP solution."""
@@ -13,6 +94,9 @@ def main():
                         help='Path to the demand file')
     parser.add_argument('--matrix', type=str, default='data/master/osrm_distance_matrix.csv',
                         help='Path to the distance/time matrix file')
+    parser.add_argument('--duration-matrix', type=str, default=None,
+                        help='Path to the duration matrix file; with it, --matrix must be the distance matrix '
+                             'and every route is held to both the distance and the time limits')
     parser.add_argument('--gps', type=str, default='data/master/master_gps.csv',
                         help='Path to the GPS coordinates file')
     parser.add_argument('--use-time', action='store_true',
@@ -22,17 +106,46 @@ def main():
     parser.add_argument('--days', type=int, default=None,
                         help='Number of days to plan')
     parser.add_argument('--max-nodes', type=int, default=None,
-                        help='Maximum number of nodes to visit')
+                        help='Maximum number of PO stores per day, most urgent per km first')
     parser.add_argument('--save-viz', action='store_true',
                         help='Save visualization')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='Total search time in seconds, split across days')
+    parser.add_argument('--batch', type=str, nargs='+', default=None,
+                        help='Solve many demand files (paths or glob patterns) in parallel')
+    parser.add_argument('--scenarios', type=str, default=None,
+                        help='JSON file with a list of batch scenarios (demand_path plus solve options)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes for batch solving and fleet sweeps (default: all CPUs)')
+    parser.add_argument('--output', type=str, default='output/batch',
+                        help='Output folder for batch and fleet sweep results')
+
+    parser.add_argument('--sweep-vehicles', type=int, nargs='+', default=None,
+                        help='Fleet sizes to compare in a fleet sweep')
+    parser.add_argument('--sweep-visits', type=int, nargs='+', default=[15],
+                        help='Maximum visits per vehicle to compare in a fleet sweep')
+    parser.add_argument('--sweep-limits', type=int, nargs='+', default=[500],
+                        help='Maximum distance (km) or time (mins) per vehicle to compare in a fleet sweep')
+
+    parser.add_argument('--log-level', type=str, default=None,
+                        help='Log level (DEBUG, INFO, WARNING, ...); defaults to VRP_LOG_LEVEL or INFO')
 
     args = parser.parse_args()
+    configure_logging(args.log_level.upper() if args.log_level else None)
+
+    if args.sweep_vehicles:
+        run_sweep_mode(args)
+        return
+
+    if args.batch or args.scenarios:
+        run_batch_mode(args)
+        return
 
     # Create controller
-    controller = VRPController(use_distance=not args.use_time)
+    controller = VRPController(use_distance=not args.use_time, time_budget=args.time_budget)
 
     # Load data
-    controller.load_data(args.demand, args.matrix, args.gps)
+    controller.load_data(args.demand, args.matrix, args.gps, duration_path=args.duration_matrix)
 
     # Solve VRP
     if args.multi_day:
@@ -44,21 +157,7 @@ def main():
 
         # Print summary
         print("\n=== Multi-Day Summary ===")
-        total_nodes = sum(len(visited_nodes) for visited_nodes in all_visited_nodes)
-        print(f"Total nodes visited across all days: {total_nodes}")
-
-        # Print unvisited nodes
-        all_visited = set()
-        for visited in all_visited_nodes:
-            all_visited.update(visited)
-
-        # Get all nodes from the demand data (PO file) instead of master data
-        all_po_nodes = controller.get_po_node_indices()
-        unvisited = all_po_nodes - all_visited
-
-        if unvisited:
-            print(f"Unvisited nodes: {len(unvisited)}")
-            print(f"Unvisited node codes: {[controller.master_mat_df.index[i] for i in unvisited]}")
+        print(f"Total nodes visited across all days: {controller.horizon.visited_count}")
     else:
         visited_nodes, route_dict = controller.solve_single_day(
             day=0,
@@ -68,16 +167,17 @@ def main():
 
         # Print summary
         print("\n=== Single-Day Summary ===")
-        print(f"Total nodes visited: {len(visited_nodes)}")
+        print(f"Total nodes visited: {controller.horizon.visited_count}")
 
-        # Print unvisited nodes
-        # Get all nodes from the demand data (PO file) instead of master data
-        all_po_nodes = controller.get_po_node_indices()
-        unvisited = all_po_nodes - visited_nodes
+    # Print the PO stores that were not visited
+    unvisited = controller.horizon.unvisited_codes()
+    if unvisited:
+        print(f"Unvisited nodes: {len(unvisited)}")
+        print(f"Unvisited node codes: {unvisited}")
 
-        if unvisited:
-            print(f"Unvisited nodes: {len(unvisited)}")
-            print(f"Unvisited node codes: {[controller.master_mat_df.index[i] for i in unvisited]}")
+    if controller.provisional_codes:
+        print(f"Provisional matrix estimates used for {len(controller.provisional_codes)} stores: "
+              f"{controller.provisional_codes} (queued; run python -m vehi_rout.utils.matrix_update)")
 
 if __name__ == '__main__':
     main()
@@ -20,6 +20,61 @@ function hideLoading() {
   }
 }
 
+// Describe a progress event published by the solver
+function describeProgress(event) {
+  switch (event.stage) {
+    case "queued":
+      return "Waiting for a free solver...";
+    case "load":
+      return "Loading data...";
+    case "day":
+      return "Planning day " + event.day + " of " + event.total_days +
+        " (" + event.remaining + " candidate stores)";
+    case "search":
+      return "Day " + event.day + ": objective " + event.objective +
+        " after " + event.solutions + " solutions (" + event.elapsed + "s)";
+    case "report":
+      return "Writing reports for day " + event.day + "...";
+    case "maps":
+      return "Rendering maps for day " + event.day + "...";
+    case "cancelling":
+      return "Cancelling, keeping the best plan found so far...";
+    case "done":
+      return "Job " + event.status;
+    default:
+      return event.stage;
+  }
+}
+
+// Follow the progress stream of a job.
+// onEvent receives every event; onDone receives the final event once the job has finished.
+function trackJobProgress(jobId, onEvent, onDone) {
+  const source = new EventSource("/api/job/" + jobId + "/progress");
+  source.addEventListener("progress", function (message) {
+    const event = JSON.parse(message.data);
+    if (onEvent) {
+      onEvent(event);
+    }
+    if (event.stage === "done") {
+      source.close();
+      if (onDone) {
+        onDone(event);
+      }
+    }
+  });
+  return source;
+}
+
+// Ask a queued or running job to stop
+function cancelJob(jobId, onDone) {
+  return $.ajax({
+    url: "/api/job/" + jobId + "/cancel",
+    type: "POST",
+    dataType: "json",
+    complete: onDone,
+  });
+}
+
 // Format date
 function formatDate(dateString) {
   const date = new Date(dateString);
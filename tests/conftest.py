@@ -0,0 +1,42 @@
+"""
+Shared fixtures for the Vehicle Routing tests.
+"""
+
+import os
+
+import pytest
+
+# Repository root, so the tests find the bundled data from any folder
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MATRIX_PATH = os.path.join(ROOT, 'data', 'master', 'osrm_distance_matrix.csv')
+GPS_PATH = os.path.join(ROOT, 'data', 'master', 'master_gps.csv')
+PO_PATH = os.path.join(ROOT, 'data', 'orders', '03-03-2025-PO.csv')
+
+
+@pytest.fixture
+def master_data():
+    """Bundled master distance matrix and GPS data."""
+    from vehi_rout.utils.data_utils import get_master_data
+
+    return get_master_data(MATRIX_PATH, GPS_PATH)
+
+
+@pytest.fixture(scope='session')
+def client(tmp_path_factory):
+    """Test client of the web app, with its uploads, outputs and job registry in a temporary folder."""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    try:
+        import app as web
+
+        web.app.config.update(
+            TESTING=True,
+            DEFAULT_MATRIX_PATH=MATRIX_PATH,
+            DEFAULT_GPS_PATH=GPS_PATH,
+            DEFAULT_DURATION_PATH=os.path.join(ROOT, 'data', 'master', 'osrm_duration_matrix.csv'),
+            UPDATE_PENDING_STORES=False
+        )
+        yield web.app.test_client()
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,105 @@
+"""
+Tests for the request validation and the JSON solve of the web API.
+"""
+
+import json
+import time
+
+import pytest
+
+
+@pytest.mark.parametrize('k', ['0', '-3', '2.5', 'five'])
+def test_nearest_stores_rejects_invalid_k(client, k):
+    response = client.get('/api/stores/nearest', query_string={'lat': 6.9, 'lon': 79.9, 'k': k})
+
+    assert response.status_code == 400
+    assert 'k' in response.get_json()['error']
+
+
+def test_nearest_stores_requires_coordinates(client):
+    assert client.get('/api/stores/nearest', query_string={'lat': 6.9}).status_code == 400
+
+
+def test_nearest_stores(client):
+    response = client.get('/api/stores/nearest', query_string={'lat': 6.9, 'lon': 79.9, 'k': 3})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 3
+    distances = [store['distance_km'] for store in body['stores']]
+    assert distances == sorted(distances)
+
+
+@pytest.mark.parametrize('radius_km', ['0', '-1', 'nan', 'wide'])
+def test_stores_within_rejects_invalid_radius(client, radius_km):
+    response = client.get('/api/stores/within', query_string={'lat': 6.9, 'lon': 79.9, 'radius_km': radius_km})
+
+    assert response.status_code == 400
+
+
+def test_stores_in_bbox_requires_all_bounds(client):
+    response = client.get('/api/stores/bbox', query_string={'min_lat': 6, 'min_lon': 79, 'max_lat': 7})
+
+    assert response.status_code == 400
+
+
+ORDERS = [{'CODE': '3', 'DATE': '2025-03-03'}, {'CODE': 'SCAR', 'DATE': '2025-03-04', 'DEMAND': 2}]
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'orders': []},
+    {'orders': [{'CODE': '3'}]},
+    {'orders': [{'CODE': '3', 'DATE': 'tomorrow'}]},
+    {'orders': ORDERS, 'num_vehicles': 0},
+    {'orders': ORDERS, 'num_vehicles': 'two'},
+    {'orders': ORDERS, 'num_vehicles': 2, 'max_visits': [10]},
+    {'orders': ORDERS, 'num_vehicles': 2, 'max_distance': [100, -1]},
+    {'orders': ORDERS, 'num_vehicles': 2, 'max_time': [600, 0]},
+    {'orders': ORDERS, 'days': 'many'},
+])
+def test_solve_rejects_invalid_requests(client, body):
+    response = client.post('/api/solve', json=body)
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_solve_requires_a_json_object(client):
+    assert client.post('/api/solve', data='orders', content_type='text/plain').status_code == 400
+    assert client.post('/api/solve', json=[ORDERS]).status_code == 400
+
+
+def test_small_solve_is_answered_in_the_request(client):
+    response = client.post('/api/solve', json={'orders': ORDERS, 'num_vehicles': 10, 'time_budget': 1})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'completed'
+    assert len(body['route_dict']) == 10
+    assert body['unvisited_nodes'] == []
+
+
+def test_queued_solve_saves_routes_without_maps(client):
+    response = client.post('/api/solve', json={'orders': ORDERS, 'multi_day': True, 'days': 2,
+                                               'num_vehicles': 2, 'time_budget': 1})
+
+    assert response.status_code == 202
+    body = response.get_json()
+    for _ in range(200):
+        job = client.get(body['status_url']).get_json()
+        if job['status'] != 'running':
+            break
+        time.sleep(0.1)
+    assert job['status'] == 'completed'
+    assert 'map_error' not in job
+
+    routes = client.get(body['routes_url'])
+    assert routes.status_code == 200
+    assert routes.get_json()['days'][0]['day'] == 1
+
+    # The finished job's progress stream ends with its status
+    progress = client.get(body['progress_url']).get_data(as_text=True)
+    last_event = json.loads(progress.strip().splitlines()[-1][len('data: '):])
+    assert (last_event['stage'], last_event['status']) == ('done', 'completed')
+    assert client.post(f"/api/job/{body['job_id']}/cancel").status_code == 409
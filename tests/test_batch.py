@@ -0,0 +1,32 @@
+"""
+Tests for batch scenario solving.
+"""
+
+from vehi_rout.config import MAX_VISITS_PER_VEHICLE, MAX_DISTANCE_PER_VEHICLE, MAX_TIME_PER_VEHICLE
+from vehi_rout.core.batch import make_scenario, solve_scenario
+from vehi_rout.utils.helper_utils import fleet_limits
+
+from tests.conftest import MATRIX_PATH, GPS_PATH, PO_PATH
+
+
+def test_fleet_limits_repeats_last_limit():
+    assert fleet_limits([1200, 600], 4) == [1200, 600, 600, 600]
+    assert fleet_limits([1200, 600], 1) == [1200]
+
+
+def test_fleet_limits_defaults_cover_larger_fleets():
+    for limits in (MAX_VISITS_PER_VEHICLE, MAX_DISTANCE_PER_VEHICLE, MAX_TIME_PER_VEHICLE):
+        sized = fleet_limits(limits, 10)
+        assert len(sized) == 10
+        assert sized[:len(limits)] == limits
+        assert sized[len(limits):] == [limits[-1]] * (10 - len(limits))
+
+
+def test_solve_scenario_with_more_vehicles_than_configured(tmp_path):
+    scenario = make_scenario(PO_PATH, num_vehicles=10, time_budget=1)
+
+    row = solve_scenario(scenario, str(tmp_path), matrix_path=MATRIX_PATH, gps_path=GPS_PATH)
+
+    assert row['status'] == 'completed', row.get('error')
+    assert row['num_vehicles'] == 10
+    assert row['total_stops'] > 0
@@ -0,0 +1,65 @@
+"""
+Tests for stopping solves through cancellation tokens.
+"""
+
+import time
+import threading
+
+from vehi_rout.controller import VRPController
+from vehi_rout.core.cancellation import CancellationToken, watch_cancellation
+from vehi_rout.utils.data_utils import get_demand_df
+
+from tests.conftest import PO_PATH
+
+
+def test_watch_cancellation_copies_the_request():
+    token = CancellationToken()
+    requested = threading.Event()
+    cancelled = threading.Event()
+
+    stop = watch_cancellation(token, requested.is_set, on_cancel=cancelled.set, interval=0.01)
+    assert not token.cancelled
+    requested.set()
+
+    assert cancelled.wait(2)
+    assert token.cancelled
+    stop.set()
+
+
+def test_stopped_watcher_leaves_the_token():
+    token = CancellationToken()
+
+    stop = watch_cancellation(token, lambda: True, interval=0.05)
+    stop.set()
+    time.sleep(0.1)
+
+    assert not token.cancelled
+
+
+def make_controller(master_data, tmp_path, cancel_token):
+    controller = VRPController(output_dir=str(tmp_path), time_budget=30, cancel_token=cancel_token)
+    controller.set_data(get_demand_df(today_path=PO_PATH), *master_data)
+    return controller
+
+
+def test_cancelled_job_plans_no_day(master_data, tmp_path):
+    token = CancellationToken()
+    token.cancel()
+    controller = make_controller(master_data, tmp_path, token)
+
+    all_visited_nodes, _ = controller.solve_multi_day(total_days=3, save_reports=False)
+
+    assert all_visited_nodes == []
+    assert controller.cancelled
+
+
+def test_cancel_stops_the_search_before_its_time_limit(master_data, tmp_path):
+    token = CancellationToken()
+    controller = make_controller(master_data, tmp_path, token)
+    threading.Timer(0.5, token.cancel).start()
+
+    started = time.monotonic()
+    all_visited_nodes, _ = controller.solve_multi_day(total_days=3, save_reports=False)
+
+    assert time.monotonic() - started < 10
+    assert len(all_visited_nodes) == 1
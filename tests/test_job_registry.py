@@ -0,0 +1,160 @@
+"""
+Tests for the SQLite job registry.
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+from vehi_rout.core import job_registry as registry_module
+from vehi_rout.core.job_registry import JobRegistry, MAX_JOB_EVENTS
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return JobRegistry(str(tmp_path / 'jobs.db'))
+
+
+def add_job(registry, job_id, status='initialized', timestamp='2025-03-03T08:00:00'):
+    registry.upsert_job({'job_id': job_id, 'po_file': 'po.csv', 'status': status,
+                         'timestamp': timestamp, 'num_vehicles': 2, 'days': 1})
+
+
+def test_status_transitions_stamp_times_and_results(registry):
+    add_job(registry, 'a')
+
+    registry.update_status('a', 'running')
+    job = registry.get_job('a')
+    assert job['status'] == 'running'
+    assert job['started_at'] is not None and job['finished_at'] is None
+
+    registry.update_status('a', 'completed', total_stops=12, unvisited_count=3)
+    job = registry.get_job('a')
+    assert job['status'] == 'completed'
+    assert job['finished_at'] is not None
+    assert job['duration_seconds'] >= 0
+    assert (job['total_stops'], job['unvisited_count']) == (12, 3)
+
+    # A rerun clears the previous finish
+    registry.update_status('a', 'running')
+    job = registry.get_job('a')
+    assert job['finished_at'] is None and job['duration_seconds'] is None
+
+
+def test_failed_job_keeps_its_error(registry):
+    add_job(registry, 'a')
+    registry.update_status('a', 'running')
+    registry.update_status('a', 'failed', error='no matrix')
+
+    assert registry.get_job('a')['error'] == 'no matrix'
+
+
+def test_unknown_job(registry):
+    assert registry.get_job('missing') is None
+    assert registry.start_job('missing') is False
+
+
+def test_start_job_only_once(registry):
+    add_job(registry, 'a')
+
+    assert registry.start_job('a') is True
+    assert registry.start_job('a') is False
+    assert registry.get_job('a')['status'] == 'running'
+
+    registry.update_status('a', 'failed', error='boom')
+    assert registry.start_job('a') is True
+
+
+def test_cancel_requests(registry):
+    add_job(registry, 'a')
+
+    # Only a running job can be cancelled
+    assert registry.request_cancel('a') is False
+    registry.start_job('a')
+    assert registry.is_cancel_requested('a') is False
+    assert registry.request_cancel('a') is True
+    assert registry.is_cancel_requested('a') is True
+
+    # Starting the job again clears the request
+    registry.update_status('a', 'cancelled')
+    registry.start_job('a')
+    assert registry.is_cancel_requested('a') is False
+
+
+def test_list_jobs_pages_and_filters(registry):
+    for day in range(1, 6):
+        add_job(registry, f'job{day}', status='completed' if day % 2 else 'failed',
+                timestamp=f'2025-03-0{day}T08:00:00')
+
+    jobs, total = registry.list_jobs(page=1, per_page=2)
+    assert total == 5
+    assert [job['job_id'] for job in jobs] == ['job5', 'job4']
+
+    jobs, total = registry.list_jobs(page=3, per_page=2)
+    assert [job['job_id'] for job in jobs] == ['job1']
+
+    jobs, total = registry.list_jobs(status='failed', order='asc')
+    assert total == 2
+    assert [job['job_id'] for job in jobs] == ['job2', 'job4']
+
+    jobs, total = registry.list_jobs(date_from='2025-03-02', date_to='2025-03-03')
+    assert sorted(job['job_id'] for job in jobs) == ['job2', 'job3']
+
+
+def test_list_jobs_rejects_unknown_sort(registry):
+    with pytest.raises(ValueError):
+        registry.list_jobs(sort='po_file')
+
+
+def test_events_keep_the_latest(registry):
+    for seq in range(1, MAX_JOB_EVENTS + 11):
+        registry.add_event('a', {'seq': seq, 'stage': 'search'})
+    registry.add_event('b', {'seq': 1, 'stage': 'queued'})
+
+    events = registry.events_after('a', 0)
+    assert len(events) == MAX_JOB_EVENTS
+    assert events[0]['seq'] == 11
+    assert [event['seq'] for event in registry.events_after('a', MAX_JOB_EVENTS + 8)] == [
+        MAX_JOB_EVENTS + 9, MAX_JOB_EVENTS + 10]
+    assert registry.latest_event('a')['seq'] == MAX_JOB_EVENTS + 10
+
+    registry.clear_events('a')
+    assert registry.latest_event('a') is None
+    assert registry.latest_event('b')['stage'] == 'queued'
+
+
+def test_metrics_of_each_process(registry):
+    registry.save_metrics('p1', {'vrp_jobs_finished_total': [[['completed'], 1]]})
+    registry.save_metrics('p2', {'vrp_jobs_finished_total': [[['completed'], 2]]})
+    registry.save_metrics('p1', {'vrp_jobs_finished_total': [[['completed'], 3]]})
+
+    totals = sorted(snapshot['vrp_jobs_finished_total'][0][1] for snapshot in registry.load_metrics())
+    assert totals == [2, 3]
+
+
+def test_database_without_new_columns_is_upgraded(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    jobs_table = registry_module.SCHEMA.split('CREATE INDEX')[0]
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(jobs_table.replace(',\n    cancel_requested INTEGER NOT NULL DEFAULT 0', ''))
+        conn.execute("INSERT INTO jobs (job_id, status) VALUES ('a', 'running')")
+    conn.close()
+
+    registry = JobRegistry(db_path)
+
+    assert registry.request_cancel('a') is True
+    assert registry.is_cancel_requested('a') is True
+
+
+def test_import_job_folders_skips_registered_jobs(registry, tmp_path):
+    uploads = tmp_path / 'uploads'
+    for job_id in ('a', 'b'):
+        (uploads / job_id).mkdir(parents=True)
+        (uploads / job_id / 'job_info.json').write_text(json.dumps({'status': 'completed', 'po_file': 'po.csv'}))
+    (uploads / 'broken').mkdir()
+    (uploads / 'broken' / 'job_info.json').write_text('{')
+
+    assert registry.import_job_folders(str(uploads)) == 2
+    assert registry.import_job_folders(str(uploads)) == 0
+    assert registry.count() == 2
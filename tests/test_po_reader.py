@@ -0,0 +1,60 @@
+"""
+Tests for reading PO files against the PO schema.
+"""
+
+import io
+
+import pandas as pd
+import pytest
+
+from vehi_rout.utils.po_reader import parse_dates, prepare_po, read_po
+
+
+def test_parse_dates_accepts_the_configured_formats():
+    dates = parse_dates(pd.Series(['03/04/2025', '2025-03-05', None], dtype=object))
+
+    assert dates[0] == pd.Timestamp('2025-03-04')
+    assert dates[1] == pd.Timestamp('2025-03-05')
+    assert pd.isna(dates[2])
+
+
+def test_parse_dates_rejects_other_formats():
+    dates = parse_dates(pd.Series(['04.03.2025', 'soon', '2025-13-01'], dtype=object))
+
+    assert dates.isna().all()
+
+
+def test_parse_dates_tries_formats_in_order():
+    dates = parse_dates(pd.Series(['03/04/2025'], dtype=object), formats=['%d/%m/%Y', '%m/%d/%Y'])
+
+    assert dates[0] == pd.Timestamp('2025-04-03')
+
+
+def test_parse_dates_keeps_datetimes():
+    values = pd.Series(pd.to_datetime(['2025-03-03']))
+
+    assert parse_dates(values) is values
+
+
+def test_invalid_dates_are_rejected_with_their_row():
+    raw = pd.DataFrame({'CODE': ['A', 'B'], 'DATE': ['2025-03-03', '3rd March']}, dtype=object)
+
+    demand, rejected = prepare_po(raw)
+
+    assert demand['CODE'].tolist() == ['A']
+    assert rejected['ROW'].tolist() == [3]
+    assert rejected['REASON'].tolist() == ['invalid DATE']
+
+
+def test_strict_read_raises_on_an_invalid_date():
+    with pytest.raises(ValueError, match='invalid DATE'):
+        read_po(io.StringIO('CODE,DATE\nA,2025-03-03\nB,not a date\n'), strict=True)
+
+
+def test_read_po_merges_duplicate_stores_to_their_earliest_date():
+    demand, rejected = read_po(io.StringIO('CODE,DATE,DEMAND\nA,03/05/2025,1\nA,2025-03-04,2\n'))
+
+    assert len(rejected) == 0
+    assert demand['CODE'].tolist() == ['A']
+    assert demand['DATE'].tolist() == [pd.Timestamp('2025-03-04')]
+    assert demand['DEMAND'].tolist() == [3.0]
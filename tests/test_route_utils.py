@@ -0,0 +1,49 @@
+"""
+Tests for the selection of the PO stores a day's model includes.
+"""
+
+import pandas as pd
+
+from vehi_rout.utils.route_utils import select_po_nodes
+
+# Depot '0' and four stores; store 'D' is far from the depot
+CODES = ['0', 'A', 'B', 'C', 'D']
+DEPOT_KM = [0, 2, 4, 6, 50]
+
+
+def make_matrix():
+    values = [[abs(DEPOT_KM[i] - DEPOT_KM[j]) for j in range(len(CODES))] for i in range(len(CODES))]
+    return pd.DataFrame(values, index=CODES, columns=CODES)
+
+
+def make_demand(codes):
+    return {'key': list(codes), 'demand': [1] * len(codes), 'po_date': [None] * len(codes)}
+
+
+def test_selects_only_po_stores_in_the_matrix():
+    demand = make_demand(['A', 'C', 'MISSING'])
+
+    assert select_po_nodes(make_matrix(), demand, [1.0, 1.0, 1.0]) == [1, 3]
+
+
+def test_keeps_the_highest_penalty_per_km():
+    demand = make_demand(['A', 'B', 'C', 'D'])
+
+    # Equal penalties: the nearest stores win
+    assert select_po_nodes(make_matrix(), demand, [1.0, 1.0, 1.0, 1.0], max_nodes=2) == [1, 2]
+    # An urgent store far away beats nearby stores that can wait
+    assert select_po_nodes(make_matrix(), demand, [1.0, 1.0, 1.0, 1000.0], max_nodes=2) == [1, 4]
+
+
+def test_ties_go_to_the_nearer_store():
+    demand = make_demand(['A', 'B'])
+
+    # Same penalty per km: B has twice the penalty at twice the round trip
+    assert select_po_nodes(make_matrix(), demand, [1.0, 2.0], max_nodes=1) == [1]
+
+
+def test_chooses_from_the_given_nodes():
+    demand = make_demand(['A', 'B', 'C', 'D'])
+
+    assert select_po_nodes(make_matrix(), demand, [1.0] * 4, max_nodes=1, nodes=[3, 4]) == [3]
+    assert select_po_nodes(make_matrix(), demand, [1.0] * 4, nodes={2, 4}) == [2, 4]
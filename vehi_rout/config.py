@@ -3,6 +3,8 @@ Configuration module for the Vehicle Routing Problem.
 Contains all the parameters used in the solution.
 """
 
+import os
+
 # Number of days to plan ahead
 TOTAL_DAYS = 6
 
@@ -16,18 +18,78 @@ MAX_TIME_PER_VEHICLE = [1200, 1200, 600, 600, 600, 600, 600, 600]
 # Maximum distance (in km) per vehicle
 MAX_DISTANCE_PER_VEHICLE = [500, 500, 500, 500, 500, 500, 500, 500]
 
+# Class of each vehicle, for road restrictions; vehicles beyond the list are 'standard'
+VEHICLE_CLASSES = ['standard'] * 8
+
+# Roads each vehicle class may not use, as (from CODE, to CODE) pairs. A road closed
+# in both directions needs both pairs, e.g. {'truck': [('0', '1001'), ('1001', '0')]}
+RESTRICTED_ROADS = {}
+
 # Base penalty for not visiting a node (used in time-based routing)
 TIME_BASE_PENALTY = 100000
 
 # Base penalty for not visiting a node (used in distance-based routing)
 DISTANCE_BASE_PENALTY = 100000
 
+# Fixed cost of using a vehicle, in km (distance) or minutes (time) of the routing metric
+VEHICLE_FIXED_COST = 10000
+
+# Fixed-point scales of the solver's integer arc costs: metres per km and seconds per minute.
+# Matrices, vehicle limits, penalties and the fixed cost are scaled once when the model is
+# built, and route metrics are scaled back to km or minutes in reports.
+DISTANCE_SCALE = 1000
+TIME_SCALE = 60
+
+# Service (unloading) time in minutes at a store, by BRAND. A SERVICE_TIME column in the
+# PO file or the master GPS data overrides these per store.
+SERVICE_TIME_BY_BRAND = {
+    'Arpico': 40,
+    'Keels': 30,
+    'Cargills': 25
+}
+
+# Service time in minutes at stores of other brands
+DEFAULT_SERVICE_TIME = 15
+
+# Clock time at which vehicles leave the depot, for the arrival times in route reports
+ROUTE_START_TIME = "08:00"
+
+# Date formats of the DATE column of PO files, tried in order. PO exports write dates
+# month first (3/4/2025 is 4 March 2025); next_day_demand.csv writes ISO dates.
+PO_DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d']
+
+# pandas CSV engine for PO files; None uses pyarrow when it is installed, else 'c'
+PO_CSV_ENGINE = os.environ.get('VRP_PO_CSV_ENGINE') or None
+
 # Depot node ID
 DEPOT = 0
 
 # Solver parameters
 SOLVER_TIME_LIMIT_SECONDS = 30
 
+# Shortest search time (in seconds) a day gets when a job's time budget is nearly used up
+MIN_DAY_TIME_LIMIT_SECONDS = 1
+
+# OSRM server used to extend the master matrices with new stores (a local osrm-routed)
+OSRM_URL = os.environ.get('VRP_OSRM_URL', 'http://localhost:5000')
+
+# OSRM routing profile of the delivery vehicles
+OSRM_PROFILE = 'car'
+
+# Most coordinates sent in one OSRM /table request; must not exceed the server's --max-table-size
+OSRM_TABLE_MAX_COORDINATES = 100
+
+# Exact neighbours kept per store by sparse k-nearest-neighbour matrices (.npz matrix files)
+KNN_NEIGHBOURS = 50
+
+# Stores the solver may drive to next from a store: its this many nearest stores of the day,
+# plus the stores that have it among theirs, and the depot. None allows every arc.
+CANDIDATE_NEIGHBOURS = None
+
+# PO stores missing from the master matrices, routed with provisional estimates and
+# queued here until the matrices are extended with real OSRM entries
+PENDING_STORES_PATH = 'data/master/pending_stores.csv'
+
 # Penalty weights for different days remaining
 # The closer to the deadline, the higher the penalty
 PENALTY_WEIGHTS = {
@@ -39,3 +101,9 @@ PENALTY_WEIGHTS = {
     6: 1000, # 6 days remaining
     7: 1000   # 7 days remaining
 }
+
+# Log level of the vehi_rout loggers (DEBUG adds per-store and per-arc detail)
+LOG_LEVEL = os.environ.get('VRP_LOG_LEVEL', 'INFO').upper()
+
+# Format of log records
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(processName)s] %(name)s: %(message)s'
@@ -3,18 +3,24 @@ Controller module for the Vehicle Routing Problem.
 Orchestrates the entire process of solving the VRP.
 """
 
+import numpy as np
 import pandas as pd
 from datetime import datetime
+import logging
 import os
 
 from vehi_rout.config import (
     TOTAL_DAYS,
     DISTANCE_BASE_PENALTY,
-    TIME_BASE_PENALTY
+    TIME_BASE_PENALTY,
+    ROUTE_START_TIME
 )
+from vehi_rout.utils.code_table import CodeTable
 from vehi_rout.utils.data_utils import (
     load_matrix_df,
     load_df,
+    align_matrix,
+    get_service_times,
     get_demand_df,
     update_demand_dic
 )
@@ -22,58 +28,106 @@ from vehi_rout.utils.helper_utils import (
     get_penalty_list,
     get_values_not_in_second_list
 )
-from vehi_rout.utils.route_utils import sort_nodes_by_distance
+from vehi_rout.utils.route_utils import (
+    METRIC_UNITS,
+    select_po_nodes,
+    summarize_routes,
+    format_arrival_times
+)
 from vehi_rout.utils.visualization import (
     visualize_routes_per_vehicle,
     print_route_summary,
     save_route_details_to_csv
 )
-from vehi_rout.solver.vrp_solver import (
-    solve_vrp_for_day,
-    solve_multi_day_vrp
-)
+from vehi_rout.data_model.vrp_data_model import create_data_model
+from vehi_rout.core.horizon import HorizonState
+from vehi_rout.core.metrics import timed
+from vehi_rout.utils.matrix_update import find_new_stores, add_estimated_stores, queue_pending_stores
+from vehi_rout.utils.spatial_index import SpatialIndex, stores_only
+
+logger = logging.getLogger(__name__)
 
 class VRPController:
     """Controller class for the Vehicle Routing Problem."""
 
-    def __init__(self, use_distance=True):
+    def __init__(self, use_distance=True, output_dir="output", progress=None,
+                 cancel_token=None, time_budget=None):
         """
         Initialize the VRP controller.
 
         Args:
             use_distance: Boolean indicating whether to use distance or time
+            output_dir: Root folder that summaries, CSV files and maps are written to
+            progress: ProgressChannel receiving stage and search updates (optional)
+            cancel_token: CancellationToken that stops a running solve (optional)
+            time_budget: Total search time in seconds for a solve, split across days (optional)
         """
         self.use_distance = use_distance
+        self.output_dir = output_dir
+        self.progress = progress
+        self.cancel_token = cancel_token
+        self.time_budget = time_budget
         self.base_penalty = DISTANCE_BASE_PENALTY if use_distance else TIME_BASE_PENALTY
         self.demand_df = None
         self.master_mat_df = None
+        self.duration_mat_df = None
         self.master_gps_df = None
+        self.service_times = None
         self.demand_dict = None
+        self.code_table = None
+        # HorizonState of the last single- or multi-day solve
+        self.horizon = None
         self.penalty_list = None
-
-    def load_data(self, demand_path, matrix_path, gps_path):
+        self.max_visits = None
+        self.max_distance = None
+        self.max_time = None
+        self.vehicle_classes = None
+        self.provisional_codes = []
+        self._spatial_index = None
+
+    @timed('load')
+    def load_data(self, demand_path, matrix_path, gps_path, duration_path=None):
         """
         Load data from files.
 
         Args:
             demand_path: Path to the demand file
-            matrix_path: Path to the distance/time matrix file
+            matrix_path: Path to the distance/time matrix file; the distance
+                matrix when duration_path is given
             gps_path: Path to the GPS coordinates file
+            duration_path: Path to the duration matrix file, to enforce both
+                distance and time limits in one solve (optional)
         """
-        # Load demand data
-        self.demand_df = get_demand_df(today_path=demand_path)
+        self.set_data(
+            demand_df=get_demand_df(today_path=demand_path),
+            master_mat_df=load_matrix_df(path=matrix_path),
+            master_gps_df=load_df(path=gps_path),
+            duration_mat_df=load_matrix_df(path=duration_path) if duration_path else None
+        )
 
-        # Convert CODE to string if it's numeric
-        if self.demand_df['CODE'].dtype in ['float', 'int', 'int64']:
-            self.demand_df['CODE'] = self.demand_df['CODE'].astype(int)
-            self.demand_df['CODE'] = self.demand_df['CODE'].astype(str)
-            print('Converting CODE to string')
+    def set_data(self, demand_df, master_mat_df, master_gps_df, duration_mat_df=None):
+        """
+        Use already loaded demand and master data.
 
-        # Load distance/time matrix
-        self.master_mat_df = load_matrix_df(path=matrix_path)
+        The master DataFrames are not modified, so cached copies can be shared
+        between controllers.
 
-        # Load GPS coordinates
-        self.master_gps_df = load_df(path=gps_path)
+        Args:
+            demand_df: DataFrame containing the PO demand data, as read by
+                get_demand_df or orders_to_demand_df (string codes, parsed dates)
+            master_mat_df: DataFrame containing the distance/time matrix; the
+                distance matrix when duration_mat_df is given
+            master_gps_df: DataFrame containing the GPS coordinates
+            duration_mat_df: DataFrame containing the duration matrix (optional).
+                It is aligned to the codes of master_mat_df, and every solve
+                then enforces both the distance and the time limits.
+        """
+        self.demand_df = demand_df
+
+        self.master_mat_df = master_mat_df
+        self.master_gps_df = master_gps_df
+        self.duration_mat_df = (align_matrix(duration_mat_df, master_mat_df)
+                                if duration_mat_df is not None else None)
 
         # Add depot (SMAK_KADAWATHA) to the GPS data
         SMAK_KADAWATHA = (7.0038321, 79.9394804)
@@ -86,8 +140,6 @@ class VRPController:
         }
 
         # Always ensure the depot is in the master_gps_df
-        import pandas as pd
-
         # Remove any existing depot entries
         if '0' in self.master_gps_df['CODE'].values:
             self.master_gps_df = self.master_gps_df[self.master_gps_df['CODE'] != '0']
@@ -100,21 +152,45 @@ class VRPController:
             ],
             ignore_index=True
         )
-        print("Added depot (SMAK_KADAWATHA) to GPS data")
+        logger.debug("Added depot (SMAK_KADAWATHA) to GPS data")
+
+        # PO stores missing from the matrix are routed with provisional estimates
+        # and queued for a real matrix update instead of being dropped
+        new_stores = find_new_stores(self.demand_df, self.master_mat_df.index)
+        self.provisional_codes = new_stores['CODE'].tolist()
+        if self.provisional_codes:
+            self.master_mat_df = add_estimated_stores(self.master_mat_df, self.master_gps_df, new_stores)
+            if self.duration_mat_df is not None:
+                self.duration_mat_df = add_estimated_stores(self.duration_mat_df, self.master_gps_df, new_stores)
+            self.master_gps_df = pd.concat(
+                [self.master_gps_df, new_stores.reindex(columns=self.master_gps_df.columns)],
+                ignore_index=True
+            )
+            queue_pending_stores(new_stores)
+            logger.warning("%d PO stores are not in the matrix; using provisional estimates for %s",
+                           len(self.provisional_codes), ', '.join(self.provisional_codes[:10]))
+
+        # Dense int32 id per matrix code, shared by demand, selection and the solver
+        self.code_table = CodeTable(self.master_mat_df.index)
+
+        # Rebuilt from the new GPS data on the next spatial query
+        self._spatial_index = None
+
+        # Service time per store, folded into the time matrix when routing by time
+        self.service_times = get_service_times(self.demand_df, self.master_gps_df)
 
         # Create demand dictionary
-        self.demand_dict = update_demand_dic(self.demand_df)
+        self.demand_dict = update_demand_dic(self.demand_df, self.code_table)
 
         # Calculate penalties
         today = datetime.now().strftime('%Y-%m-%d')
         self.penalty_list = get_penalty_list(self.demand_dict, self.base_penalty, TOTAL_DAYS, today)
 
-        print(f"Loaded {len(self.demand_df)} demand records")
-        print(f"Loaded {len(self.master_mat_df)} locations in distance/time matrix")
-        print(f"Loaded {len(self.master_gps_df)} locations with GPS coordinates")
+        logger.info("Loaded %d demand records, %d matrix locations and %d GPS locations",
+                    len(self.demand_df), len(self.master_mat_df), len(self.master_gps_df))
 
 
-    def solve_single_day(self, day=0, max_nodes=None, save_visualization=False):
+    def solve_single_day(self, day=0, max_nodes=None, save_visualization=False, save_reports=True):
         """
         Solve the VRP for a single day.
 
@@ -122,6 +198,7 @@ class VRPController:
             day: Day index (0-based)
             max_nodes: Maximum number of nodes to visit
             save_visualization: Boolean indicating whether to save visualization
+            save_reports: Boolean indicating whether to write summaries and CSV files
 
         Returns:
             visited_nodes: Set of visited node indices
@@ -131,60 +208,57 @@ class VRPController:
             raise ValueError("Data not loaded. Call load_data() first.")
 
         # Get nodes to visit
-        all_nodes = list(range(1, len(self.master_mat_df)))
+        nodes_to_visit = self._select_nodes(max_nodes)
 
-        # Sort nodes by distance from depot
-        sorted_nodes = sort_nodes_by_distance(self.master_mat_df.values)
-
-        # Limit the number of nodes if specified
-        if max_nodes is not None and max_nodes < len(sorted_nodes):
-            nodes_to_visit = sorted(sorted_nodes[:max_nodes])
-        else:
-            nodes_to_visit = all_nodes
+        # Solve VRP; the solver and OR-Tools are imported on the first solve
+        from vehi_rout.solver.vrp_solver import solve_vrp_for_day
 
-        # Solve VRP
+        self._publish('day', day=day + 1, total_days=1, remaining=len(nodes_to_visit))
         visited_nodes, route_dict = solve_vrp_for_day(
             self.master_mat_df,
             nodes_to_visit,
             day,
             self.demand_dict,
             self.penalty_list,
-            self.use_distance
+            self.use_distance,
+            progress=self.progress,
+            cancel_token=self.cancel_token,
+            time_limit=self.time_budget,
+            max_distance=self.max_distance,
+            max_visits=self.max_visits,
+            max_time=self.max_time,
+            duration_matrix=self.duration_mat_df,
+            service_times=self.service_times,
+            vehicle_classes=self.vehicle_classes
         )
+        self.horizon = HorizonState.from_demand(self.code_table, self.demand_dict)
+        self.horizon.mark_visited_codes(visited_nodes)
+
+        if not save_reports:
+            return visited_nodes, route_dict
 
         # Create output directories
         self._create_output_directories()
 
         # Print and save summary
-        summary_file = f"output/summaries/day_{day + 1}_summary.txt"
+        self._publish('report', day=day + 1)
+        summary_file = self._output_path("summaries", f"day_{day + 1}_summary.txt")
         print_route_summary(route_dict, self.use_distance, file_path=summary_file)
 
         # Save detailed route information to CSV
-        csv_file = f"output/csv/day_{day + 1}_routes.csv"
-        save_route_details_to_csv(self.demand_df, route_dict, day, self.use_distance, file_path=csv_file)
+        save_route_details_to_csv(self.demand_df, route_dict, day, self.use_distance,
+                                  output_dir=self.output_dir)
 
-        # Visualize routes
+        # Visualize routes, writing each map straight into the output folder
         if save_visualization:
-            maps_dict = visualize_routes_per_vehicle(
-                self.master_gps_df,
-                route_dict,
-                day,
-                use_distance=self.use_distance
-            )
-
-            # Save maps to files
-            os.makedirs("output/maps", exist_ok=True)
-            for vehicle_id, m in maps_dict.items():
-                m.save(f"output/maps/day_{day + 1}_vehicle_{vehicle_id}_route.html")
+            self.render_maps(route_dict, day)
 
         # Save unvisited nodes for next-day processing
-        all_po_nodes = self.get_po_node_indices()
-        unvisited = all_po_nodes - visited_nodes
-        self._save_unvisited_nodes_to_csv(unvisited)
+        self._save_unvisited_nodes_to_csv(self.horizon.unvisited_codes())
 
         return visited_nodes, route_dict
 
-    def solve_multi_day(self, total_days=None, max_nodes=None, save_visualization=False):
+    def solve_multi_day(self, total_days=None, max_nodes=None, save_visualization=False, save_reports=True):
         """
         Solve the VRP for multiple days.
 
@@ -192,6 +266,7 @@ class VRPController:
             total_days: Number of days to plan
             max_nodes: Maximum number of nodes to visit per day
             save_visualization: Boolean indicating whether to save visualization
+            save_reports: Boolean indicating whether to write summaries and CSV files
 
         Returns:
             all_visited_nodes: List of sets of visited node indices for each day
@@ -204,7 +279,10 @@ class VRPController:
         if total_days is None:
             total_days = TOTAL_DAYS
 
-        # Solve multi-day VRP
+        # Solve multi-day VRP; the solver and OR-Tools are imported on the first solve
+        from vehi_rout.solver.vrp_solver import solve_multi_day_vrp
+
+        self.horizon = HorizonState.from_demand(self.code_table, self.demand_dict)
         all_visited_nodes, all_route_dicts = solve_multi_day_vrp(
             self.master_mat_df,
             self.demand_dict,
@@ -212,56 +290,190 @@ class VRPController:
             self.base_penalty,
             self.use_distance,
             current_date=None,
-            max_nodes_per_day=max_nodes
+            max_nodes_per_day=max_nodes,
+            progress=self.progress,
+            cancel_token=self.cancel_token,
+            time_budget=self.time_budget,
+            max_distance=self.max_distance,
+            max_visits=self.max_visits,
+            max_time=self.max_time,
+            duration_matrix=self.duration_mat_df,
+            service_times=self.service_times,
+            vehicle_classes=self.vehicle_classes,
+            horizon=self.horizon
         )
 
+        if not save_reports:
+            return all_visited_nodes, all_route_dicts
+
         # Create output directories
         self._create_output_directories()
 
         # Create a combined CSV for all days
-        combined_csv_path = f"output/csv/all_days_routes.csv"
+        combined_csv_path = self._output_path("csv", "all_days_routes.csv")
         import csv
         with open(combined_csv_path, 'w', newline='') as csvfile:
-            metric_name = "distance" if self.use_distance else "time"
-            unit = "km" if self.use_distance else "mins"
-            fieldnames = ['Day', 'Vehicle', 'Stops', f'{metric_name.capitalize()} ({unit})',
-                         f'Max {metric_name.capitalize()} ({unit})', 'Within Limit', 'Route']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.DictWriter(csvfile, fieldnames=self._combined_csv_fieldnames())
             writer.writeheader()
 
         # Process each day
         for day, route_dict in enumerate(all_route_dicts):
-            print(f"\n=== Day {day + 1} ===")
+            logger.info("Writing reports for day %d", day + 1)
+            self._publish('report', day=day + 1)
 
             # Print and save summary
-            summary_file = f"output/summaries/day_{day + 1}_summary.txt"
+            summary_file = self._output_path("summaries", f"day_{day + 1}_summary.txt")
             print_route_summary(route_dict, self.use_distance, file_path=summary_file)
 
             # Save detailed route information to CSV
-            csv_file = f"output/csv/day_{day + 1}_routes.csv"
-            save_route_details_to_csv(route_dict, day, self.use_distance, file_path=csv_file)
+            save_route_details_to_csv(self.demand_df, route_dict, day, self.use_distance,
+                                      output_dir=self.output_dir)
 
             # Append to combined CSV
             self._append_to_combined_csv(route_dict, day, combined_csv_path)
 
-            # Visualize routes
+            # Visualize routes, writing each map straight into the output folder
             if save_visualization:
-                maps_dict = visualize_routes_per_vehicle(
-                    self.master_gps_df,
-                    route_dict,
-                    day,
-                    use_distance=self.use_distance
-                )
-
-                # Save maps to files
-                for vehicle_id, m in maps_dict.items():
-                    m.save(f"output/maps/day_{day + 1}_vehicle_{vehicle_id}_route.html")
+                self.render_maps(route_dict, day)
 
         # Create a multi-day summary
-        self._save_multi_day_summary(all_route_dicts, all_visited_nodes)
+        self._save_multi_day_summary(all_route_dicts, self.horizon)
 
         return all_visited_nodes, all_route_dicts
 
+    def render_maps(self, route_dict, day):
+        """
+        Write the route maps of one day into the output folder.
+
+        Args:
+            route_dict: Dictionary containing route information for each vehicle
+            day: Day index (0-based)
+        """
+        self._publish('maps', day=day + 1)
+        visualize_routes_per_vehicle(
+            self.master_gps_df,
+            route_dict,
+            day,
+            use_distance=self.use_distance,
+            output_dir=self.output_dir
+        )
+
+    def sweep_fleet(self, fleets, day=0, max_nodes=None, time_limit=None, workers=None,
+                    mp_context=None, save_reports=True):
+        """
+        Solve the same day with many fleet configurations in parallel.
+
+        The data model is built once and shared with the worker processes; each
+        fleet only replaces the vehicle limits. Use fleet_grid from
+        vehi_rout.core.sweep to build a grid of uniform fleets.
+
+        Args:
+            fleets: List of fleet configurations, each with num_vehicles, max_visits
+                and max_distance (or max_time when routing by time), and optionally a name.
+                With a duration matrix loaded, fleets may also give the other limit;
+                otherwise each vehicle gets the controller's largest limit of that metric.
+                Fleets may also give vehicle_classes for restricted roads.
+            day: Day index (0-based)
+            max_nodes: Maximum number of nodes to visit
+            time_limit: Search time limit in seconds per fleet; defaults to the
+                controller's time budget
+            workers: Number of worker processes, defaults to the number of CPUs
+            mp_context: Multiprocessing start method, defaults to the platform default
+            save_reports: Boolean indicating whether to write the table to csv/fleet_sweep.csv
+
+        Returns:
+            DataFrame: One row per fleet with stops served, total distance or time,
+                unvisited PO stores, vehicles used and solve time
+        """
+        if self.demand_df is None or self.master_mat_df is None or self.master_gps_df is None:
+            raise ValueError("Data not loaded. Call load_data() first.")
+
+        metric_name = "distance" if self.use_distance else "time"
+        limit_key = "max_distance" if self.use_distance else "max_time"
+        for fleet in fleets:
+            if len(fleet['max_visits']) != fleet['num_vehicles'] or len(fleet[limit_key]) != fleet['num_vehicles']:
+                raise ValueError(f"Length of max_visits and {limit_key} must match num_vehicles")
+
+        # Fill in the limit of the other metric when both are enforced
+        if self.duration_mat_df is not None:
+            other_metric = "time" if self.use_distance else "distance"
+            other_limit = max(self._vehicle_limits(other_metric))
+            fleets = [fleet if f"max_{other_metric}" in fleet
+                      else dict(fleet, **{f"max_{other_metric}": [other_limit] * fleet['num_vehicles']})
+                      for fleet in fleets]
+
+        # Build the data model once; vehicle limits are replaced per fleet
+        import vehi_rout.config as config
+        from vehi_rout.core.sweep import run_fleet_sweep
+
+        first = fleets[0]
+        data = create_data_model(
+            full_matrix=self.master_mat_df,
+            nodes_to_visit=self._select_nodes(max_nodes),
+            demand_dict=self.demand_dict,
+            penalty_list=self.penalty_list,
+            use_distance=self.use_distance,
+            max_distance=first.get('max_distance', self._vehicle_limits('distance')),
+            max_time=first.get('max_time', self._vehicle_limits('time')),
+            max_visits=first['max_visits'],
+            duration_matrix=self.duration_mat_df,
+            service_times=self.service_times,
+            vehicle_classes=self.vehicle_classes if self.vehicle_classes is not None else config.VEHICLE_CLASSES,
+            restricted_roads=config.RESTRICTED_ROADS,
+            candidate_neighbours=config.CANDIDATE_NEIGHBOURS
+        )
+
+        results = run_fleet_sweep(
+            data,
+            fleets,
+            day=day,
+            use_distance=self.use_distance,
+            time_limit=time_limit if time_limit is not None else self.time_budget,
+            workers=workers,
+            mp_context=mp_context
+        )
+
+        po_nodes = self.get_po_node_indices()
+        rows = []
+        for index, (fleet, (visited_nodes, route_dict, solve_seconds)) in enumerate(zip(fleets, results)):
+            stats = summarize_routes([route_dict], [visited_nodes], po_nodes, self.use_distance)
+            rows.append({
+                'scenario': fleet.get('name', f"fleet_{index + 1}"),
+                'num_vehicles': fleet['num_vehicles'],
+                'max_visits': ' '.join(map(str, fleet['max_visits'])),
+                limit_key: ' '.join(map(str, fleet[limit_key])),
+                'stops_served': stats['total_stops'],
+                f'total_{metric_name}': stats['total_metric'],
+                'unvisited_count': stats['unvisited_count'],
+                'vehicles_used': sum(1 for info in route_dict.values() if info.get('num_visits', 0) > 0),
+                'within_limits': all(info.get('within_limit', False) for info in route_dict.values()),
+                'solve_seconds': solve_seconds
+            })
+
+        sweep_df = pd.DataFrame(rows)
+
+        if save_reports:
+            self._create_output_directories()
+            sweep_file = self._output_path("csv", "fleet_sweep.csv")
+            sweep_df.to_csv(sweep_file, index=False)
+            logger.info("Fleet sweep saved to %s", sweep_file)
+
+        return sweep_df
+
+    def _select_nodes(self, max_nodes=None):
+        """
+        Select the PO stores a day may visit.
+
+        Args:
+            max_nodes: Maximum number of nodes, most urgent per km first
+                (see select_po_nodes)
+
+        Returns:
+            list: Sorted list of node indices
+        """
+        return select_po_nodes(self.master_mat_df, self.demand_dict, self.penalty_list, max_nodes)
+
+    @timed('report')
     def _append_to_combined_csv(self, route_dict, day, file_path):
         """
         Append route information to a combined CSV file.
@@ -273,59 +485,85 @@ class VRPController:
         """
         import csv
 
-        metric_name = "distance" if self.use_distance else "time"
-        unit = "km" if self.use_distance else "mins"
-
         with open(file_path, 'a', newline='') as csvfile:
-            fieldnames = ['Day', 'Vehicle', 'Stops', f'{metric_name.capitalize()} ({unit})',
-                         f'Max {metric_name.capitalize()} ({unit})', 'Within Limit', 'Route']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.DictWriter(csvfile, fieldnames=self._combined_csv_fieldnames())
 
             for vehicle_id, route_info in route_dict.items():
-                route_metric = route_info.get(f"route_{metric_name}", 0)
-                num_visits = route_info.get("num_visits", 0)
-                max_metric = route_info.get(f"max_{metric_name}_limit", 0)
-                within_limit = route_info.get("within_limit", False)
-                route_nodes = ' -> '.join(map(str, route_info.get("route_nodes", [])))
-
-                writer.writerow({
+                row = {
                     'Day': day + 1,
                     'Vehicle': vehicle_id,
-                    'Stops': num_visits,
-                    f'{metric_name.capitalize()} ({unit})': route_metric,
-                    f'Max {metric_name.capitalize()} ({unit})': max_metric,
-                    'Within Limit': 'Yes' if within_limit else 'No',
-                    'Route': route_nodes
-                })
+                    'Stops': route_info.get("num_visits", 0),
+                    'Within Limit': 'Yes' if route_info.get("within_limit", False) else 'No',
+                    'Route': ' -> '.join(map(str, route_info.get("route_nodes", [])))
+                }
+                for metric_name in self._metric_names():
+                    unit = METRIC_UNITS[metric_name]
+                    row[f'{metric_name.capitalize()} ({unit})'] = route_info.get(f"route_{metric_name}", 0)
+                    row[f'Max {metric_name.capitalize()} ({unit})'] = route_info.get(f"max_{metric_name}_limit", 0)
+                if "time" in self._metric_names():
+                    row['Arrival Times'] = format_arrival_times(route_info.get("arrival_times", []), ROUTE_START_TIME)
+                writer.writerow(row)
+
+    def _metric_names(self):
+        """
+        List the metrics reported for each route, the minimised metric first.
+
+        Returns:
+            list: Metric names ('distance', 'time')
+        """
+        primary = "distance" if self.use_distance else "time"
+        if self.duration_mat_df is None:
+            return [primary]
+        return [primary] + [name for name in METRIC_UNITS if name != primary]
+
+    def _combined_csv_fieldnames(self):
+        """Return the columns of the combined multi-day routes CSV."""
+        fieldnames = ['Day', 'Vehicle', 'Stops']
+        for metric_name in self._metric_names():
+            unit = METRIC_UNITS[metric_name]
+            fieldnames += [f'{metric_name.capitalize()} ({unit})', f'Max {metric_name.capitalize()} ({unit})']
+        fieldnames += ['Within Limit', 'Route']
+        if "time" in self._metric_names():
+            fieldnames.append('Arrival Times')
+        return fieldnames
+
+    def _vehicle_limits(self, metric_name):
+        """
+        Get the per-vehicle limits this controller solves with.
+
+        Args:
+            metric_name: 'distance' or 'time'
 
-    def _save_multi_day_summary(self, all_route_dicts, all_visited_nodes):
+        Returns:
+            list: Limits in km or minutes per vehicle
+        """
+        import vehi_rout.config as config
+
+        if metric_name == "distance":
+            return self.max_distance if self.max_distance is not None else config.MAX_DISTANCE_PER_VEHICLE
+        return self.max_time if self.max_time is not None else config.MAX_TIME_PER_VEHICLE
+
+    def _save_multi_day_summary(self, all_route_dicts, horizon):
         """
         Save a summary of the multi-day routing and create a next-day demand file.
 
         Args:
             all_route_dicts: List of dictionaries containing route information for each day
-            all_visited_nodes: List of sets of visited node indices for each day
+            horizon: HorizonState with the PO stores visited on each day
         """
-        metric_name = "distance" if self.use_distance else "time"
-        unit = "km" if self.use_distance else "mins"
-
         # Calculate total metrics
-        total_metric = 0
+        metric_names = self._metric_names()
+        total_metrics = dict.fromkeys(metric_names, 0)
         total_visits = 0
 
         for route_dict in all_route_dicts:
             for vehicle_id, route_info in route_dict.items():
-                total_metric += route_info.get(f"route_{metric_name}", 0)
+                for metric_name in metric_names:
+                    total_metrics[metric_name] += route_info.get(f"route_{metric_name}", 0)
                 total_visits += route_info.get("num_visits", 0)
 
-        # Calculate visited and unvisited nodes
-        all_visited = set()
-        for visited in all_visited_nodes:
-            all_visited.update(visited)
-
-        # Get all nodes from the demand data (PO file) instead of master data
-        all_po_nodes = self.get_po_node_indices()
-        unvisited = all_po_nodes - all_visited
+        # Visited and unvisited PO stores, from the horizon's masks
+        unvisited = horizon.unvisited_codes()
 
         # Create summary lines
         summary_lines = []
@@ -334,13 +572,14 @@ class VRPController:
         summary_lines.append(f"Total days: {len(all_route_dicts)}")
         summary_lines.append(f"Total vehicles: {len(all_route_dicts[0]) if all_route_dicts else 0}")
         summary_lines.append(f"Total stops: {total_visits}")
-        summary_lines.append(f"Total {metric_name}: {total_metric} {unit}")
-        summary_lines.append(f"Total nodes visited: {len(all_visited)}")
+        for metric_name, total_metric in total_metrics.items():
+            summary_lines.append(f"Total {metric_name}: {round(total_metric, 2)} {METRIC_UNITS[metric_name]}")
+        summary_lines.append(f"Total nodes visited: {horizon.visited_count}")
         summary_lines.append(f"Total nodes unvisited: {len(unvisited)}")
         summary_lines.append(f"-" * 50)
 
         # Save to file
-        summary_file = "output/summaries/multi_day_summary.txt"
+        summary_file = self._output_path("summaries", "multi_day_summary.txt")
         with open(summary_file, 'w') as f:
             for line in summary_lines:
                 f.write(line + '\n')
@@ -348,58 +587,111 @@ class VRPController:
             # Add unvisited nodes if any
             if unvisited:
                 f.write(f"\nUnvisited nodes:\n")
-                unvisited_codes = [self.master_mat_df.index[i] for i in unvisited if i < len(self.master_mat_df.index)]
-                for i, code in enumerate(unvisited_codes):
+                for i, code in enumerate(unvisited):
                     f.write(f"{code}")
                     if (i + 1) % 10 == 0:  # 10 codes per line
                         f.write("\n")
                     else:
                         f.write(", ")
 
-        print(f"Multi-day summary saved to {summary_file}")
+        logger.info("Multi-day summary saved to %s", summary_file)
 
         # Save unvisited nodes to a CSV file for next-day processing
         self._save_unvisited_nodes_to_csv(unvisited)
 
+    def _publish(self, stage, **data):
+        """
+        Publish a progress event if a progress channel is attached.
+
+        Args:
+            stage: Pipeline stage
+            **data: Event payload
+        """
+        if self.progress is not None:
+            self.progress.publish(stage, **data)
+
+    @property
+    def cancelled(self):
+        """Return True if the last solve was stopped by cancellation."""
+        return self.cancel_token is not None and self.cancel_token.cancelled
+
     def _create_output_directories(self):
         """
         Create output directories for saving results.
         """
-        os.makedirs("output", exist_ok=True)
-        os.makedirs("output/summaries", exist_ok=True)
-        os.makedirs("output/csv", exist_ok=True)
-        os.makedirs("output/maps", exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        os.makedirs(os.path.join(self.output_dir, "summaries"), exist_ok=True)
+        os.makedirs(os.path.join(self.output_dir, "csv"), exist_ok=True)
+        os.makedirs(os.path.join(self.output_dir, "maps"), exist_ok=True)
 
-    def get_po_node_indices(self):
+    def _output_path(self, kind, filename):
+        """
+        Build the path of an output artifact under the controller's output root.
+
+        Args:
+            kind: Artifact sub-folder ('summaries', 'csv' or 'maps')
+            filename: Name of the file
+
+        Returns:
+            str: Path of the artifact
+        """
+        return os.path.join(self.output_dir, kind, filename)
+
+    @property
+    def spatial_index(self):
+        """SpatialIndex over the stores of the loaded GPS data, built on first use."""
+        if self._spatial_index is None:
+            if self.master_gps_df is None:
+                raise ValueError("Data not loaded. Call load_data() first.")
+            self._spatial_index = SpatialIndex(stores_only(self.master_gps_df))
+        return self._spatial_index
+
+    def stores_near(self, lat, lon, radius_km=None, k=None):
         """
-        Get the indices of nodes in the purchase order (PO) file.
+        Find the stores near a point.
+
+        Args:
+            lat: Latitude of the point
+            lon: Longitude of the point
+            radius_km: Only stores within this great-circle distance (optional)
+            k: Only the k nearest stores (optional); with radius_km, the k
+                nearest within the radius
 
         Returns:
-            set: Set of node indices from the PO file
+            DataFrame: Stores nearest first, with their distance_km
         """
-        po_node_indices = []
-        for code in self.demand_dict['key']:
-            if code in self.master_mat_df.index:
-                idx = self.master_mat_df.index.get_loc(code)
-                po_node_indices.append(str(code))
+        if radius_km is not None:
+            distances, positions = self.spatial_index.within_radius(lat, lon, radius_km)[0]
+            distances, positions = distances[:k], positions[:k]
+        else:
+            distances, positions = self.spatial_index.nearest(lat, lon, k=k or 1)
+            distances, positions = distances[0], positions[0]
+        return self.spatial_index.records(positions, distances)
 
-        return set(po_node_indices)
+    def get_po_node_indices(self):
+        """
+        Get the stores of the purchase order (PO) file that are in the matrix.
 
+        Returns:
+            set: Set of store codes from the PO file
+        """
+        ids = self.demand_dict['ids']
+        return set(self.code_table.codes(np.unique(ids[ids > 0])))
+
+    @timed('report')
     def _save_unvisited_nodes_to_csv(self, unvisited):
         """
         Save unvisited nodes to a CSV file for next-day processing.
 
         Args:
-            unvisited: Set of unvisited node indices
+            unvisited: Codes of the unvisited stores
         """
         import pandas as pd
 
-        # Get the unvisited node codes
-        # unvisited_codes = [self.master_mat_df.index[i] for i in unvisited if i < len(self.master_mat_df.index)]
         unvisited_codes = list(unvisited)
 
         if not unvisited_codes:
-            print("No unvisited nodes to save for next day.")
+            logger.info("No unvisited nodes to save for next day")
             return
 
         # Create a DataFrame with the unvisited nodes
@@ -412,7 +704,7 @@ class VRPController:
             next_day_df = self.demand_df[self.demand_df['CODE'].astype(str).isin(unvisited_codes_set)].copy()
 
         if next_day_df.empty:
-            print("Warning: Could not find demand data for unvisited nodes.")
+            logger.warning("Could not find demand data for unvisited nodes")
             # Create a simple DataFrame with just the codes
             next_day_df = pd.DataFrame({'CODE': unvisited_codes})
             
@@ -420,11 +712,12 @@ class VRPController:
             next_day_df.drop(columns=['DEMAND'], inplace=True)
 
         # Save to CSV
-        next_day_file = "output/csv/next_day_demand.csv"
+        next_day_file = self._output_path("csv", "next_day_demand.csv")
         next_day_df.to_csv(next_day_file, index=False)
-        print(f"Saved {len(next_day_df)} unvisited nodes to {next_day_file} for next-day processing.")
+        logger.info("Saved %d unvisited nodes to %s for next-day processing", len(next_day_df), next_day_file)
 
-    def update_vehicle_config(self, num_vehicles, max_visits, max_distance):
+    def update_vehicle_config(self, num_vehicles, max_visits, max_distance, max_time=None,
+                              vehicle_classes=None):
         """
         Update the vehicle configuration parameters.
 
@@ -432,26 +725,25 @@ class VRPController:
             num_vehicles: Number of vehicles
             max_visits: List of maximum visits per vehicle
             max_distance: List of maximum distance per vehicle
+            max_time: List of maximum time per vehicle (optional); used when
+                routing by time or with a duration matrix loaded
+            vehicle_classes: List of class names per vehicle (optional), matched
+                against RESTRICTED_ROADS; vehicles not listed are 'standard'
         """
         # Validate inputs
         if len(max_visits) != num_vehicles or len(max_distance) != num_vehicles:
             raise ValueError("Length of max_visits and max_distance must match num_vehicles")
-    
-
-
-        # Create new lists with the correct length
-        new_max_visits = max_visits.copy()
-        new_max_distance = max_distance.copy()
-        
-        self.max_distance = new_max_distance
-        self.max_visits = new_max_visits
-
-        # Update the configuration in the config module
-        import vehi_rout.config as config
-        config.MAX_VISITS_PER_VEHICLE = new_max_visits
-        config.MAX_DISTANCE_PER_VEHICLE = new_max_distance
-
-        print(f"Updated vehicle configuration:")
-        print(f"Number of vehicles: {num_vehicles}")
-        print(f"Max visits per vehicle: {new_max_visits}")
-        print(f"Max distance per vehicle: {new_max_distance}")
+        if max_time is not None and len(max_time) != num_vehicles:
+            raise ValueError("Length of max_time must match num_vehicles")
+        if max_time is not None:
+            self.max_time = list(max_time)
+        if vehicle_classes is not None:
+            self.vehicle_classes = list(vehicle_classes)
+
+        # Limits are kept on the controller only, so controllers solving in
+        # parallel threads never see each other's configuration
+        self.max_distance = list(max_distance)
+        self.max_visits = list(max_visits)
+
+        logger.info("Updated vehicle configuration: %d vehicles, max visits %s, max distance %s",
+                    num_vehicles, self.max_visits, self.max_distance)
@@ -0,0 +1,226 @@
+"""
+Batch solving for the Vehicle Routing Problem.
+Solves many demand files or what-if scenarios in parallel worker processes
+against one copy of the master data and writes a comparison report.
+"""
+
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from vehi_rout.config import (
+    MAX_VISITS_PER_VEHICLE,
+    MAX_DISTANCE_PER_VEHICLE,
+    MAX_TIME_PER_VEHICLE
+)
+from vehi_rout.controller import VRPController
+from vehi_rout.utils.data_utils import get_demand_df, get_master_data
+from vehi_rout.utils.helper_utils import fleet_limits
+from vehi_rout.utils.route_utils import summarize_routes
+from vehi_rout.core.log_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Name of the consolidated report written to the batch output folder
+COMPARISON_FILE = "batch_comparison.csv"
+
+# Column order of the comparison report
+COMPARISON_COLUMNS = [
+    'scenario', 'demand_path', 'status', 'use_time', 'multi_day', 'days', 'num_vehicles',
+    'orders', 'po_stores', 'nodes_visited', 'unvisited_count', 'total_stops', 'total_metric',
+    'metric_unit', 'vehicles_used', 'solve_seconds', 'output_dir', 'error'
+]
+
+# Count columns of the comparison report, kept as integers when some scenarios failed
+_COUNT_COLUMNS = ['orders', 'po_stores', 'nodes_visited', 'unvisited_count', 'total_stops', 'vehicles_used']
+
+# Master data of a worker process, set once by the pool initializer
+_worker_master = None
+
+
+def _init_worker(master_mat_df, master_gps_df):
+    """
+    Keep the master data in a worker process.
+
+    With the 'fork' start method the DataFrames are inherited from the parent
+    and shared copy-on-write; with 'spawn' they are pickled once per worker
+    instead of once per scenario.
+
+    Args:
+        master_mat_df: DataFrame containing the distance/time matrix
+        master_gps_df: DataFrame containing the GPS coordinates
+    """
+    global _worker_master
+    _worker_master = (master_mat_df, master_gps_df)
+    configure_logging()
+
+
+def make_scenario(demand_path, name=None, **options):
+    """
+    Build a batch scenario for a demand file.
+
+    Args:
+        demand_path: Path to the PO file
+        name: Scenario name, defaults to the file name without extension
+        **options: Solve options (use_time, multi_day, days, max_nodes,
+            time_budget, num_vehicles, max_visits, max_distance, max_time)
+
+    Returns:
+        dict: The scenario
+    """
+    if name is None:
+        name = os.path.splitext(os.path.basename(demand_path))[0]
+    scenario = {'name': name, 'demand_path': demand_path}
+    scenario.update((key, value) for key, value in options.items() if value is not None)
+    return scenario
+
+
+def solve_scenario(scenario, output_dir, matrix_path=None, gps_path=None, save_visualization=False):
+    """
+    Solve one scenario and summarize the result.
+
+    Runs inside a worker process. The master data set up by the pool
+    initializer is used, or loaded from the given paths when the scenario
+    runs outside a pool.
+
+    Args:
+        scenario: Scenario dictionary as built by make_scenario
+        output_dir: Batch output folder; the scenario writes to a sub-folder of its name
+        matrix_path: Path to the distance/time matrix file (without a pool)
+        gps_path: Path to the GPS coordinates file (without a pool)
+        save_visualization: Boolean indicating whether to save route maps
+
+    Returns:
+        dict: One row of the comparison report
+    """
+    use_time = bool(scenario.get('use_time', False))
+    multi_day = bool(scenario.get('multi_day', False))
+    days = int(scenario.get('days', 1)) if multi_day else 1
+    num_vehicles = int(scenario.get('num_vehicles', len(MAX_VISITS_PER_VEHICLE)))
+    scenario_dir = os.path.join(output_dir, scenario['name'])
+    row = {
+        'scenario': scenario['name'],
+        'demand_path': scenario['demand_path'],
+        'use_time': use_time,
+        'multi_day': multi_day,
+        'days': days,
+        'num_vehicles': num_vehicles,
+        'metric_unit': 'mins' if use_time else 'km',
+        'output_dir': scenario_dir
+    }
+
+    started = time.perf_counter()
+    try:
+        if not os.path.isfile(scenario['demand_path']):
+            raise FileNotFoundError(f"Demand file not found: {scenario['demand_path']}")
+
+        if _worker_master is not None:
+            master_mat_df, master_gps_df = _worker_master
+        else:
+            master_mat_df, master_gps_df = get_master_data(matrix_path, gps_path)
+
+        controller = VRPController(
+            use_distance=not use_time,
+            output_dir=scenario_dir,
+            time_budget=scenario.get('time_budget')
+        )
+        controller.update_vehicle_config(
+            num_vehicles=num_vehicles,
+            max_visits=list(scenario.get('max_visits', fleet_limits(MAX_VISITS_PER_VEHICLE, num_vehicles))),
+            max_distance=list(scenario.get('max_distance', fleet_limits(MAX_DISTANCE_PER_VEHICLE, num_vehicles))),
+            max_time=list(scenario.get('max_time', fleet_limits(MAX_TIME_PER_VEHICLE, num_vehicles)))
+        )
+        controller.set_data(get_demand_df(today_path=scenario['demand_path']),
+                            master_mat_df, master_gps_df)
+
+        if multi_day:
+            all_visited_nodes, all_route_dicts = controller.solve_multi_day(
+                total_days=days,
+                max_nodes=scenario.get('max_nodes'),
+                save_visualization=save_visualization
+            )
+        else:
+            visited_nodes, route_dict = controller.solve_single_day(
+                day=0,
+                max_nodes=scenario.get('max_nodes'),
+                save_visualization=save_visualization
+            )
+            all_visited_nodes, all_route_dicts = [visited_nodes], [route_dict]
+
+        po_nodes = controller.get_po_node_indices()
+        row.update(summarize_routes(all_route_dicts, all_visited_nodes, po_nodes, controller.use_distance))
+        row.update(
+            status='completed',
+            orders=len(controller.demand_df),
+            po_stores=len(po_nodes),
+            vehicles_used=max(
+                (sum(1 for info in routes.values() if info.get('num_visits', 0) > 0)
+                 for routes in all_route_dicts),
+                default=0
+            )
+        )
+    except Exception as e:
+        row.update(status='failed', error=str(e))
+
+    row['solve_seconds'] = round(time.perf_counter() - started, 2)
+    return row
+
+
+def run_batch(scenarios, matrix_path, gps_path, output_dir="output/batch", workers=None,
+              save_visualization=False, mp_context=None):
+    """
+    Solve scenarios in parallel and write the comparison report.
+
+    The master data is parsed once in this process and handed to each worker
+    when the pool starts. Failed scenarios are reported in the comparison
+    rather than stopping the batch.
+
+    Args:
+        scenarios: List of scenario dictionaries as built by make_scenario
+        matrix_path: Path to the distance/time matrix file
+        gps_path: Path to the GPS coordinates file
+        output_dir: Folder for the scenario outputs and the comparison report
+        workers: Number of worker processes, defaults to the number of CPUs;
+            1 solves the scenarios in this process
+        save_visualization: Boolean indicating whether to save route maps
+        mp_context: Multiprocessing start method ('fork', 'spawn', ...), defaults
+            to the platform default
+
+    Returns:
+        DataFrame: The comparison report, one row per scenario in input order
+    """
+    names = [scenario['name'] for scenario in scenarios]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Scenario names must be unique: {', '.join(duplicates)}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    master_mat_df, master_gps_df = get_master_data(matrix_path, gps_path)
+
+    workers = min(workers or os.cpu_count() or 1, max(len(scenarios), 1))
+    logger.info("Solving %d scenarios with %d worker(s)", len(scenarios), workers)
+
+    if workers == 1:
+        rows = [solve_scenario(scenario, output_dir, matrix_path, gps_path, save_visualization)
+                for scenario in scenarios]
+    else:
+        context = multiprocessing.get_context(mp_context) if mp_context else None
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(master_mat_df, master_gps_df)) as pool:
+            futures = [pool.submit(solve_scenario, scenario, output_dir,
+                                   save_visualization=save_visualization)
+                       for scenario in scenarios]
+            rows = [future.result() for future in futures]
+
+    comparison = pd.DataFrame(rows).reindex(columns=COMPARISON_COLUMNS)
+    comparison[_COUNT_COLUMNS] = comparison[_COUNT_COLUMNS].astype('Int64')
+    comparison_file = os.path.join(output_dir, COMPARISON_FILE)
+    comparison.to_csv(comparison_file, index=False)
+    logger.info("Batch comparison saved to %s", comparison_file)
+
+    return comparison
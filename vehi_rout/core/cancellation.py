@@ -0,0 +1,85 @@
+"""
+Cancellation support for the Vehicle Routing Problem.
+Lets a running solve be stopped cleanly between days and within a day.
+"""
+
+import threading
+
+# Seconds between two checks of a cancellation request kept outside the process
+DEFAULT_POLL_INTERVAL = 0.5
+
+
+class CancellationToken:
+    """Thread-safe flag used to ask a running solve to stop."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        # Bound Event.is_set: polled by OR-Tools throughout the search, so it
+        # must stay as cheap as a C call
+        self.is_cancelled = self._event.is_set
+
+    def cancel(self):
+        """Request cancellation."""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        """Return True once cancellation has been requested."""
+        return self._event.is_set()
+
+
+def watch_cancellation(cancel_token, is_requested, on_cancel=None, interval=DEFAULT_POLL_INTERVAL):
+    """
+    Cancel a token once a request made elsewhere is seen.
+
+    The search only reads the in-memory token, so a request stored outside
+    the process (e.g. by another web server worker) is polled in a daemon
+    thread and copied onto the token.
+
+    Args:
+        cancel_token: CancellationToken to cancel
+        is_requested: Callable returning True once cancellation was requested
+        on_cancel: Called once after the token was cancelled (optional)
+        interval: Seconds between two calls of is_requested
+
+    Returns:
+        threading.Event: Set it to stop watching, e.g. when the job has finished
+    """
+    stop = threading.Event()
+
+    def watch():
+        while not stop.wait(interval):
+            if is_requested():
+                cancel_token.cancel()
+                if on_cancel is not None:
+                    on_cancel()
+                return
+
+    threading.Thread(target=watch, name='cancel-watch', daemon=True).start()
+    return stop
+
+
+def add_cancellation_callback(routing, cancel_token):
+    """
+    Stop a routing search as soon as cancellation is requested.
+
+    A search limit checks the token throughout the search, so a cancel also
+    takes effect before the first solution is found. The check on every new
+    solution finishes the search with the best solution found so far, so the
+    caller still gets a usable plan.
+
+    Args:
+        routing: OR-Tools routing model
+        cancel_token: CancellationToken to watch
+
+    Returns:
+        The search limit; keep a reference to it until the search has finished
+    """
+    def on_solution():
+        if cancel_token.cancelled:
+            routing.solver().FinishCurrentSearch()
+
+    routing.AddAtSolutionCallback(on_solution)
+    limit = routing.solver().CustomLimit(cancel_token.is_cancelled)
+    routing.AddSearchMonitor(limit)
+    return limit
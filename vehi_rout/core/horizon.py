@@ -0,0 +1,118 @@
+"""
+Visited and remaining stores over a planning horizon.
+Tracks the PO stores as boolean masks over the dense node ids of the code
+table, so marking stores visited and asking which are left are array
+operations instead of set arithmetic on store codes.
+"""
+
+import numpy as np
+
+from vehi_rout.utils.code_table import demand_ids
+
+
+class HorizonState:
+    """
+    PO stores, the stores visited on each day and the stores still to visit.
+
+    Masks are indexed by node id (the position of a store in the master
+    matrix). The depot, id 0, is never a PO store, so it never counts as
+    visited or remaining.
+    """
+
+    def __init__(self, code_table, po_ids):
+        """
+        Args:
+            code_table: CodeTable of the master matrix
+            po_ids: Ids of the PO stores; MISSING ids and the depot are ignored
+        """
+        self.code_table = code_table
+        self.po = np.zeros(len(code_table), dtype=bool)
+        po_ids = np.asarray(po_ids, dtype=np.int64)
+        self.po[po_ids[po_ids > 0]] = True
+        self.visited = np.zeros(len(code_table), dtype=bool)
+        self.days = []
+
+    @classmethod
+    def from_demand(cls, code_table, demand_dict):
+        """
+        Start a horizon with the stores of a PO.
+
+        Args:
+            code_table: CodeTable of the master matrix
+            demand_dict: Dictionary containing demand information
+
+        Returns:
+            HorizonState: A horizon with no store visited yet
+        """
+        return cls(code_table, demand_ids(demand_dict, code_table))
+
+    def mark_visited(self, ids):
+        """
+        Record the stores visited on the next day.
+
+        Args:
+            ids: Node ids visited that day; the depot and non-PO nodes are ignored
+
+        Returns:
+            ndarray: Boolean mask of the PO stores visited that day
+        """
+        day = np.zeros(len(self.po), dtype=bool)
+        ids = np.asarray(list(ids) if isinstance(ids, (set, frozenset)) else ids, dtype=np.int64)
+        day[ids[ids >= 0]] = True
+        day &= self.po
+        self.visited |= day
+        self.days.append(day)
+        return day
+
+    def mark_visited_codes(self, codes):
+        """
+        Record the stores visited on the next day, given as store codes.
+
+        Args:
+            codes: Store codes visited that day, such as a visited set returned by the solver
+
+        Returns:
+            ndarray: Boolean mask of the PO stores visited that day
+        """
+        return self.mark_visited(self.code_table.ids(list(codes)))
+
+    @property
+    def remaining(self):
+        """Boolean mask of the PO stores not visited on any day yet."""
+        return self.po & ~self.visited
+
+    def remaining_ids(self):
+        """Ids of the PO stores not visited yet, in id order."""
+        return np.flatnonzero(self.remaining)
+
+    def visited_codes(self, day=None):
+        """
+        List the PO stores visited.
+
+        Args:
+            day: Day index (0-based); every day when None
+
+        Returns:
+            list: Store codes, in id order
+        """
+        mask = self.visited if day is None else self.days[day]
+        return self.code_table.codes(np.flatnonzero(mask))
+
+    def unvisited_codes(self):
+        """Store codes of the PO stores not visited on any day, in id order."""
+        return self.code_table.codes(self.remaining_ids())
+
+    @property
+    def po_count(self):
+        """Number of PO stores in the matrix."""
+        return int(self.po.sum())
+
+    @property
+    def visited_count(self):
+        """Number of PO stores visited on any day."""
+        return int(self.visited.sum())
+
+    @property
+    def unvisited_count(self):
+        """Number of PO stores not visited on any day."""
+        return int(self.remaining.sum())
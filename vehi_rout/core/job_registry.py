@@ -0,0 +1,470 @@
+"""
+Job registry for the Vehicle Routing web application.
+Keeps an indexed SQLite table of routing jobs so job listings do not have to
+scan and parse every job folder on disk. Every web server worker opens the
+same database, so it also carries the job state that a request served by
+another worker needs: cancellation requests, progress events and metrics.
+"""
+
+import os
+import json
+import logging
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Columns that /api/jobs may sort on, mapped to the SQL expression used
+SORT_COLUMNS = {
+    'timestamp': 'created_at',
+    'created_at': 'created_at',
+    'finished_at': 'finished_at',
+    'status': 'status',
+    'duration': 'duration_seconds'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    po_file TEXT,
+    status TEXT NOT NULL,
+    multi_day INTEGER,
+    use_time INTEGER,
+    days INTEGER,
+    max_nodes INTEGER,
+    num_vehicles INTEGER,
+    parameters TEXT,
+    created_at TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    duration_seconds REAL,
+    nodes_visited INTEGER,
+    total_stops INTEGER,
+    total_metric REAL,
+    unvisited_count INTEGER,
+    error TEXT,
+    info TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE TABLE IF NOT EXISTS process_metrics (
+    process_id TEXT PRIMARY KEY,
+    snapshot TEXT NOT NULL,
+    updated_at TEXT
+);
+"""
+
+# Columns added to the jobs table after its first release, with their definitions
+_ADDED_COLUMNS = {
+    'cancel_requested': 'INTEGER NOT NULL DEFAULT 0'
+}
+
+# Progress events kept per job; older ones are dropped as new ones are added
+MAX_JOB_EVENTS = 200
+
+# job_info keys that are stored in dedicated columns rather than the parameters blob
+_COLUMN_KEYS = ('job_id', 'po_file', 'status', 'multi_day', 'use_time', 'days',
+                'max_nodes', 'num_vehicles', 'timestamp', 'error')
+
+# Result columns that may be set on a status transition
+_RESULT_COLUMNS = ('nodes_visited', 'total_stops', 'total_metric', 'unvisited_count', 'error')
+
+
+class JobRegistry:
+    """SQLite-backed index of routing jobs."""
+
+    def __init__(self, db_path):
+        """
+        Initialize the registry and create the schema if needed.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            # Databases created before a column existed get it added
+            existing = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+            for column, definition in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {definition}')
+
+    def _connect(self):
+        """
+        Open a new connection; sqlite3 connections are not shared across threads.
+
+        Callers close it with contextlib.closing and use the connection itself
+        as the transaction (`with closing(self._connect()) as conn, conn:`).
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _job_row(job_info):
+        """Map a job_info dictionary onto the registry columns."""
+        parameters = {k: v for k, v in job_info.items() if k not in _COLUMN_KEYS}
+        return {
+            'job_id': job_info['job_id'],
+            'po_file': job_info.get('po_file'),
+            'status': job_info.get('status', 'initialized'),
+            'multi_day': int(bool(job_info.get('multi_day'))),
+            'use_time': int(bool(job_info.get('use_time'))),
+            'days': job_info.get('days'),
+            'max_nodes': job_info.get('max_nodes'),
+            'num_vehicles': job_info.get('num_vehicles'),
+            'parameters': json.dumps(parameters),
+            'created_at': job_info.get('timestamp'),
+            'error': job_info.get('error'),
+            'info': json.dumps(job_info)
+        }
+
+    def upsert_job(self, job_info):
+        """
+        Insert a job or refresh its stored parameters.
+
+        Args:
+            job_info: Job information dictionary as stored in job_info.json
+        """
+        row = self._job_row(job_info)
+        columns = ', '.join(row)
+        placeholders = ', '.join(f':{key}' for key in row)
+        updates = ', '.join(f'{key} = excluded.{key}' for key in row if key != 'job_id')
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f'INSERT INTO jobs ({columns}) VALUES ({placeholders}) '
+                f'ON CONFLICT(job_id) DO UPDATE SET {updates}',
+                row
+            )
+
+    def update_status(self, job_id, status, job_info=None, **results):
+        """
+        Record a status transition in a single transaction.
+
+        'running' stamps started_at; 'completed', 'failed' and 'cancelled'
+        stamp finished_at and the wall-clock duration since started_at.
+
+        Args:
+            job_id: Job identifier
+            status: New job status
+            job_info: Updated job information dictionary (optional)
+            **results: Result statistics (nodes_visited, total_stops, total_metric,
+                unvisited_count, error)
+        """
+        now = datetime.now().isoformat()
+        assignments = {'status': status}
+        if status == 'running':
+            assignments.update(started_at=now, finished_at=None, duration_seconds=None)
+        elif status in ('completed', 'failed', 'cancelled'):
+            assignments['finished_at'] = now
+        for key in _RESULT_COLUMNS:
+            if key in results:
+                assignments[key] = results[key]
+        if job_info is not None:
+            assignments['info'] = json.dumps(job_info)
+
+        set_clause = ', '.join(f'{key} = :{key}' for key in assignments)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f'UPDATE jobs SET {set_clause} WHERE job_id = :job_id',
+                         dict(assignments, job_id=job_id))
+            if 'finished_at' in assignments and assignments['finished_at'] is not None:
+                conn.execute(
+                    "UPDATE jobs SET duration_seconds = "
+                    "(julianday(finished_at) - julianday(started_at)) * 86400.0 "
+                    "WHERE job_id = ? AND started_at IS NOT NULL",
+                    (job_id,)
+                )
+
+    def start_job(self, job_id):
+        """
+        Mark a job running unless it already is, in one statement.
+
+        Any web server worker may be asked to start a job, and the job may
+        already run in another one, so this is the check that a job is not
+        queued twice. A cancellation left over from an earlier run is cleared.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            bool: True if the job was marked running, False if it already was
+                (or is not registered)
+        """
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, finished_at = NULL, "
+                "duration_seconds = NULL, cancel_requested = 0 WHERE job_id = ? AND status != 'running'",
+                (datetime.now().isoformat(), job_id)
+            )
+            return cursor.rowcount > 0
+
+    def request_cancel(self, job_id):
+        """
+        Ask a running job to stop.
+
+        The worker process that runs the job polls is_cancel_requested and
+        stops the search, wherever the request was served.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            bool: True if the job is running and now has a cancellation request
+        """
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'",
+                (job_id,)
+            )
+            return cursor.rowcount > 0
+
+    def is_cancel_requested(self, job_id):
+        """
+        Check whether a job has been asked to stop.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            bool: True if a cancellation was requested since the job was started
+        """
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute('SELECT cancel_requested FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def add_event(self, job_id, event):
+        """
+        Store a progress event of a job, keeping the latest MAX_JOB_EVENTS.
+
+        Args:
+            job_id: Job identifier
+            event: Event dictionary with a 'seq' number
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO job_events (job_id, seq, event) VALUES (?, ?, ?)',
+                         (job_id, event['seq'], json.dumps(event)))
+            conn.execute('DELETE FROM job_events WHERE job_id = ? AND seq <= ?',
+                         (job_id, event['seq'] - MAX_JOB_EVENTS))
+
+    def events_after(self, job_id, seq):
+        """
+        Get the stored progress events of a job after a sequence number.
+
+        Args:
+            job_id: Job identifier
+            seq: Sequence number of the last event already seen
+
+        Returns:
+            list: Event dictionaries in sequence order
+        """
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute('SELECT event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq',
+                                (job_id, seq)).fetchall()
+        return [json.loads(row['event']) for row in rows]
+
+    def latest_event(self, job_id):
+        """
+        Get the most recent stored progress event of a job.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            dict: The event or None if no events are stored for the job
+        """
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute('SELECT event FROM job_events WHERE job_id = ? ORDER BY seq DESC LIMIT 1',
+                               (job_id,)).fetchone()
+        return json.loads(row['event']) if row else None
+
+    def clear_events(self, job_id):
+        """
+        Drop the stored progress events of a job, e.g. before it is run again.
+
+        Args:
+            job_id: Job identifier
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM job_events WHERE job_id = ?', (job_id,))
+
+    def save_metrics(self, process_id, snapshot):
+        """
+        Store the metrics of a server process.
+
+        Args:
+            process_id: Identifier of the process
+            snapshot: Metrics snapshot as returned by metrics_snapshot
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT INTO process_metrics (process_id, snapshot, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(process_id) DO UPDATE SET snapshot = excluded.snapshot, '
+                'updated_at = excluded.updated_at',
+                (process_id, json.dumps(snapshot), datetime.now().isoformat())
+            )
+
+    def load_metrics(self):
+        """
+        Get the stored metrics of all server processes.
+
+        Returns:
+            list: Metrics snapshots, one per process
+        """
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute('SELECT snapshot FROM process_metrics').fetchall()
+        return [json.loads(row['snapshot']) for row in rows]
+
+    @staticmethod
+    def _row_to_job(row):
+        """Turn a registry row into the job dictionary returned by the API."""
+        job = json.loads(row['info']) if row['info'] else {}
+        job.update(
+            job_id=row['job_id'],
+            status=row['status'],
+            started_at=row['started_at'],
+            finished_at=row['finished_at'],
+            duration_seconds=row['duration_seconds'],
+            nodes_visited=row['nodes_visited'],
+            total_stops=row['total_stops'],
+            total_metric=row['total_metric'],
+            unvisited_count=row['unvisited_count']
+        )
+        if row['error']:
+            job['error'] = row['error']
+        return job
+
+    def get_job(self, job_id):
+        """
+        Get a single job.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            dict: Job dictionary or None if the job is unknown
+        """
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, page=1, per_page=20, status=None, date_from=None, date_to=None,
+                  sort='timestamp', order='desc'):
+        """
+        List jobs one page at a time.
+
+        Args:
+            page: 1-based page number
+            per_page: Number of jobs per page
+            status: Only return jobs with this status (optional)
+            date_from: Only return jobs created on or after this ISO date (optional)
+            date_to: Only return jobs created on or before this ISO date (optional)
+            sort: Sort key, one of SORT_COLUMNS
+            order: 'asc' or 'desc'
+
+        Returns:
+            tuple: (list of job dictionaries, total number of matching jobs)
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort jobs by '{sort}'")
+        direction = 'ASC' if str(order).lower() == 'asc' else 'DESC'
+
+        conditions = []
+        params = []
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if date_from:
+            conditions.append('created_at >= ?')
+            params.append(date_from)
+        if date_to:
+            # Dates without a time part include the whole day
+            conditions.append('created_at <= ?')
+            params.append(date_to if 'T' in date_to else f'{date_to}T23:59:59.999999')
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        page = max(int(page), 1)
+        per_page = max(int(per_page), 1)
+        with closing(self._connect()) as conn, conn:
+            total = conn.execute(f'SELECT COUNT(*) FROM jobs {where}', params).fetchone()[0]
+            rows = conn.execute(
+                f'SELECT * FROM jobs {where} ORDER BY {SORT_COLUMNS[sort]} {direction}, job_id '
+                f'LIMIT ? OFFSET ?',
+                params + [per_page, (page - 1) * per_page]
+            ).fetchall()
+
+        return [self._row_to_job(row) for row in rows], total
+
+    def count(self):
+        """Return the number of registered jobs."""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+
+    def import_job_folders(self, upload_folder):
+        """
+        Import job folders created before the registry existed.
+
+        Jobs that are already registered are left untouched, so the import can
+        be re-run safely.
+
+        Args:
+            upload_folder: Folder containing one sub-folder per job
+
+        Returns:
+            int: Number of jobs imported
+        """
+        if not os.path.isdir(upload_folder):
+            return 0
+
+        rows = []
+        for job_id in os.listdir(upload_folder):
+            info_path = os.path.join(upload_folder, job_id, 'job_info.json')
+            if not os.path.isfile(info_path):
+                continue
+            try:
+                with open(info_path, 'r') as f:
+                    job_info = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping job %s: %s", job_id, e)
+                continue
+            job_info.setdefault('job_id', job_id)
+            rows.append(self._job_row(job_info))
+
+        if not rows:
+            return 0
+
+        columns = ', '.join(rows[0])
+        placeholders = ', '.join(f':{key}' for key in rows[0])
+        with closing(self._connect()) as conn, conn:
+            before = conn.total_changes
+            conn.executemany(f'INSERT OR IGNORE INTO jobs ({columns}) VALUES ({placeholders})', rows)
+            imported = conn.total_changes - before
+
+        logger.info("Imported %d existing jobs from %s", imported, upload_folder)
+        return imported
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import existing job folders into the job registry')
+    parser.add_argument('--uploads', type=str, default='uploads',
+                        help='Folder containing one sub-folder per job')
+    parser.add_argument('--db', type=str, default='uploads/jobs.db',
+                        help='Path to the job registry database')
+    args = parser.parse_args()
+
+    from vehi_rout.core.log_config import configure_logging
+    configure_logging()
+    JobRegistry(args.db).import_job_folders(args.uploads)
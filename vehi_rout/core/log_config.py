@@ -0,0 +1,76 @@
+"""
+Logging setup for the Vehicle Routing Problem.
+Package modules log through per-module loggers (logging.getLogger(__name__));
+configure_logging routes them through a queue so that the solver and request
+threads never block on writing to the output stream.
+"""
+
+import os
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+
+import vehi_rout.config as config
+
+# Logger that all package loggers propagate to
+PACKAGE_LOGGER = "vehi_rout"
+
+_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+_owner_pid = None
+
+
+def configure_logging(level=None, stream=None, fmt=None):
+    """
+    Send package log records through a queue to a background writer.
+
+    Safe to call more than once; later calls only change the level. A forked
+    worker process inherits the parent's queue handler but not its writer
+    thread, so calling this again in the child sets up its own.
+
+    Args:
+        level: Log level name or number; defaults to LOG_LEVEL
+        stream: Stream to write to; defaults to sys.stderr
+        fmt: Log record format; defaults to LOG_FORMAT
+
+    Returns:
+        logging.Logger: The package logger
+    """
+    global _listener, _queue_handler, _owner_pid
+
+    logger = logging.getLogger(PACKAGE_LOGGER)
+    with _lock:
+        logger.setLevel(level or config.LOG_LEVEL)
+        if _listener is not None and _owner_pid == os.getpid():
+            return logger
+
+        if _queue_handler is not None:
+            logger.removeHandler(_queue_handler)
+
+        log_queue = queue.SimpleQueue()
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(logging.Formatter(fmt or config.LOG_FORMAT))
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+
+        _queue_handler = logging.handlers.QueueHandler(log_queue)
+        logger.addHandler(_queue_handler)
+        logger.propagate = False
+        _owner_pid = os.getpid()
+
+    atexit.register(stop_logging)
+    return logger
+
+
+def stop_logging():
+    """Write out queued log records and stop the background writer."""
+    global _listener
+
+    with _lock:
+        if _listener is not None and _owner_pid == os.getpid():
+            _listener.stop()
+        _listener = None
@@ -0,0 +1,439 @@
+"""
+Metrics for the Vehicle Routing Problem.
+Records pipeline stage durations, solver results and cache hit counts, both
+process-wide for the Prometheus /metrics endpoint and per job for job_info.json.
+Process-wide metrics can be snapshotted and added up across processes, so
+several web server workers report one set of metrics.
+"""
+
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Upper bounds (in seconds) of the stage duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Upper bounds of the solver objective histogram buckets
+OBJECTIVE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+# Upper bounds of the model size histogram buckets (nodes including the depot)
+NODE_BUCKETS = (10, 25, 50, 100, 200, 300, 500, 1000, 2000)
+
+
+def _format_labels(labelnames, values, extra=None):
+    """Format a Prometheus label set."""
+    pairs = list(zip(labelnames, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    """Format a sample value the way Prometheus expects."""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        self.updates = 0
+
+    def inc(self, amount=1, **labels):
+        """
+        Increase the counter.
+
+        Args:
+            amount: Amount to add
+            **labels: Label values
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            self.updates += 1
+
+    def snapshot(self):
+        """Return the counter values as a JSON-serialisable list of [labels, value]."""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def reset(self):
+        """Drop all recorded values."""
+        with self._lock:
+            self._values = {}
+
+    def samples(self, snapshots=None):
+        """
+        Return the counter in the Prometheus text format.
+
+        Args:
+            snapshots: Snapshots of the counter to add up, e.g. one per
+                process; defaults to the values of this process
+        """
+        if snapshots is None:
+            snapshots = [self.snapshot()]
+        values = {}
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                values[tuple(key)] = values.get(tuple(key), 0) + value
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets and optional labels."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        self.updates = 0
+
+    def observe(self, value, **labels):
+        """
+        Record an observation.
+
+        Args:
+            value: Observed value
+            **labels: Label values
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            state['counts'][index] += 1
+            state['sum'] += value
+            self.updates += 1
+
+    def snapshot(self):
+        """Return the histogram as a JSON-serialisable list of [labels, bucket counts, sum]."""
+        with self._lock:
+            return [[list(key), list(state['counts']), state['sum']] for key, state in self._values.items()]
+
+    def reset(self):
+        """Drop all recorded observations."""
+        with self._lock:
+            self._values = {}
+
+    def samples(self, snapshots=None):
+        """
+        Return the histogram in the Prometheus text format.
+
+        Args:
+            snapshots: Snapshots of the histogram to add up, e.g. one per
+                process; defaults to the observations of this process
+        """
+        if snapshots is None:
+            snapshots = [self.snapshot()]
+        values = {}
+        for snapshot in snapshots:
+            for key, counts, total in snapshot:
+                state = values.setdefault(tuple(key), [[0] * (len(self.buckets) + 1), 0.0])
+                state[0] = [merged + count for merged, count in zip(state[0], counts)]
+                state[1] += total
+
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """
+        Add a metric to the registry.
+
+        Args:
+            metric: Counter or Histogram
+
+        Returns:
+            The metric
+        """
+        self._metrics.append(metric)
+        return metric
+
+    @property
+    def updates(self):
+        """Number of values recorded so far; changes whenever a metric changes."""
+        return sum(metric.updates for metric in self._metrics)
+
+    def snapshot(self):
+        """
+        Snapshot all metrics.
+
+        Returns:
+            dict: Metric name -> metric snapshot, JSON-serialisable
+        """
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def reset(self):
+        """Drop the values of all metrics."""
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self, snapshots=None):
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Args:
+            snapshots: Registry snapshots to add up, e.g. one per process;
+                defaults to the metrics of this process
+
+        Returns:
+            str: The exposition text
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            if snapshots is None:
+                lines.extend(metric.samples())
+            else:
+                lines.extend(metric.samples([snapshot.get(metric.name, []) for snapshot in snapshots]))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'vrp_stage_duration_seconds', 'Duration of routing pipeline stages.',
+    DURATION_BUCKETS, labelnames=('stage',)))
+SOLVER_OBJECTIVE = REGISTRY.register(Histogram(
+    'vrp_solver_objective', 'Objective value of the solutions returned by the solver.',
+    OBJECTIVE_BUCKETS))
+MODEL_NODES = REGISTRY.register(Histogram(
+    'vrp_model_nodes', 'Number of nodes (including the depot) in solved routing models.',
+    NODE_BUCKETS))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'vrp_cache_requests_total', 'Cache lookups by cache and result (hit or miss).',
+    labelnames=('cache', 'result')))
+JOBS_FINISHED = REGISTRY.register(Counter(
+    'vrp_jobs_finished_total', 'Routing jobs finished, by final status.',
+    labelnames=('status',)))
+
+
+class JobTimings:
+    """Stage durations, solver results and cache hits of a single job."""
+
+    def __init__(self, initial=None):
+        """
+        Initialize the timings.
+
+        Args:
+            initial: Timing block of an earlier part of the job to continue from (optional)
+        """
+        initial = initial or {}
+        self._lock = threading.Lock()
+        self.stages = {stage: dict(values) for stage, values in initial.get('stages', {}).items()}
+        self.solver = list(initial.get('solver', []))
+        self.caches = {name: {'hits': values['hits'], 'misses': values['misses']}
+                       for name, values in initial.get('caches', {}).items()}
+
+    def add_stage(self, stage, seconds):
+        """Add the duration of one run of a stage."""
+        with self._lock:
+            values = self.stages.setdefault(stage, {'count': 0, 'seconds': 0.0})
+            values['count'] += 1
+            values['seconds'] += seconds
+
+    def add_solution(self, day, objective, nodes, solutions=None):
+        """Add the result of one solver run."""
+        with self._lock:
+            self.solver.append({'day': day + 1, 'objective': objective, 'nodes': nodes,
+                                'solutions': solutions})
+
+    def add_cache(self, cache, hit):
+        """Add one cache lookup."""
+        with self._lock:
+            values = self.caches.setdefault(cache, {'hits': 0, 'misses': 0})
+            values['hits' if hit else 'misses'] += 1
+
+    def as_dict(self):
+        """
+        Return the timings as a JSON-serialisable timing block.
+
+        Returns:
+            dict: stages (count and seconds per stage), solver (objective, node
+                count and number of solutions found per solve) and caches (hits, misses and hit_ratio)
+        """
+        with self._lock:
+            return {
+                'stages': {stage: {'count': values['count'], 'seconds': round(values['seconds'], 4)}
+                           for stage, values in self.stages.items()},
+                'solver': list(self.solver),
+                'caches': {
+                    name: dict(values, hit_ratio=round(values['hits'] / max(values['hits'] + values['misses'], 1), 4))
+                    for name, values in self.caches.items()
+                }
+            }
+
+
+# Timings of the job running in the current thread or context
+_current_job = contextvars.ContextVar('vrp_job_timings', default=None)
+
+
+@contextmanager
+def track_job(initial=None):
+    """
+    Collect the metrics recorded by the current thread into a JobTimings.
+
+    Args:
+        initial: Timing block of an earlier part of the job to continue from (optional)
+
+    Yields:
+        JobTimings: The timings of the job
+    """
+    timings = JobTimings(initial)
+    token = _current_job.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_job.reset(token)
+
+
+def current_job_timings():
+    """
+    Get the timings of the job tracked in the current context.
+
+    Returns:
+        JobTimings: The timings or None outside track_job
+    """
+    return _current_job.get()
+
+
+def record_stage(stage, seconds):
+    """
+    Record the duration of a pipeline stage.
+
+    Args:
+        stage: Stage name ('load', 'model_build', 'model_construction', 'search',
+            'extraction', 'report', 'geometry_fetch', 'map_render')
+        seconds: Duration in seconds
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _current_job.get()
+    if timings is not None:
+        timings.add_stage(stage, seconds)
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time a block of code, or a function when used as a decorator, as a pipeline stage.
+
+    Args:
+        stage: Stage name
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def record_solution(day, objective, nodes, solutions=None):
+    """
+    Record the result of a solver run.
+
+    Args:
+        day: Day index (0-based)
+        objective: Objective value of the solution
+        nodes: Number of nodes in the model, including the depot
+        solutions: Number of solutions the search found (optional)
+    """
+    SOLVER_OBJECTIVE.observe(objective)
+    MODEL_NODES.observe(nodes)
+    timings = _current_job.get()
+    if timings is not None:
+        timings.add_solution(day, objective, nodes, solutions)
+
+
+def record_cache(cache, hit):
+    """
+    Record a cache lookup.
+
+    Args:
+        cache: Cache name ('master_data', 'route_geometry', ...)
+        hit: Boolean indicating whether the lookup was a hit
+    """
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+    timings = _current_job.get()
+    if timings is not None:
+        timings.add_cache(cache, hit)
+
+
+def record_job_finished(status):
+    """
+    Count a finished job.
+
+    Args:
+        status: Final job status
+    """
+    JOBS_FINISHED.inc(status=status)
+
+
+def metrics_snapshot():
+    """
+    Snapshot the process-wide metrics, e.g. to store them for other processes.
+
+    Returns:
+        dict: Metric name -> metric snapshot, JSON-serialisable
+    """
+    return REGISTRY.snapshot()
+
+
+def metrics_updates():
+    """Return the number of values recorded in this process; it grows on every change."""
+    return REGISTRY.updates
+
+
+def reset_metrics():
+    """Drop the process-wide metrics, e.g. those a forked worker inherited from its parent."""
+    REGISTRY.reset()
+
+
+def render_metrics(snapshots=None):
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Args:
+        snapshots: Snapshots (see metrics_snapshot) to add up, e.g. one per
+            process; defaults to the metrics of this process
+
+    Returns:
+        str: The exposition text
+    """
+    return REGISTRY.render(snapshots)
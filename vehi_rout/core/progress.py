@@ -0,0 +1,215 @@
+"""
+Progress reporting for the Vehicle Routing Problem.
+Provides per-job progress channels that the solver and controller publish to
+and that the web application streams to the browser.
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of seconds between two published search updates
+DEFAULT_MIN_INTERVAL = 0.5
+
+# Number of events kept per channel for late subscribers
+MAX_EVENTS = 200
+
+
+class ProgressChannel:
+    """Thread-safe, rate-limited progress feed for a single job."""
+
+    def __init__(self, job_id=None, min_interval=DEFAULT_MIN_INTERVAL, on_publish=None):
+        """
+        Initialize the channel.
+
+        Args:
+            job_id: Identifier of the job the channel reports on
+            min_interval: Minimum number of seconds between rate-limited events
+            on_publish: Called with the job ID and every published event, in
+                sequence order, e.g. to store the events for other processes (optional)
+        """
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.on_publish = on_publish
+        self.closed = False
+        self.status = 'running'
+        self._condition = threading.Condition()
+        self._events = []
+        self._seq = 0
+        self._next_allowed = 0.0
+
+    def ready(self):
+        """
+        Check whether a rate-limited event may be published now.
+
+        This is a single clock read so it is cheap enough to call from inside
+        the solver's search loop before doing any other work.
+
+        Returns:
+            bool: True if the rate limit allows publishing
+        """
+        return time.monotonic() >= self._next_allowed
+
+    def publish(self, stage, rate_limited=False, **data):
+        """
+        Publish a progress event.
+
+        Args:
+            stage: Pipeline stage ('load', 'day', 'search', 'report', 'maps', ...)
+            rate_limited: Drop the event if one was published less than
+                min_interval seconds ago
+            **data: Event payload
+
+        Returns:
+            bool: True if the event was published
+        """
+        now = time.monotonic()
+        if rate_limited and now < self._next_allowed:
+            return False
+
+        with self._condition:
+            if self.closed:
+                return False
+            self._seq += 1
+            event = dict(data, seq=self._seq, stage=stage, time=time.time())
+            self._events.append(event)
+            if len(self._events) > MAX_EVENTS:
+                del self._events[:len(self._events) - MAX_EVENTS]
+            self._next_allowed = now + self.min_interval
+            if self.on_publish is not None:
+                # A failed copy must not stop the solve that reports through the channel
+                try:
+                    self.on_publish(self.job_id, event)
+                except Exception:
+                    logger.exception("Could not pass on progress event %d of job %s", event['seq'], self.job_id)
+            self._condition.notify_all()
+        return True
+
+    def close(self, status, **data):
+        """
+        Publish the final event and close the channel.
+
+        Args:
+            status: Final job status ('completed', 'failed', ...)
+            **data: Event payload
+        """
+        self.publish('done', status=status, **data)
+        with self._condition:
+            self.status = status
+            self.closed = True
+            self._condition.notify_all()
+
+    def events_after(self, seq, timeout=None):
+        """
+        Wait for events published after a sequence number.
+
+        Args:
+            seq: Sequence number of the last event already seen
+            timeout: Maximum number of seconds to wait
+
+        Returns:
+            list: Events with a sequence number greater than seq
+        """
+        with self._condition:
+            if self._seq <= seq and not self.closed:
+                self._condition.wait(timeout)
+            return [event for event in self._events if event['seq'] > seq]
+
+    @property
+    def latest(self):
+        """Return the most recent event or None."""
+        with self._condition:
+            return self._events[-1] if self._events else None
+
+
+class ProgressRegistry:
+    """Keeps the progress channels of running jobs."""
+
+    def __init__(self, on_publish=None):
+        """
+        Initialize the registry.
+
+        Args:
+            on_publish: Passed to every channel opened (see ProgressChannel)
+        """
+        self.on_publish = on_publish
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    def open(self, job_id, min_interval=DEFAULT_MIN_INTERVAL):
+        """
+        Create a fresh channel for a job, replacing any previous one.
+
+        Args:
+            job_id: Job identifier
+            min_interval: Minimum number of seconds between rate-limited events
+
+        Returns:
+            ProgressChannel: The new channel
+        """
+        channel = ProgressChannel(job_id, min_interval, on_publish=self.on_publish)
+        with self._lock:
+            self._channels[job_id] = channel
+        return channel
+
+    def get(self, job_id):
+        """
+        Get the channel of a job.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            ProgressChannel: The channel or None if the job has none
+        """
+        with self._lock:
+            return self._channels.get(job_id)
+
+    def discard(self, job_id):
+        """
+        Forget the channel of a job.
+
+        Args:
+            job_id: Job identifier
+        """
+        with self._lock:
+            self._channels.pop(job_id, None)
+
+
+def add_search_progress_callback(routing, progress, day, scale=1):
+    """
+    Publish the improving objective of a routing search to a progress channel.
+
+    OR-Tools calls the callback on every new solution. The callback only
+    counts the solution and returns unless the channel's rate limit has
+    expired, so reading the objective happens at most once per interval.
+    The published objective is the best one sampled so far, since guided
+    local search also reports non-improving solutions.
+
+    Args:
+        routing: OR-Tools routing model
+        progress: ProgressChannel to publish to
+        day: Day index (0-based)
+        scale: Solver units per km or minute; the objective is published in km or minutes
+    """
+    state = {'solutions': 0, 'best': None, 'started': time.monotonic()}
+
+    def on_solution():
+        state['solutions'] += 1
+        if not progress.ready():
+            return
+        objective = routing.CostVar().Max()
+        if state['best'] is None or objective < state['best']:
+            state['best'] = objective
+        progress.publish(
+            'search',
+            rate_limited=True,
+            day=day + 1,
+            objective=round(state['best'] / scale, 2),
+            solutions=state['solutions'],
+            elapsed=round(time.monotonic() - state['started'], 1)
+        )
+
+    routing.AddAtSolutionCallback(on_solution)
@@ -0,0 +1,117 @@
+"""
+Fleet configuration sweeps for the Vehicle Routing Problem.
+Solves one day's stores with many what-if fleets in parallel worker processes.
+"""
+
+import os
+import time
+import logging
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from vehi_rout.data_model.vrp_data_model import with_fleet
+from vehi_rout.solver.vrp_solver import solve_data_model
+from vehi_rout.core.log_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Data model shared by the fleet variants of a worker process, set by the pool initializer
+_worker_data = None
+
+
+def fleet_grid(num_vehicles, max_visits, max_limit, limit_key="max_distance"):
+    """
+    Build every combination of fleet size, visit limit and distance/time limit.
+
+    Each combination is a uniform fleet: all vehicles get the same limits.
+
+    Args:
+        num_vehicles: Iterable of fleet sizes
+        max_visits: Iterable of maximum visits per vehicle
+        max_limit: Iterable of maximum distance (km) or time (mins) per vehicle
+        limit_key: 'max_distance' or 'max_time', matching the controller's metric
+
+    Returns:
+        list: List of fleet configuration dictionaries
+    """
+    fleets = []
+    for vehicles, visits, limit in itertools.product(num_vehicles, max_visits, max_limit):
+        fleets.append({
+            'name': f"{vehicles}x{visits}v-{limit}",
+            'num_vehicles': vehicles,
+            'max_visits': [visits] * vehicles,
+            limit_key: [limit] * vehicles
+        })
+    return fleets
+
+
+def _init_worker(data):
+    """
+    Keep the sweep's data model in a worker process.
+
+    Args:
+        data: Data model as returned by create_data_model
+    """
+    global _worker_data
+    _worker_data = data
+    configure_logging()
+
+
+def solve_fleet(fleet, day=0, use_distance=True, time_limit=None, data=None):
+    """
+    Solve the shared data model with one fleet.
+
+    Args:
+        fleet: Fleet configuration with max_visits and max_distance or max_time,
+            and optionally vehicle_classes
+        day: Day index (0-based)
+        use_distance: Boolean indicating whether to use distance or time
+        time_limit: Search time limit in seconds (optional)
+        data: Data model to use instead of the worker's copy (optional)
+
+    Returns:
+        tuple: (visited nodes, route dictionary, solve seconds)
+    """
+    fleet_data = with_fleet(
+        data if data is not None else _worker_data,
+        max_visits=fleet['max_visits'],
+        max_distance=fleet.get('max_distance'),
+        max_time=fleet.get('max_time'),
+        vehicle_classes=fleet.get('vehicle_classes')
+    )
+    started = time.perf_counter()
+    visited_nodes, route_dict = solve_data_model(fleet_data, day, use_distance, time_limit=time_limit)
+    return visited_nodes, route_dict, round(time.perf_counter() - started, 2)
+
+
+def run_fleet_sweep(data, fleets, day=0, use_distance=True, time_limit=None, workers=None,
+                    mp_context=None):
+    """
+    Solve a data model with every fleet, in parallel.
+
+    Args:
+        data: Data model as returned by create_data_model
+        fleets: List of fleet configuration dictionaries
+        day: Day index (0-based)
+        use_distance: Boolean indicating whether to use distance or time
+        time_limit: Search time limit in seconds per fleet (optional)
+        workers: Number of worker processes, defaults to the number of CPUs;
+            1 solves the fleets in this process
+        mp_context: Multiprocessing start method ('fork', 'spawn', ...), defaults
+            to the platform default
+
+    Returns:
+        list: (visited nodes, route dictionary, solve seconds) per fleet, in input order
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(fleets), 1))
+    logger.info("Sweeping %d fleet configurations with %d worker(s)", len(fleets), workers)
+
+    if workers == 1:
+        return [solve_fleet(fleet, day, use_distance, time_limit, data=data) for fleet in fleets]
+
+    context = multiprocessing.get_context(mp_context) if mp_context else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(data,)) as pool:
+        futures = [pool.submit(solve_fleet, fleet, day, use_distance, time_limit) for fleet in fleets]
+        return [future.result() for future in futures]
@@ -3,6 +3,14 @@ Data model for the Vehicle Routing Problem.
 Creates the data model for the solver based on the input data.
 """
 
+import numpy as np
+
+import vehi_rout.config as config
+from vehi_rout.core.metrics import timed
+from vehi_rout.solver.restrictions import fleet_classes, restricted_arc_indices
+from vehi_rout.utils.knn_matrix import is_sparse
+from vehi_rout.utils.route_utils import node_penalties
+
 # from vehi_rout.config import (
 #     MAX_VISITS_PER_VEHICLE,
 #     MAX_TIME_PER_VEHICLE,
@@ -86,30 +94,206 @@ Creates the data model for the solver based on the input data.
 
 #     return data
 
+def metric_scale(use_distance):
+    """
+    Get the fixed-point scale of the routing metric.
+
+    Args:
+        use_distance: Boolean indicating whether to use distance or time
+
+    Returns:
+        int: Solver units per km (distance) or per minute (time)
+    """
+    return config.DISTANCE_SCALE if use_distance else config.TIME_SCALE
+
+def to_solver_units(value, scale):
+    """
+    Convert a distance or time to the solver's integer units, rounding to the nearest unit.
+
+    Args:
+        value: Distance in km or time in minutes
+        scale: Solver units per km or minute, as returned by metric_scale
+
+    Returns:
+        int: The value in solver units
+    """
+    return int(round(value * scale))
+
+def _scaled_matrix(matrix_df, nodes_to_use, scale):
+    """Select the rows and columns of a matrix and convert them to integer solver units."""
+    if is_sparse(matrix_df):
+        values = matrix_df.submatrix(nodes_to_use)
+    else:
+        values = matrix_df.to_numpy(dtype=float)[np.ix_(nodes_to_use, nodes_to_use)]
+    return np.rint(values * scale).astype(np.int64)
+
+def candidate_lists(matrix, num_neighbours):
+    """
+    Find the stores each store may be followed by in a route.
+
+    Store j is a candidate of store i when j is one of i's num_neighbours
+    nearest stores of the model, or i is one of j's. The depot is always
+    allowed and is not listed.
+
+    Args:
+        matrix: Array of the model's cost matrix in solver units, depot first
+        num_neighbours: Number of nearest stores per store
+
+    Returns:
+        list: Candidate nodes per node (empty for the depot), or None when
+            every store would be a candidate anyway
+    """
+    num_nodes = len(matrix)
+    if num_neighbours is None or num_neighbours >= num_nodes - 2:
+        return None
+
+    costs = matrix.astype(float)
+    costs[:, 0] = np.inf
+    np.fill_diagonal(costs, np.inf)
+    nearest = np.argpartition(costs[1:], num_neighbours - 1, axis=1)[:, :num_neighbours]
+
+    allowed = np.zeros((num_nodes, num_nodes), dtype=bool)
+    allowed[np.repeat(np.arange(1, num_nodes), num_neighbours), nearest.ravel()] = True
+    allowed |= allowed.T
+    allowed[0, :] = False
+    return [np.flatnonzero(row).tolist() for row in allowed]
+
+@timed('model_build')
 def create_data_model(full_matrix, nodes_to_visit, demand_dict, penalty_list=None,
-                      use_distance=False, max_distance=None, max_visits=None, max_time=None):
+                      use_distance=False, max_distance=None, max_visits=None, max_time=None,
+                      duration_matrix=None, service_times=None, vehicle_classes=None,
+                      restricted_roads=None, candidate_neighbours=None):
+    """
+    Create the data model for one day's solve.
+
+    Matrices are converted to integer solver units (see metric_scale) here,
+    once, so the solver reads them without arithmetic and short arcs are not
+    truncated to zero. Vehicle limits and penalties stay in km or minutes.
+
+    With a duration matrix, the model carries both the distance and the time
+    matrix and both vehicle limits; use_distance then only selects the metric
+    that is minimised.
+
+    Service times are folded into the time matrix: every arc leaving a store
+    also carries the time spent unloading there. The time dimension then
+    covers the whole working day without a per-node transit callback.
+
+    The matrices may be sparse KnnMatrix objects; only the rows and columns
+    of the model's nodes are then expanded to a dense array.
+
+    Args:
+        full_matrix: DataFrame containing the distance/time matrix; the distance
+            matrix when duration_matrix is given
+        nodes_to_visit: List of node indices to visit
+        demand_dict: Dictionary containing demand information
+        penalty_list: Penalty for not visiting each demand_dict key, as
+            returned by get_penalty_list
+        use_distance: Boolean indicating whether to use distance or time
+        max_distance: List of maximum distance (km) per vehicle
+        max_visits: List of maximum visits per vehicle
+        max_time: List of maximum time (mins) per vehicle
+        duration_matrix: DataFrame containing the time matrix, aligned to the
+            codes of full_matrix (optional)
+        service_times: Service time in minutes keyed by store code, as returned
+            by get_service_times; stores not in it get DEFAULT_SERVICE_TIME (optional)
+        vehicle_classes: List of class names per vehicle (optional)
+        restricted_roads: Dictionary of class name -> list of (from CODE, to CODE)
+            roads vehicles of that class may not use (optional)
+        candidate_neighbours: Number of nearest stores each store may be
+            followed by (see candidate_lists); None allows every arc
+
+    Returns:
+        dict: The data model
+    """
     data = {}
 
-    node_indices = [0] + [i for i, code in enumerate(full_matrix.index) if code in demand_dict['key']]
-    nodes_to_use = [node_indices[0]] + [i for i in node_indices[1:] if i in nodes_to_visit]
+    # PO stores among the nodes to visit, found by id instead of by comparing codes
+    penalties = node_penalties(full_matrix, demand_dict, penalty_list if penalty_list is not None
+                               else [0] * len(demand_dict['key']))
+    selected = np.zeros(len(full_matrix), dtype=bool)
+    selected[np.asarray(list(nodes_to_visit), dtype=np.int64)] = True
+    selected &= np.isfinite(penalties)
+    selected[0] = False
+    nodes_to_use = [0] + np.flatnonzero(selected).tolist()
 
     data["num_vehicles"] = len(max_distance if use_distance else max_time)
+    if len(max_visits) != data["num_vehicles"]:
+        raise ValueError("A visit limit is required for every vehicle")
     data["depot"] = 0  # hardcoded depot here
+    data["scales"] = {}
 
-    if use_distance:
-        data["distance_matrix"] = [[full_matrix.iloc[i][j] for j in nodes_to_use] for i in nodes_to_use]
-        data["max_distance_per_vehicle"] = max_distance
+    if duration_matrix is not None:
+        matrices = {"distance": (full_matrix, max_distance), "time": (duration_matrix, max_time)}
+    elif use_distance:
+        matrices = {"distance": (full_matrix, max_distance)}
     else:
-        data["time_matrix"] = [[full_matrix.iloc[i][j] for j in nodes_to_use] for i in nodes_to_use]
-        data["max_time_per_vehicle"] = max_time
+        matrices = {"time": (full_matrix, max_time)}
+
+    for metric_name, (matrix_df, limits) in matrices.items():
+        if len(limits) != data["num_vehicles"]:
+            raise ValueError(f"A {metric_name} limit is required for every vehicle")
+        scale = metric_scale(metric_name == "distance")
+        matrix = _scaled_matrix(matrix_df, nodes_to_use, scale)
+
+        if metric_name == "time" and service_times is not None:
+            data["service_times"] = [0] + [
+                service_times.get(str(full_matrix.index[i]), config.DEFAULT_SERVICE_TIME)
+                for i in nodes_to_use[1:]
+            ]
+            matrix += np.rint(np.asarray(data["service_times"]) * scale).astype(np.int64)[:, None]
+            np.fill_diagonal(matrix, 0)
+
+        if (metric_name == "distance") == use_distance:
+            data["candidates"] = candidate_lists(matrix, candidate_neighbours)
+        data[f"{metric_name}_matrix"] = matrix.tolist()
+        data[f"max_{metric_name}_per_vehicle"] = limits
+        data["scales"][metric_name] = scale
 
     data["demands"] = [0] + [demand_dict.get(full_matrix.index[i], 1) for i in nodes_to_use[1:]]
     data["node_mapping"] = [full_matrix.index[i] for i in nodes_to_use]
     data["max_visits_per_vehicle"] = max_visits
+    data["vehicle_classes"] = fleet_classes(vehicle_classes, data["num_vehicles"])
+    data["restricted_arcs"] = restricted_arc_indices(data["node_mapping"], restricted_roads)
 
     if penalty_list is not None:
-        data["penalties"] = [0] + penalty_list
+        # Penalties follow the demand keys; they are spread over the nodes by id
+        data["penalties"] = [0] + penalties[nodes_to_use[1:]].tolist()
     else:
         data["penalties"] = [0] + [1000] * len(nodes_to_use[1:])
 
     return data
+
+def with_fleet(data, max_visits, max_distance=None, max_time=None, vehicle_classes=None):
+    """
+    Copy a data model with a different fleet.
+
+    Only the vehicle fields are replaced; the matrices, demands, penalties and
+    node mapping are shared with the original data model. A limit that is not
+    given keeps the data model's limits, as long as the fleet size matches.
+
+    Args:
+        data: Data model as returned by create_data_model
+        max_visits: List of maximum visits per vehicle
+        max_distance: List of maximum distance per vehicle (models with a distance matrix)
+        max_time: List of maximum time per vehicle (models with a time matrix)
+        vehicle_classes: List of class names per vehicle; defaults to the data
+            model's classes
+
+    Returns:
+        dict: The data model for the new fleet
+    """
+    fleet_data = dict(data)
+    fleet_data["num_vehicles"] = len(max_visits)
+    fleet_data["max_visits_per_vehicle"] = list(max_visits)
+    fleet_data["vehicle_classes"] = fleet_classes(
+        vehicle_classes if vehicle_classes is not None else data.get("vehicle_classes"), len(max_visits))
+
+    for metric_name, limits in (("distance", max_distance), ("time", max_time)):
+        if f"{metric_name}_matrix" not in data:
+            continue
+        if limits is None:
+            limits = data[f"max_{metric_name}_per_vehicle"]
+        if len(limits) != len(max_visits):
+            raise ValueError("A vehicle limit is required for every vehicle")
+        fleet_data[f"max_{metric_name}_per_vehicle"] = list(limits)
+    return fleet_data
@@ -0,0 +1,83 @@
+"""
+Vehicle class road restrictions for the Vehicle Routing Problem.
+Derives one cost matrix per group of vehicle classes with the same restricted
+roads, so vehicles are restricted without a Python callback per vehicle.
+"""
+
+# Vehicle class of vehicles not listed in the vehicle classes
+DEFAULT_VEHICLE_CLASS = "standard"
+
+
+def fleet_classes(vehicle_classes, num_vehicles):
+    """
+    Give every vehicle of a fleet a class.
+
+    Args:
+        vehicle_classes: List of class names per vehicle (optional)
+        num_vehicles: Number of vehicles in the fleet
+
+    Returns:
+        list: Class name per vehicle; vehicles beyond the list are DEFAULT_VEHICLE_CLASS
+    """
+    classes = list(vehicle_classes or [])[:num_vehicles]
+    return classes + [DEFAULT_VEHICLE_CLASS] * (num_vehicles - len(classes))
+
+
+def restricted_arc_indices(node_mapping, restricted_roads):
+    """
+    Translate restricted roads from store codes to the nodes of a data model.
+
+    Roads with an end that is not in the model are dropped.
+
+    Args:
+        node_mapping: Store code per node of the data model
+        restricted_roads: Dictionary of class name -> list of (from CODE, to CODE) pairs
+
+    Returns:
+        dict: Class name -> sorted list of (from node, to node) pairs
+    """
+    node_of = {str(code): node for node, code in enumerate(node_mapping)}
+    arcs = {}
+    for vehicle_class, roads in (restricted_roads or {}).items():
+        pairs = {
+            (node_of[str(from_code)], node_of[str(to_code)])
+            for from_code, to_code in roads
+            if str(from_code) in node_of and str(to_code) in node_of
+        }
+        if pairs:
+            arcs[vehicle_class] = sorted(pairs)
+    return arcs
+
+
+def vehicle_class_matrices(matrix, vehicle_classes, restricted_arcs, blocked_value):
+    """
+    Build the cost matrices of a fleet with restricted roads.
+
+    Vehicles whose classes restrict the same arcs share one matrix, and
+    unrestricted vehicles use the base matrix itself, so the number of
+    matrices is the number of distinct restriction sets plus one.
+
+    Args:
+        matrix: Base matrix as a list of rows
+        vehicle_classes: Class name per vehicle
+        restricted_arcs: Class name -> list of (from node, to node) pairs, as
+            returned by restricted_arc_indices
+        blocked_value: Value of a restricted arc; above every vehicle limit
+            it makes the arc infeasible in the dimension
+
+    Returns:
+        tuple: (list of matrices, index into that list per vehicle)
+    """
+    matrices = [matrix]
+    matrix_of_arcs = {(): 0}
+    matrix_of_vehicle = []
+    for vehicle_class in vehicle_classes:
+        arcs = tuple(restricted_arcs.get(vehicle_class, ()))
+        if arcs not in matrix_of_arcs:
+            masked = [list(row) for row in matrix]
+            for from_node, to_node in arcs:
+                masked[from_node][to_node] = blocked_value
+            matrix_of_arcs[arcs] = len(matrices)
+            matrices.append(masked)
+        matrix_of_vehicle.append(matrix_of_arcs[arcs])
+    return matrices, matrix_of_vehicle
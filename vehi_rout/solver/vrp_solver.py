@@ -3,11 +3,21 @@ Solver module for the Vehicle Routing Problem.
 Implements different solvers for the VRP.
 """
 
+import time
+import logging
+from itertools import accumulate
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
-from vehi_rout.data_model.vrp_data_model import create_data_model
+from vehi_rout.data_model.vrp_data_model import create_data_model, to_solver_units
 from vehi_rout.utils.helper_utils import get_penalty_list
+from vehi_rout.core.progress import add_search_progress_callback
+from vehi_rout.core.cancellation import add_cancellation_callback
+from vehi_rout.core.metrics import timed, record_stage, record_solution
+from vehi_rout.utils.route_utils import METRIC_UNITS
+from vehi_rout.solver.restrictions import vehicle_class_matrices
 import vehi_rout.config as config
 
+logger = logging.getLogger(__name__)
+
 # def solve_vrp_for_day(full_matrix, nodes_to_visit, day, demand_dict, penalty_list=None, use_distance=True):
 #     """
 #     Solve the Vehicle Routing Problem for a single day.
@@ -103,67 +113,154 @@ import vehi_rout.config as config
 #         print(f"No solution found for Day {day + 1}!")
 #         return set(), {}
 
-def solve_vrp_for_day(full_matrix, nodes_to_visit, day, demand_dict, penalty_list=None, use_distance=True):
+def solve_vrp_for_day(full_matrix, nodes_to_visit, day, demand_dict, penalty_list=None, use_distance=True,
+                      progress=None, cancel_token=None, time_limit=None,
+                      max_distance=None, max_visits=None, max_time=None, duration_matrix=None,
+                      service_times=None, vehicle_classes=None, restricted_roads=None,
+                      candidate_neighbours=None):
     """
     Solve the Vehicle Routing Problem for a single day.
 
     Args:
-        full_matrix: DataFrame containing the distance/time matrix
+        full_matrix: DataFrame containing the distance/time matrix; the distance
+            matrix when duration_matrix is given
         nodes_to_visit: List of node indices to visit
         day: Day index (0-based)
         demand_dict: Dictionary containing demand information
         penalty_list: List of penalties for not visiting nodes
-        use_distance: Boolean indicating whether to use distance or time
+        use_distance: Boolean indicating whether to minimise distance or time
+        progress: ProgressChannel receiving the improving objective (optional)
+        cancel_token: CancellationToken that stops the search early (optional)
+        time_limit: Search time limit in seconds; defaults to SOLVER_TIME_LIMIT_SECONDS
+        max_distance: Maximum distance per vehicle; defaults to MAX_DISTANCE_PER_VEHICLE
+        max_visits: Maximum visits per vehicle; defaults to MAX_VISITS_PER_VEHICLE
+        max_time: Maximum time per vehicle; defaults to MAX_TIME_PER_VEHICLE
+        duration_matrix: DataFrame containing the time matrix, aligned to
+            full_matrix; enforces both the distance and the time limits (optional)
+        service_times: Service time in minutes keyed by store code, added to
+            the time matrix (optional)
+        vehicle_classes: Class name per vehicle; defaults to VEHICLE_CLASSES
+        restricted_roads: Roads each vehicle class may not use; defaults to RESTRICTED_ROADS
+        candidate_neighbours: Nearest stores each store may be followed by;
+            defaults to CANDIDATE_NEIGHBOURS
 
     Returns:
         visited_nodes: Set of visited node indices
         route_dict: Dictionary containing route information for each vehicle
     """
 
-    # Step 1: Create data model using current config values
+    # Step 1: Create data model using the given vehicle limits or the current config values
     data = create_data_model(
         full_matrix=full_matrix,
         nodes_to_visit=nodes_to_visit,
         demand_dict=demand_dict,
         penalty_list=penalty_list,
         use_distance=use_distance,
-        max_distance=config.MAX_DISTANCE_PER_VEHICLE,
-        max_time=config.MAX_TIME_PER_VEHICLE,
-        max_visits=config.MAX_VISITS_PER_VEHICLE
+        max_distance=max_distance if max_distance is not None else config.MAX_DISTANCE_PER_VEHICLE,
+        max_time=max_time if max_time is not None else config.MAX_TIME_PER_VEHICLE,
+        max_visits=max_visits if max_visits is not None else config.MAX_VISITS_PER_VEHICLE,
+        duration_matrix=duration_matrix,
+        service_times=service_times,
+        vehicle_classes=vehicle_classes if vehicle_classes is not None else config.VEHICLE_CLASSES,
+        restricted_roads=restricted_roads if restricted_roads is not None else config.RESTRICTED_ROADS,
+        candidate_neighbours=(candidate_neighbours if candidate_neighbours is not None
+                              else config.CANDIDATE_NEIGHBOURS)
     )
 
-    print("Max Distance:", data["max_distance_per_vehicle"])
+    return solve_data_model(data, day, use_distance, progress=progress,
+                            cancel_token=cancel_token, time_limit=time_limit)
+
+def solve_data_model(data, day, use_distance=True, progress=None, cancel_token=None, time_limit=None):
+    """
+    Solve the Vehicle Routing Problem for a prebuilt data model.
+
+    Callers that solve the same stores with different fleets build the data
+    model once and only swap the vehicle fields (see with_fleet), so the
+    scaled matrices are not rebuilt for every fleet.
+
+    Every matrix in the data model becomes a dimension capped by its
+    per-vehicle limits, so a model with both matrices enforces the distance
+    and the time limits in one solve. use_distance selects the metric that is
+    minimised.
+
+    Restricted roads are priced into the minimised metric: vehicles of a class
+    with restricted roads get their own copy of its matrix in which those arcs
+    exceed every vehicle limit. The copies are registered natively like the
+    base matrix, one per distinct restriction set rather than one per vehicle.
+
+    With candidate lists in the data model, a store may only be followed by
+    its candidates or the end of a route, which keeps the search on
+    plausible arcs.
+
+    Args:
+        data: Data model as returned by create_data_model
+        day: Day index (0-based)
+        use_distance: Boolean indicating whether to minimise distance or time
+        progress: ProgressChannel receiving the improving objective (optional)
+        cancel_token: CancellationToken that stops the search early (optional)
+        time_limit: Search time limit in seconds; defaults to SOLVER_TIME_LIMIT_SECONDS
+
+    Returns:
+        visited_nodes: Set of visited node indices
+        route_dict: Dictionary containing route information for each vehicle
+    """
+    # A job cancelled before this day starts does not build the model
+    if cancel_token is not None and cancel_token.cancelled:
+        logger.info("Search for Day %d cancelled before it started", day + 1)
+        return set(), {}
+
+    logger.debug("Max distance per vehicle: %s", data.get("max_distance_per_vehicle"))
+    construction_started = time.perf_counter()
 
     # Step 2: Set up OR-Tools manager and model
-    matrix = data["distance_matrix"] if use_distance else data["time_matrix"]
+    # Matrices are already in integer solver units; limits, penalties and the
+    # fixed cost are converted with the same scale so they stay comparable
+    cost_metric = "distance" if use_distance else "time"
+    matrix = data[f"{cost_metric}_matrix"]
+    scale = data["scales"][cost_metric]
     manager = pywrapcp.RoutingIndexManager(len(matrix), data["num_vehicles"], data["depot"])
     routing = pywrapcp.RoutingModel(manager)
 
-    # Step 3: Register transit callback
-    def distance_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return int(data["distance_matrix"][from_node][to_node])
-
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
-    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
-
-    # Step 4: Add Distance/Time dimension
-    dimension_name = "Distance" if use_distance else "Time"
-    max_per_vehicle = data["max_distance_per_vehicle"] if use_distance else data["max_time_per_vehicle"]
-
-    routing.AddDimension(
-        transit_callback_index,
-        0,  # slack
-        max(max_per_vehicle),  # global max limit
-        True,  # start cumul to zero
-        dimension_name
-    )
-
-    dimension = routing.GetDimensionOrDie(dimension_name)
-    for vehicle_id in range(data["num_vehicles"]):
-        end_index = routing.End(vehicle_id)
-        dimension.CumulVar(end_index).SetMax(max_per_vehicle[vehicle_id])
+    # Step 3 and 4: Register each matrix natively, so arc costs are looked up
+    # without calling back into Python, and cap its dimension per vehicle
+    restricted_arcs = data.get("restricted_arcs")
+    cost_evaluators = None
+    for metric_name in METRIC_UNITS:
+        if f"{metric_name}_matrix" not in data:
+            continue
+        capacities = [to_solver_units(limit, data["scales"][metric_name])
+                      for limit in data[f"max_{metric_name}_per_vehicle"]]
+        if metric_name == cost_metric and restricted_arcs:
+            matrices, matrix_of_vehicle = vehicle_class_matrices(
+                data[f"{metric_name}_matrix"], data["vehicle_classes"], restricted_arcs,
+                blocked_value=max(capacities) + 1
+            )
+            matrix_indices = {i: routing.RegisterTransitMatrix(matrices[i]) for i in set(matrix_of_vehicle)}
+            cost_evaluators = [matrix_indices[i] for i in matrix_of_vehicle]
+            routing.AddDimensionWithVehicleTransitAndCapacity(
+                cost_evaluators, 0, capacities, True, metric_name.capitalize())
+            continue
+        transit_index = routing.RegisterTransitMatrix(data[f"{metric_name}_matrix"])
+        routing.AddDimensionWithVehicleCapacity(
+            transit_index,
+            0,  # slack
+            capacities,
+            True,  # start cumul to zero
+            metric_name.capitalize()
+        )
+        if metric_name == cost_metric:
+            routing.SetArcCostEvaluatorOfAllVehicles(transit_index)
+    if cost_evaluators is not None:
+        for vehicle_id, evaluator in enumerate(cost_evaluators):
+            routing.SetArcCostEvaluatorOfVehicle(evaluator, vehicle_id)
+
+    # Restrict the successors of each store to its candidate list
+    if data.get("candidates"):
+        route_ends = [routing.End(vehicle_id) for vehicle_id in range(data["num_vehicles"])]
+        for node in range(1, len(matrix)):
+            index = manager.NodeToIndex(node)
+            routing.NextVar(index).SetValues(
+                [index] + route_ends + [manager.NodeToIndex(other) for other in data["candidates"][node]])
 
     # Step 5: Add demand/capacity dimension
     def demand_callback(from_index):
@@ -179,31 +276,48 @@ def solve_vrp_for_day(full_matrix, nodes_to_visit, day, demand_dict, penalty_lis
         "Visits"
     )
 
-    routing.SetFixedCostOfAllVehicles(10000)
+    routing.SetFixedCostOfAllVehicles(to_solver_units(config.VEHICLE_FIXED_COST, scale))
 
     # Step 6: Add penalties for not visiting nodes
     for node in range(1, len(matrix)):
-        routing.AddDisjunction([manager.NodeToIndex(node)], data["penalties"][node])
+        routing.AddDisjunction([manager.NodeToIndex(node)], to_solver_units(data["penalties"][node], scale))
 
     # Step 7: Set search parameters
     search_parameters = pywrapcp.DefaultRoutingSearchParameters()
     search_parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
     search_parameters.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
-    search_parameters.time_limit.seconds = config.SOLVER_TIME_LIMIT_SECONDS
-
-    # Step 8: Solve the problem
-    solution = routing.SolveWithParameters(search_parameters)
+    if time_limit is None:
+        time_limit = config.SOLVER_TIME_LIMIT_SECONDS
+    search_parameters.time_limit.FromMilliseconds(max(int(time_limit * 1000), 1))
+
+    # Step 8: Solve the problem, reporting improving solutions and honouring
+    # cancellation if requested; a cancelled search keeps its best solution
+    if progress is not None:
+        add_search_progress_callback(routing, progress, day, scale=scale)
+    # The cancel limit is polled during the search, so it is held until the search returns
+    cancel_limit = add_cancellation_callback(routing, cancel_token) if cancel_token is not None else None
+    record_stage('model_construction', time.perf_counter() - construction_started)
+    with timed('search'):
+        solution = routing.SolveWithParameters(search_parameters)
 
     if solution:
+        record_solution(day, solution.ObjectiveValue() / scale, len(matrix), routing.solver().Solutions())
         return print_solution(manager, routing, solution, data, day, use_distance)
     else:
-        print(f"No solution found for Day {day + 1}!")
+        logger.warning("No solution found for Day %d", day + 1)
         return set(), {}
 
+@timed('extraction')
 def print_solution(manager, routing, solution, data, day, use_distance=False):
     """
     Print the solution and return visited nodes and route information.
 
+    Route metrics are summed in integer solver units and converted back to km
+    or minutes once per route. Every metric in the data model is reported, and
+    a route is within limits only if it is within all of them. With a time
+    matrix, each route also gets the arrival time at every stop, in minutes
+    after leaving the depot.
+
     Args:
         manager: OR-Tools routing index manager
         routing: OR-Tools routing model
@@ -216,37 +330,33 @@ def print_solution(manager, routing, solution, data, day, use_distance=False):
         visited_nodes: Set of visited node indices
         route_dict: Dictionary containing route information for each vehicle
     """
-    total_metric = 0  # Total distance or time
+    total_metric = 0  # Longest route in the minimised metric
     visited_nodes = set()
     route_dict = {}  # Dictionary to store route details for each vehicle
 
     metric_name = "distance" if use_distance else "time"
-    max_metric_name = f"max_{metric_name}_per_vehicle"
-    unit = "km" if use_distance else "mins"
+    unit = METRIC_UNITS[metric_name]
+    metric_names = [name for name in METRIC_UNITS if f"{name}_matrix" in data]
 
-    print(f"\nDay {day + 1} Routes (Penalty per unvisited demand unit: {data['penalties'][1]} {unit}):")
+    # Route listings are only built when debug output is enabled
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("Day %d routes (penalty per unvisited demand unit: %s %s)",
+                     day + 1, data['penalties'][1], unit)
 
     for vehicle_id in range(data["num_vehicles"]):
         index = routing.Start(vehicle_id)
-        plan_output = f"Route for vehicle {vehicle_id}:\n"
-        route_metric = 0
         num_visits = 0
         route_nodes = []
-        previous_node = None
+        path = []
 
         while not routing.IsEnd(index):
             node = manager.IndexToNode(index)
             original_node = data["node_mapping"][node]
             visited_nodes.add(original_node)
             route_nodes.append(original_node)
+            path.append(node)
 
-            plan_output += f" {original_node} ->"
-
-            if previous_node is not None:
-                arc_metric = int(data[f"{metric_name}_matrix"][previous_node][node])
-                route_metric += arc_metric
-
-            previous_node = node
             index = solution.Value(routing.NextVar(index))
 
             if original_node != data["depot"]:
@@ -257,36 +367,70 @@ def print_solution(manager, routing, solution, data, day, use_distance=False):
         original_node = data["node_mapping"][node]
         visited_nodes.add(original_node)
         route_nodes.append(original_node)
-
-        plan_output += f" {original_node}\n"
-
-        if previous_node is not None:
-            arc_metric = int(data[f"{metric_name}_matrix"][previous_node][node])
-            route_metric += arc_metric
-
-        plan_output += f"{metric_name.capitalize()} of the route: {route_metric} {unit}\n"
-        max_metric = data[max_metric_name][vehicle_id]
-        plan_output += f"Within limit: {'Yes' if route_metric <= max_metric else 'No'} (Max: {max_metric} {unit})\n"
-        plan_output += f"Stops visited: {num_visits-1}/{data['max_visits_per_vehicle'][vehicle_id]}\n"
+        path.append(node)
 
         # Store route details in the dictionary
-        route_dict[vehicle_id] = {
+        route_info = {
             "route_nodes": route_nodes,
-            f"route_{metric_name}": route_metric,
-            f"max_{metric_name}_limit": max_metric,
-            "within_limit": route_metric <= max_metric,
+            "within_limit": True,
             "num_visits": num_visits-1,
             "max_visits_limit": data["max_visits_per_vehicle"][vehicle_id]
         }
-
-        print(plan_output)
+        if "vehicle_classes" in data:
+            route_info["vehicle_class"] = data["vehicle_classes"][vehicle_id]
+        for name in metric_names:
+            matrix = data[f"{name}_matrix"]
+            scale = data["scales"][name]
+            route_units = sum(matrix[from_node][to_node] for from_node, to_node in zip(path, path[1:]))
+            max_metric = data[f"max_{name}_per_vehicle"][vehicle_id]
+            route_info[f"route_{name}"] = round(route_units / scale, 2)
+            route_info[f"max_{name}_limit"] = max_metric
+            route_info["within_limit"] &= route_units <= to_solver_units(max_metric, scale)
+            if name == "time":
+                # Service times are on the arcs leaving a store, so the running
+                # total at a stop is its arrival time
+                elapsed = [0] + [matrix[from_node][to_node] for from_node, to_node in zip(path, path[1:])]
+                route_info["arrival_times"] = [round(units / scale, 1) for units in accumulate(elapsed)]
+        route_dict[vehicle_id] = route_info
+
+        route_metric = route_info[f"route_{metric_name}"]
+        if debug:
+            logger.debug(
+                "Route for vehicle %d: %s | %s, within limit: %s, stops %d/%d",
+                vehicle_id, ' -> '.join(map(str, route_nodes)),
+                ', '.join(f"{name} {route_info[f'route_{name}']}/{route_info[f'max_{name}_limit']} {METRIC_UNITS[name]}"
+                          for name in metric_names),
+                'Yes' if route_info["within_limit"] else 'No',
+                num_visits - 1, data['max_visits_per_vehicle'][vehicle_id]
+            )
         total_metric = max(total_metric, route_metric)
 
-    print(f"Maximum route {metric_name} for Day {day + 1}: {total_metric} {unit}")
+    logger.info("Maximum route %s for Day %d: %s %s", metric_name, day + 1, total_metric, unit)
 
     return visited_nodes, route_dict
 
-def solve_multi_day_vrp(full_matrix, demand_dict, total_days, base_penalty, use_distance=True, current_date=None, max_nodes_per_day=None):
+def split_time_budget(deadline, days_left):
+    """
+    Share the time left before a deadline evenly over the remaining days.
+
+    Recomputing the share before every day hands time that an earlier day did
+    not use on to the days after it.
+
+    Args:
+        deadline: time.monotonic() value by which the whole horizon must be solved
+        days_left: Number of days still to solve, including the current one
+
+    Returns:
+        float: Search time limit in seconds for the current day
+    """
+    remaining = max(deadline - time.monotonic(), 0.0)
+    return max(remaining / max(days_left, 1), config.MIN_DAY_TIME_LIMIT_SECONDS)
+
+def solve_multi_day_vrp(full_matrix, demand_dict, total_days, base_penalty, use_distance=True, current_date=None, max_nodes_per_day=None,
+                        progress=None, cancel_token=None, time_budget=None,
+                        max_distance=None, max_visits=None, max_time=None, duration_matrix=None,
+                        service_times=None, vehicle_classes=None, restricted_roads=None,
+                        candidate_neighbours=None, horizon=None):
     """
     Solve the Vehicle Routing Problem for multiple days.
 
@@ -298,50 +442,86 @@ def solve_multi_day_vrp(full_matrix, demand_dict, total_days, base_penalty, use_
         use_distance: Boolean indicating whether to use distance or time
         current_date: Current date in format 'YYYY-MM-DD'
         max_nodes_per_day: Maximum number of nodes to visit per day
+        progress: ProgressChannel receiving the current day and search progress (optional)
+        cancel_token: CancellationToken that stops planning between and within days (optional)
+        time_budget: Total search time in seconds for all days, split across the horizon (optional)
+        max_distance: Maximum distance per vehicle; defaults to MAX_DISTANCE_PER_VEHICLE
+        max_visits: Maximum visits per vehicle; defaults to MAX_VISITS_PER_VEHICLE
+        max_time: Maximum time per vehicle; defaults to MAX_TIME_PER_VEHICLE
+        duration_matrix: DataFrame containing the time matrix, aligned to
+            full_matrix; enforces both the distance and the time limits (optional)
+        service_times: Service time in minutes keyed by store code, added to
+            the time matrix (optional)
+        vehicle_classes: Class name per vehicle; defaults to VEHICLE_CLASSES
+        restricted_roads: Roads each vehicle class may not use; defaults to RESTRICTED_ROADS
+        candidate_neighbours: Nearest stores each store may be followed by;
+            defaults to CANDIDATE_NEIGHBOURS
+        horizon: HorizonState that records the stores visited each day; one
+            is started from demand_dict when not given (optional)
 
     Returns:
         all_visited_nodes: List of sets of visited node indices for each day
         all_route_dicts: List of dictionaries containing route information for each day
     """
-    from vehi_rout.utils.helper_utils import get_values_not_in_second_list
-    from vehi_rout.utils.route_utils import sort_nodes_by_distance
+    from vehi_rout.core.horizon import HorizonState
+    from vehi_rout.utils.code_table import CodeTable
+    from vehi_rout.utils.route_utils import select_po_nodes
 
     all_visited_nodes = []
     all_route_dicts = []
 
-    # Sort nodes by distance from depot
-    sorted_nodes = sort_nodes_by_distance(full_matrix.values)
+    # Stores of the PO still to be visited, tracked by id between days
+    if horizon is None:
+        horizon = HorizonState.from_demand(CodeTable(full_matrix.index), demand_dict)
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
 
-    # Limit the number of nodes if specified
-    if max_nodes_per_day is not None and max_nodes_per_day < len(sorted_nodes):
-        nodes_to_consider = sorted(sorted_nodes[:max_nodes_per_day])
-    else:
-        nodes_to_consider = list(range(1, len(full_matrix)))
+    for day in range(total_days):
+        # Stop between days once cancellation has been requested
+        if cancel_token is not None and cancel_token.cancelled:
+            logger.info("Planning cancelled before Day %d", day + 1)
+            break
 
-    remaining_nodes = nodes_to_consider
+        time_limit = split_time_budget(deadline, total_days - day) if deadline is not None else None
 
-    for day in range(total_days):
         # Calculate penalties based on days remaining
         penalty_list = get_penalty_list(demand_dict, base_penalty, total_days, current_date)
 
+        # Limit the day to the most urgent remaining stores per km, if specified
+        remaining_nodes = horizon.remaining_ids()
+        day_nodes = select_po_nodes(full_matrix, demand_dict, penalty_list, max_nodes_per_day, remaining_nodes)
+
+        if progress is not None:
+            progress.publish('day', day=day + 1, total_days=total_days, remaining=len(remaining_nodes))
+
         # Solve VRP for current day
         visited_nodes, route_dict = solve_vrp_for_day(
             full_matrix,
-            remaining_nodes,
+            day_nodes,
             day,
             demand_dict,
             penalty_list,
-            use_distance
+            use_distance,
+            progress=progress,
+            cancel_token=cancel_token,
+            time_limit=time_limit,
+            max_distance=max_distance,
+            max_visits=max_visits,
+            max_time=max_time,
+            duration_matrix=duration_matrix,
+            service_times=service_times,
+            vehicle_classes=vehicle_classes,
+            restricted_roads=restricted_roads,
+            candidate_neighbours=candidate_neighbours
         )
 
         all_visited_nodes.append(visited_nodes)
         all_route_dicts.append(route_dict)
 
         # Update remaining nodes
-        remaining_nodes = get_values_not_in_second_list(remaining_nodes, visited_nodes)
+        horizon.mark_visited_codes(visited_nodes)
 
         # If all nodes have been visited, we can stop
-        if not remaining_nodes:
+        if not horizon.unvisited_count:
             break
 
     return all_visited_nodes, all_route_dicts
@@ -0,0 +1,88 @@
+"""
+Archive utilities for the Vehicle Routing Problem.
+Streams job artifacts as a zip archive without staging it on disk.
+"""
+
+import os
+import zipfile
+
+# Size of the chunks read from each artifact while streaming
+CHUNK_SIZE = 64 * 1024
+
+
+class _StreamBuffer:
+    """Write-only, non-seekable sink that hands written bytes back to the caller."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return and clear everything written since the last drain."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_folder_files(folder):
+    """
+    List the files below a folder as (absolute path, archive name) pairs.
+
+    Args:
+        folder: Folder to walk
+
+    Returns:
+        list: Sorted list of (path, arcname) tuples
+    """
+    files = []
+    for root, _, filenames in os.walk(folder):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            files.append((path, os.path.relpath(path, folder)))
+    return sorted(files, key=lambda item: item[1])
+
+
+def stream_zip(folder):
+    """
+    Generate a zip archive of a folder chunk by chunk.
+
+    The archive is written to an in-memory sink that is drained after every
+    chunk, so memory use is bounded by CHUNK_SIZE and nothing is written to disk.
+
+    Args:
+        folder: Folder whose files should be archived
+
+    Yields:
+        bytes: Consecutive pieces of the zip archive
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path, arcname in iter_folder_files(folder):
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(path, "rb") as src, archive.open(info, mode="w") as dest:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    data = buffer.drain()
+    if data:
+        yield data
@@ -0,0 +1,128 @@
+"""
+Interned store-code table for the Vehicle Routing Problem.
+Store codes are mixed strings such as '3', '14001' and 'SCAR'. They are
+normalised once, when data is loaded, and mapped to dense int32 ids: the
+positions of the codes in the master matrix, with the depot at 0. Demand,
+penalties and node selection work on the ids, and the ids are translated
+back to codes only for reports.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Id of a code that is not in the table
+MISSING = -1
+
+
+def normalize_codes(values):
+    """
+    Convert store codes to their canonical strings.
+
+    Numeric codes, such as those read from a CSV without alphanumeric codes,
+    are converted through int, so 3 and 3.0 both become '3'.
+
+    Args:
+        values: Series, array or list of codes
+
+    Returns:
+        Series: The codes as strings
+    """
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype('int64').astype(str)
+    return series.astype(str)
+
+
+class CodeTable:
+    """
+    Two-way mapping between store codes and dense int32 ids.
+
+    The id of a code is its position in the master matrix, so ids index the
+    matrix rows directly. Lookups of many codes are vectorised through the
+    hash table of a pandas Index, which is built once per table.
+    """
+
+    def __init__(self, codes):
+        """
+        Args:
+            codes: Store codes in id order, depot first, e.g. a matrix index
+        """
+        self.index = pd.Index(normalize_codes(list(codes)).to_numpy(dtype=object))
+        if not self.index.is_unique:
+            duplicated = self.index[self.index.duplicated()].unique()
+            raise ValueError(f"Duplicate store codes: {', '.join(duplicated[:10])}")
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, code):
+        return str(code) in self.index
+
+    def ids(self, codes):
+        """
+        Look up the ids of many codes.
+
+        Args:
+            codes: Store codes, normalised or not
+
+        Returns:
+            ndarray: int32 id per code, MISSING for codes not in the table
+        """
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int32)
+        return self.index.get_indexer(normalize_codes(codes)).astype(np.int32)
+
+    def id_of(self, code):
+        """
+        Look up the id of one code.
+
+        Args:
+            code: Store code
+
+        Returns:
+            int: The id, or MISSING when the code is not in the table
+        """
+        return int(self.ids([code])[0])
+
+    def codes(self, ids):
+        """
+        Translate ids back to store codes.
+
+        Args:
+            ids: Ids, as an array, list or set
+
+        Returns:
+            list: Store code per id
+        """
+        ids = np.fromiter(ids, dtype=np.int64) if isinstance(ids, (set, frozenset)) else np.asarray(ids, dtype=np.int64)
+        return self.index.to_numpy()[ids].tolist()
+
+    def code_of(self, node_id):
+        """
+        Translate one id back to its store code.
+
+        Args:
+            node_id: Id in the table
+
+        Returns:
+            str: The store code
+        """
+        return self.index[node_id]
+
+
+def demand_ids(demand_dict, codes):
+    """
+    Get the ids of the demand keys.
+
+    Args:
+        demand_dict: Dictionary containing demand information, with "ids"
+            when it was built with a code table
+        codes: CodeTable, or the codes of the matrix (e.g. its index) to build one from
+
+    Returns:
+        ndarray: int32 id per demand key, MISSING for stores not in the matrix
+    """
+    if demand_dict.get("ids") is not None:
+        return demand_dict["ids"]
+    table = codes if isinstance(codes, CodeTable) else CodeTable(codes)
+    return table.ids(demand_dict['key'])
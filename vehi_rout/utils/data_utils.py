@@ -1,23 +1,220 @@
+import gc
+import os
+import time
+import logging
+import threading
 import pandas as pd 
-from vehi_rout.utils.helper_utils import get_str_key
+from vehi_rout.utils.code_table import CodeTable
+from vehi_rout.utils.po_reader import aggregate_po, prepare_po, read_po
+from vehi_rout.core.metrics import record_cache
+from vehi_rout.utils.knn_matrix import KnnMatrix, is_sparse
+from vehi_rout.utils.spatial_index import SpatialIndex, stores_only
+
+logger = logging.getLogger(__name__)
+
+# Master data already parsed by this process, keyed by file paths and modification times
+_master_cache = {}
+_master_cache_lock = threading.Lock()
+
+# Spatial indexes of GPS files, keyed like the master data cache
+_spatial_cache = {}
 
 def load_matrix_df(path):
+    # Sparse k-nearest-neighbour matrices are stored as .npz files
+    if path.endswith('.npz'):
+        return KnnMatrix.load(path)
     return pd.read_csv(path, index_col=0)
 
 def load_df(path):
     return pd.read_csv(path)
 
+def get_master_data(matrix_path, gps_path):
+    """
+    Load the master matrix and GPS data, reusing the parsed copies while the files are unchanged.
+
+    The returned DataFrames are shared between callers and must not be modified in place.
+
+    Args:
+        matrix_path: Path to the distance/time matrix file
+        gps_path: Path to the GPS coordinates file
+
+    Returns:
+        tuple: (matrix DataFrame, GPS DataFrame)
+    """
+    key = tuple((os.path.abspath(path), os.stat(path).st_mtime_ns) for path in (matrix_path, gps_path))
+    with _master_cache_lock:
+        record_cache('master_data', key in _master_cache)
+        if key not in _master_cache:
+            # Drop stale versions of the same files
+            for stale in [k for k in _master_cache if [p for p, _ in k] == [p for p, _ in key]]:
+                del _master_cache[stale]
+            _master_cache[key] = (load_matrix_df(matrix_path), load_df(gps_path))
+        return _master_cache[key]
+
+def get_spatial_index(gps_path):
+    """
+    Get the spatial index of the stores in a GPS file, building it once per file version.
+
+    Args:
+        gps_path: Path to the GPS coordinates file
+
+    Returns:
+        SpatialIndex: Index over the stores of the file (the depot is left out)
+    """
+    key = (os.path.abspath(gps_path), os.stat(gps_path).st_mtime_ns)
+    with _master_cache_lock:
+        record_cache('spatial_index', key in _spatial_cache)
+        if key not in _spatial_cache:
+            for stale in [k for k in _spatial_cache if k[0] == key[0]]:
+                del _spatial_cache[stale]
+            _spatial_cache[key] = SpatialIndex(stores_only(load_df(gps_path)))
+        return _spatial_cache[key]
+
+def preload_master_data(matrix_path, gps_path):
+    """
+    Parse the master data and its spatial index ahead of the first job.
+
+    Meant for a server's parent process before it forks its workers. The
+    parsed objects are then frozen out of the garbage collector (gc.freeze),
+    so collections in the workers do not write to their memory pages and
+    the workers keep sharing one copy-on-write copy instead of each parsing
+    its own. Calling it again after the files changed loads the new
+    versions and releases the old ones.
+
+    Args:
+        matrix_path: Path to the distance/time matrix file
+        gps_path: Path to the GPS coordinates file
+
+    Returns:
+        tuple: (matrix DataFrame, GPS DataFrame)
+    """
+    started = time.perf_counter()
+    gc.unfreeze()
+    master = get_master_data(matrix_path, gps_path)
+    get_spatial_index(gps_path)
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded master data (%d nodes) from %s in %.2f s",
+                len(master[0]), matrix_path, time.perf_counter() - started)
+    return master
+
+def align_matrix(matrix_df, reference_df):
+    """
+    Reorder a matrix to the store codes of another, so both share one code index.
+
+    Used to pair the duration matrix with the distance matrix: after
+    alignment, row/column i of both refers to the same store.
+
+    Args:
+        matrix_df: DataFrame containing the matrix to align
+        reference_df: DataFrame whose index gives the code order
+
+    Returns:
+        DataFrame: matrix_df with rows and columns in the reference order
+
+    Raises:
+        ValueError: If the matrix lacks codes of the reference
+    """
+    codes = reference_df.index.astype(str)
+    if is_sparse(matrix_df):
+        # Sparse matrices are not reordered; both must be built from matrices with one code order
+        if not matrix_df.index.equals(codes):
+            raise ValueError("Sparse matrices must have the same codes in the same order")
+        return matrix_df
+    matrix_df = matrix_df.copy()
+    matrix_df.index = matrix_df.index.astype(str)
+    matrix_df.columns = matrix_df.columns.astype(str)
+
+    missing = codes.difference(matrix_df.index).union(codes.difference(matrix_df.columns))
+    if len(missing):
+        preview = ', '.join(missing[:10])
+        raise ValueError(f"Matrix is missing {len(missing)} codes of the reference matrix: {preview}")
+    return matrix_df.loc[codes, codes]
+
+def get_service_times(demand_df, master_gps_df, by_brand=None, default=None):
+    """
+    Get the service time of every store.
+
+    A SERVICE_TIME value in the PO data wins over one in the master GPS data,
+    which wins over the default of the store's BRAND.
+
+    Args:
+        demand_df: DataFrame containing the PO demand data
+        master_gps_df: DataFrame containing the GPS coordinates and brands
+        by_brand: Service time in minutes per brand; defaults to SERVICE_TIME_BY_BRAND
+        default: Service time in minutes of other brands; defaults to DEFAULT_SERVICE_TIME
+
+    Returns:
+        dict: Service time in minutes keyed by store code
+    """
+    import vehi_rout.config as config
+
+    by_brand = config.SERVICE_TIME_BY_BRAND if by_brand is None else by_brand
+    default = config.DEFAULT_SERVICE_TIME if default is None else default
+
+    frames = [df for df in (master_gps_df, demand_df) if df is not None]
+    service_times = {}
+
+    # Brand defaults first, then explicit values, later frames winning
+    for df in frames:
+        if 'BRAND' in df.columns:
+            known = df['BRAND'].notna()
+            brand_times = df.loc[known, 'BRAND'].map(by_brand).fillna(default)
+            service_times.update(zip(df.loc[known, 'CODE'].astype(str), brand_times))
+    for df in frames:
+        if 'SERVICE_TIME' in df.columns:
+            explicit = pd.to_numeric(df['SERVICE_TIME'], errors='coerce')
+            known = explicit.notna()
+            service_times.update(zip(df.loc[known, 'CODE'].astype(str), explicit[known]))
+
+    return {code: float(minutes) for code, minutes in service_times.items()}
+
+def prepare_demand_df(df, strict=False, first_row=2):
+    """
+    Normalise raw PO rows against the PO schema (see po_reader): string
+    codes, typed numeric columns, DEMAND defaulting to 1, DATE parsed with
+    PO_DATE_FORMATS and one row per store.
+
+    Args:
+        df: DataFrame with at least CODE and DATE columns
+        strict: Raise on invalid rows instead of skipping them
+        first_row: Number reported for the first row in errors (2 for a CSV
+            line, 1 for the first of a list of orders)
+
+    Returns:
+        DataFrame: The normalised demand data
+    """
+    return prepare_po(df, strict=strict, first_row=first_row)[0]
+
 def load_daily_demand(file_name):
     try:
-        df = pd.read_csv(file_name)
-        df = df.dropna(subset=['CODE'])
-        df = get_str_key(df)
-        if "DEMAND" not in df.columns:
-            df['DEMAND'] = 1
-        df['DATE'] = pd.to_datetime(df['DATE'])
-        return df
+        return read_po(file_name)[0]
     except FileNotFoundError as e:
-        print(f"Error loading daily demand file: {e}")
+        logger.error("Error loading daily demand file: %s", e)
+
+def orders_to_demand_df(orders):
+    """
+    Build demand data from inline orders, e.g. from a JSON request.
+
+    Args:
+        orders: List of dictionaries with CODE and DATE keys and optionally DEMAND,
+            LOCATION and other PO columns
+
+    Returns:
+        DataFrame: Demand data in the same form as load_daily_demand returns
+
+    Raises:
+        ValueError: If there are no orders or any order is invalid
+    """
+    if not orders:
+        raise ValueError("No orders provided")
+
+    df = pd.DataFrame(orders)
+    missing = [column for column in ('CODE', 'DATE') if column not in df.columns]
+    if missing:
+        raise ValueError(f"Orders are missing required fields: {', '.join(missing)}")
+
+    return prepare_demand_df(df, strict=True, first_row=1)
 
 def get_demand_df(today_path=None, wait_path=None):
     today_df = load_daily_demand(today_path) if today_path is not None else None  
@@ -25,7 +222,7 @@ def get_demand_df(today_path=None, wait_path=None):
         
     # Combine today and wait dataframes
     if today_df is not None and wait_df is not None:
-        demand_df = pd.concat([today_df, wait_df], ignore_index=True)
+        demand_df = aggregate_po(pd.concat([today_df, wait_df], ignore_index=True))
     elif today_df is not None:
         demand_df = today_df
     elif wait_df is not None:
@@ -35,18 +232,19 @@ def get_demand_df(today_path=None, wait_path=None):
         return demand_df
 
 def get_demand_matrix_df(full_df, demand_df, depot):
-    keys = demand_df['CODE'].to_list()
-    today_shop_indices = [full_df.index.get_loc(str(code)) for code in keys if str(code) in full_df.index]
-    selected_indices = [depot] + today_shop_indices
+    ids = CodeTable(full_df.index).ids(demand_df['CODE'])
+    selected_indices = [depot] + ids[ids >= 0].tolist()
     return full_df.iloc[selected_indices, selected_indices].copy()
 
-def update_demand_dic(demand_df):
+def update_demand_dic(demand_df, code_table=None):
     """
     Updates the demand_dic with data from demand_df where DEMAND > 0, converting DATE to datetime.
 
     Args:
         demand_dic (dict): The dictionary to update.
         demand_df (pd.DataFrame): The DataFrame containing demand data.
+        code_table (CodeTable, optional): Code table of the master matrix; adds
+            the int32 id of each key as "ids" (MISSING for stores not in the matrix).
 
     Returns:
         dict: The updated demand_dic.
@@ -57,5 +255,7 @@ def update_demand_dic(demand_df):
     demand_dic["key"] = filtered_df['CODE'].values.tolist()
     demand_dic["demand"] = filtered_df['DEMAND'].values.tolist()
     demand_dic["po_date"] = pd.to_datetime(filtered_df['DATE']).tolist() #convert to datetime
+    if code_table is not None:
+        demand_dic["ids"] = code_table.ids(demand_dic["key"])
 
     return demand_dic
\ No newline at end of file
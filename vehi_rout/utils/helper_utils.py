@@ -1,7 +1,12 @@
 from datetime import datetime
+import logging
 import pandas as pd
 import numpy as np
 
+from vehi_rout.utils.code_table import normalize_codes
+
+logger = logging.getLogger(__name__)
+
 
 def get_date_difference(date_str1, date_str2, format1='%Y-%m-%d', format2='%Y-%m-%d'):
     """
@@ -37,13 +42,9 @@ def get_date_difference(date_str1, date_str2, format1='%Y-%m-%d', format2='%Y-%m
         return None
 
 def get_str_key(df):
-    if df['CODE'].dtype in ['float', 'int']:
-        df['CODE'] = df['CODE'].astype(int)
-        df['CODE'] = df['CODE'].astype(str)
-        print('Converting to Object')
+    df['CODE'] = normalize_codes(df['CODE'])
     return df
 
-import requests
 def get_osrm_data(origin, destination):
     """
     Get the distance and path between two coordinates using OSRM API.
@@ -51,6 +52,8 @@ def get_osrm_data(origin, destination):
     :param destination: (latitude, longitude)
     :return: Tuple of (path_coordinates, distance in km, duration in minutes)
     """
+    import requests  # imported on first use, so importing the package stays fast
+
     osrm_base_url = "http://router.project-osrm.org/route/v1/car"
     url = f"{osrm_base_url}/{origin[1]},{origin[0]};{destination[1]},{destination[0]}?overview=full&geometries=geojson"
     response = requests.get(url)
@@ -81,6 +84,20 @@ def get_values_not_in_second_list(list1, list2):
     return [item for item in list1 if item not in list2]
 
 
+def fleet_limits(limits, num_vehicles):
+    """
+    Size a list of per-vehicle limits to a fleet.
+
+    Args:
+        limits (list): Configured limit per vehicle, e.g. MAX_TIME_PER_VEHICLE.
+        num_vehicles (int): Number of vehicles in the fleet.
+
+    Returns:
+        list: One limit per vehicle; vehicles past the configured list get its last limit.
+    """
+    return [limits[min(i, len(limits) - 1)] for i in range(num_vehicles)]
+
+
 
 def sigmoid(x):
     return x / (x + np.exp(-x))
@@ -111,6 +128,7 @@ def get_penalty_list(demand_dict, base_penalty, total_days, current_date=None):
     }
 
     penalties = []
+    debug = logger.isEnabledFor(logging.DEBUG)
 
     # If current_date is not provided, use today's date
     if current_date is None:
@@ -140,7 +158,8 @@ def get_penalty_list(demand_dict, base_penalty, total_days, current_date=None):
         # Calculate penalty based on days remaining and demand
         demand = demand_dict.get(key, 1)
         penalty = weight * demand
-        print(f"Penalty for {key}: {penalty}")
+        if debug:
+            logger.debug("Penalty for %s: %s", key, penalty)
 
         penalties.append(penalty)
 
@@ -0,0 +1,293 @@
+"""
+Sparse k-nearest-neighbour matrices for the Vehicle Routing Problem.
+Keeps the exact road distance or duration only between each store and its
+nearest neighbours, and between every store and the depot. Other pairs are
+estimated from the great-circle distance, so memory grows with n * k instead
+of n^2 and very large store networks can be loaded.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+import vehi_rout.config as config
+from vehi_rout.utils.synthetic_data import DEPOT_COORDS, haversine_km
+
+logger = logging.getLogger(__name__)
+
+# Matrix rows read from a dense CSV at a time while building a sparse matrix
+CSV_CHUNK_ROWS = 256
+
+# Pairs closer than this (km) are ignored when fitting the road factor of the estimates
+MIN_FIT_KM = 1.0
+
+# Neighbour slot of a store without exact neighbour entries
+NO_NEIGHBOUR = -1
+
+
+class KnnMatrix:
+    """
+    Road matrix with exact entries for each store's k nearest neighbours and the depot.
+
+    Node 0 is the depot, as in the dense master matrices. A pair (i, j) is
+    exact when j is one of i's neighbours or either node is the depot;
+    otherwise it is the great-circle distance times road_factor.
+    """
+
+    def __init__(self, codes, latitude, longitude, neighbours, neighbour_values,
+                 depot_row, depot_column, road_factor):
+        """
+        Args:
+            codes: Store code per node, depot first
+            latitude: Latitude per node
+            longitude: Longitude per node
+            neighbours: Array (n, k) of the nearest nodes of each node, NO_NEIGHBOUR for empty slots
+            neighbour_values: Array (n, k) of the exact values to those neighbours
+            depot_row: Exact values from the depot to every node
+            depot_column: Exact values from every node to the depot
+            road_factor: Ratio of matrix value to great-circle km used for the estimates
+        """
+        self.index = pd.Index([str(code) for code in codes])
+        self.latitude = np.asarray(latitude, dtype=float)
+        self.longitude = np.asarray(longitude, dtype=float)
+        self.neighbours = np.asarray(neighbours, dtype=np.int32)
+        self.neighbour_values = np.asarray(neighbour_values, dtype=np.float32)
+        self.depot_row = np.asarray(depot_row, dtype=float)
+        self.depot_column = np.asarray(depot_column, dtype=float)
+        self.road_factor = float(road_factor)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def k(self):
+        """Number of neighbours kept per node."""
+        return self.neighbours.shape[1]
+
+    @property
+    def nbytes(self):
+        """Memory held by the arrays of the matrix, in bytes."""
+        return sum(array.nbytes for array in (self.latitude, self.longitude, self.neighbours,
+                                              self.neighbour_values, self.depot_row, self.depot_column))
+
+    def submatrix(self, nodes):
+        """
+        Build the dense matrix between some nodes.
+
+        Args:
+            nodes: Node indices, such as the depot and a day's stores
+
+        Returns:
+            ndarray: Array (len(nodes), len(nodes)) of exact and estimated values
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        lat, lon = self.latitude[nodes], self.longitude[nodes]
+        values = haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :]) * self.road_factor
+
+        # Overwrite the estimates with the exact entries among the selected nodes
+        local = np.full(len(self), -1, dtype=np.int64)
+        local[nodes] = np.arange(len(nodes))
+        neighbours = self.neighbours[nodes]
+        to_local = np.where(neighbours >= 0, local[neighbours], -1)
+        rows, slots = np.nonzero(to_local >= 0)
+        values[rows, to_local[rows, slots]] = self.neighbour_values[nodes][rows, slots]
+
+        depot = local[0]
+        if depot >= 0:
+            values[depot, :] = self.depot_row[nodes]
+            values[:, depot] = self.depot_column[nodes]
+        np.fill_diagonal(values, 0.0)
+        return values
+
+    def with_stores(self, codes, latitude, longitude):
+        """
+        Append stores that only have estimated entries.
+
+        Args:
+            codes: Codes of the new stores
+            latitude: Latitudes of the new stores
+            longitude: Longitudes of the new stores
+
+        Returns:
+            KnnMatrix: A new matrix with the stores appended
+        """
+        latitude = np.asarray(latitude, dtype=float)
+        longitude = np.asarray(longitude, dtype=float)
+        to_depot = haversine_km(latitude, longitude, self.latitude[0], self.longitude[0]) * self.road_factor
+        return KnnMatrix(
+            codes=list(self.index) + [str(code) for code in codes],
+            latitude=np.concatenate([self.latitude, latitude]),
+            longitude=np.concatenate([self.longitude, longitude]),
+            neighbours=np.vstack([self.neighbours, np.full((len(codes), self.k), NO_NEIGHBOUR)]),
+            neighbour_values=np.vstack([self.neighbour_values, np.zeros((len(codes), self.k))]),
+            depot_row=np.concatenate([self.depot_row, to_depot]),
+            depot_column=np.concatenate([self.depot_column, to_depot]),
+            road_factor=self.road_factor
+        )
+
+    def save(self, path):
+        """
+        Save the matrix as a compressed .npz file.
+
+        Args:
+            path: Output path
+        """
+        np.savez_compressed(
+            path, codes=self.index.to_numpy(dtype=str), latitude=self.latitude, longitude=self.longitude,
+            neighbours=self.neighbours, neighbour_values=self.neighbour_values,
+            depot_row=self.depot_row, depot_column=self.depot_column, road_factor=self.road_factor
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a matrix saved with save.
+
+        Args:
+            path: Path to the .npz file
+
+        Returns:
+            KnnMatrix: The loaded matrix
+        """
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+    @classmethod
+    def from_csv(cls, path, gps_df, k=None, chunk_rows=CSV_CHUNK_ROWS):
+        """
+        Build a sparse matrix from a dense master matrix CSV.
+
+        The CSV is read in chunks of rows, so a network of any size is
+        converted without holding its dense matrix in memory.
+
+        Args:
+            path: Path to the dense matrix CSV (codes as index and header, depot first)
+            gps_df: Master GPS DataFrame (CODE, LATITUDE, LONGITUDE); the depot
+                is placed at DEPOT_COORDS
+            k: Number of neighbours kept per node; defaults to KNN_NEIGHBOURS
+            chunk_rows: Rows read at a time
+
+        Returns:
+            KnnMatrix: The sparse matrix
+        """
+        k = k or config.KNN_NEIGHBOURS
+        codes = pd.read_csv(path, index_col=0, nrows=0).columns.astype(str)
+        k = min(k, len(codes) - 1)
+
+        neighbours = np.empty((len(codes), k), dtype=np.int32)
+        neighbour_values = np.empty((len(codes), k), dtype=np.float32)
+        depot_column = np.empty(len(codes))
+        depot_row = None
+        start = 0
+        for chunk in pd.read_csv(path, index_col=0, chunksize=chunk_rows):
+            values = chunk.to_numpy(dtype=float)
+            if depot_row is None:
+                depot_row = values[0].copy()
+            stop = start + len(values)
+            depot_column[start:stop] = values[:, 0]
+
+            # Nearest nodes of each row, other than the node itself
+            values[np.arange(len(values)), np.arange(start, stop)] = np.inf
+            nearest = np.argpartition(values, k - 1, axis=1)[:, :k]
+            neighbours[start:stop] = nearest
+            neighbour_values[start:stop] = np.take_along_axis(values, nearest, axis=1)
+            start = stop
+
+        return cls.from_arrays(codes, gps_df, neighbours, neighbour_values, depot_row, depot_column)
+
+    @classmethod
+    def from_dense(cls, matrix_df, gps_df, k=None):
+        """
+        Build a sparse matrix from a dense matrix DataFrame.
+
+        Args:
+            matrix_df: DataFrame containing the dense matrix, depot first
+            gps_df: Master GPS DataFrame (CODE, LATITUDE, LONGITUDE)
+            k: Number of neighbours kept per node; defaults to KNN_NEIGHBOURS
+
+        Returns:
+            KnnMatrix: The sparse matrix
+        """
+        k = min(k or config.KNN_NEIGHBOURS, len(matrix_df) - 1)
+        values = matrix_df.to_numpy(dtype=float).copy()
+        depot_row, depot_column = values[0].copy(), values[:, 0].copy()
+        np.fill_diagonal(values, np.inf)
+        nearest = np.argpartition(values, k - 1, axis=1)[:, :k]
+        return cls.from_arrays(matrix_df.index.astype(str), gps_df, nearest,
+                               np.take_along_axis(values, nearest, axis=1), depot_row, depot_column)
+
+    @classmethod
+    def from_arrays(cls, codes, gps_df, neighbours, neighbour_values, depot_row, depot_column):
+        """
+        Look up the coordinates of the nodes and fit the road factor of the estimates.
+
+        The road factor is the median ratio of exact value to great-circle km
+        over the neighbour and depot entries, so it covers short and long pairs.
+
+        Args:
+            codes: Store code per node, depot first
+            gps_df: Master GPS DataFrame (CODE, LATITUDE, LONGITUDE)
+            neighbours: Array (n, k) of the nearest nodes of each node
+            neighbour_values: Array (n, k) of the exact values to those neighbours
+            depot_row: Exact values from the depot to every node
+            depot_column: Exact values from every node to the depot
+
+        Returns:
+            KnnMatrix: The sparse matrix
+
+        Raises:
+            ValueError: If codes lack coordinates
+        """
+        coords = gps_df.assign(CODE=gps_df['CODE'].astype(str)).drop_duplicates(subset=['CODE'])
+        coords = coords.set_index('CODE')[['LATITUDE', 'LONGITUDE']]
+        coords.loc['0'] = DEPOT_COORDS
+        codes = pd.Index(codes).astype(str)
+        missing = codes.difference(coords.index)
+        if len(missing):
+            raise ValueError(f"{len(missing)} matrix codes have no coordinates: {', '.join(missing[:10])}")
+        lat = coords.loc[codes, 'LATITUDE'].to_numpy(dtype=float)
+        lon = coords.loc[codes, 'LONGITUDE'].to_numpy(dtype=float)
+
+        straight = np.concatenate([
+            haversine_km(lat[:, None], lon[:, None], lat[neighbours], lon[neighbours]).ravel(),
+            haversine_km(lat[0], lon[0], lat, lon)
+        ])
+        exact = np.concatenate([np.asarray(neighbour_values, dtype=float).ravel(), depot_row])
+        mask = (straight >= MIN_FIT_KM) & np.isfinite(exact) & (exact > 0)
+        road_factor = float(np.median(exact[mask] / straight[mask])) if mask.any() else 1.0
+
+        return cls(codes, lat, lon, neighbours, neighbour_values, depot_row, depot_column, road_factor)
+
+
+def is_sparse(matrix):
+    """
+    Check whether a matrix is a KnnMatrix rather than a dense DataFrame.
+
+    Args:
+        matrix: Matrix as loaded by load_matrix_df
+
+    Returns:
+        bool: True for a KnnMatrix
+    """
+    return isinstance(matrix, KnnMatrix)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert a dense master matrix CSV to a sparse k-nearest-neighbour matrix')
+    parser.add_argument('matrix', type=str, help='Path to the dense matrix CSV')
+    parser.add_argument('--gps', type=str, default='data/master/master_gps.csv',
+                        help='Path to the master GPS file')
+    parser.add_argument('--k', type=int, default=None,
+                        help='Neighbours kept per store (default: KNN_NEIGHBOURS)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Output .npz path (default: the matrix path with a .npz extension)')
+    args = parser.parse_args()
+
+    output = args.output or args.matrix.rsplit('.', 1)[0] + '.npz'
+    knn = KnnMatrix.from_csv(args.matrix, pd.read_csv(args.gps), k=args.k)
+    knn.save(output)
+    print(f"{len(knn)} stores, k={knn.k}, road factor {knn.road_factor:.3f}: {output} "
+          f"({knn.nbytes / 1e6:.1f} MB in memory)")
@@ -0,0 +1,532 @@
+"""
+Incremental extension of the master matrices for the Vehicle Routing Problem.
+Computes only the rows and columns of new stores with batched OSRM /table
+requests, appends them to the master distance and duration matrices and keeps
+the previous master files as numbered versions. Until then, stores missing
+from the matrices get provisional straight-line estimates and are queued.
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import vehi_rout.config as config
+from vehi_rout.utils.data_utils import load_matrix_df, load_df, align_matrix
+from vehi_rout.utils.helper_utils import get_str_key
+from vehi_rout.utils.synthetic_data import DEPOT_COORDS, haversine_km, fit_road_factor
+from vehi_rout.utils.knn_matrix import is_sparse
+
+logger = logging.getLogger(__name__)
+
+# Folder next to the master files that holds the previous versions and the manifest
+VERSIONS_DIRNAME = 'versions'
+
+# Version history of the master files, inside the versions folder
+MANIFEST_NAME = 'manifest.json'
+
+# Decimals kept in the master matrices, as in the OSRM matrices built by the research notebooks
+MATRIX_DECIMALS = 2
+
+# Seconds to wait for one OSRM /table response
+REQUEST_TIMEOUT_SECONDS = 120
+
+# Stores sampled to fit the road factor of provisional estimates, bounding the fit on large networks
+FIT_SAMPLE_STORES = 500
+
+# Serialises writes to the pending store queue, and the background update started for it
+_pending_lock = threading.Lock()
+_pending_thread = None
+
+
+def find_new_stores(stores_df, matrix_codes):
+    """
+    Find the stores that are not in the master matrices yet.
+
+    Args:
+        stores_df: DataFrame with CODE, LATITUDE and LONGITUDE columns, such as
+            a PO file or an updated master GPS file
+        matrix_codes: Store codes of the master matrices
+
+    Returns:
+        DataFrame: One row per new store code, in file order
+    """
+    stores = get_str_key(stores_df.dropna(subset=['CODE']).copy())
+    stores['CODE'] = stores['CODE'].astype(str)
+    stores = stores.drop_duplicates(subset=['CODE'])
+    stores = stores[~stores['CODE'].isin(set(map(str, matrix_codes)))]
+
+    missing_gps = stores.reindex(columns=['LATITUDE', 'LONGITUDE']).isna().any(axis=1)
+    if missing_gps.any():
+        logger.warning("Skipping %d new stores without coordinates: %s",
+                       missing_gps.sum(), ', '.join(stores.loc[missing_gps, 'CODE'][:10]))
+    return stores[~missing_gps].reset_index(drop=True)
+
+
+def table_blocks(num_new, num_total, max_coordinates):
+    """
+    Split the new rows and columns of a matrix into OSRM /table requests.
+
+    Each block pairs a slice of the new stores with a slice of all stores,
+    so that both slices together fit in one request.
+
+    Args:
+        num_new: Number of new stores, the last num_new of all stores
+        num_total: Number of stores after the extension
+        max_coordinates: Most coordinates per request
+
+    Yields:
+        tuple: (slice of the new stores, slice of all stores)
+    """
+    if max_coordinates < 2:
+        raise ValueError("An OSRM /table request needs room for at least 2 coordinates")
+    new_size = max(1, min(num_new, max_coordinates // 2))
+    target_size = max_coordinates - new_size
+    for new_start in range(0, num_new, new_size):
+        for target_start in range(0, num_total, target_size):
+            yield (slice(new_start, min(new_start + new_size, num_new)),
+                   slice(target_start, min(target_start + target_size, num_total)))
+
+
+def osrm_table(session, coords, sources, destinations, base_url=None, profile=None):
+    """
+    Get the road distances and durations between coordinates from OSRM.
+
+    Args:
+        session: requests.Session used for the request
+        coords: List of (latitude, longitude) tuples
+        sources: Indices into coords of the origins
+        destinations: Indices into coords of the destinations
+        base_url: OSRM server URL; defaults to OSRM_URL
+        profile: OSRM routing profile; defaults to OSRM_PROFILE
+
+    Returns:
+        tuple: (distances in km, durations in minutes) as arrays of shape
+            (sources, destinations); unroutable pairs are NaN
+
+    Raises:
+        ValueError: If OSRM rejects the request
+    """
+    base_url = (base_url or config.OSRM_URL).rstrip('/')
+    profile = profile or config.OSRM_PROFILE
+    url = f"{base_url}/table/v1/{profile}/" + ';'.join(f"{lon},{lat}" for lat, lon in coords)
+    params = {
+        'sources': ';'.join(map(str, sources)),
+        'destinations': ';'.join(map(str, destinations)),
+        'annotations': 'distance,duration'
+    }
+    response = session.get(url, params=params, timeout=REQUEST_TIMEOUT_SECONDS)
+    body = response.json() if response.headers.get('Content-Type', '').startswith('application/json') else {}
+    if response.status_code != 200 or body.get('code') != 'Ok':
+        raise ValueError(f"OSRM /table request failed ({response.status_code}): "
+                         f"{body.get('code', '')} {body.get('message', response.text[:200])}")
+
+    distances = np.array(body['distances'], dtype=float) / 1000
+    durations = np.array(body['durations'], dtype=float) / 60
+    return distances, durations
+
+
+def compute_new_entries(new_coords, all_coords, base_url=None, profile=None, max_coordinates=None,
+                        session=None):
+    """
+    Compute the matrix rows and columns of new stores.
+
+    Only the pairs involving a new store are requested: adding N stores to M
+    costs N x (M + N) entries each way, in a few batched /table requests,
+    instead of rebuilding the (M + N)^2 matrix.
+
+    Args:
+        new_coords: List of (latitude, longitude) of the new stores
+        all_coords: List of (latitude, longitude) of all stores, ending with the new ones
+        base_url: OSRM server URL; defaults to OSRM_URL
+        profile: OSRM routing profile; defaults to OSRM_PROFILE
+        max_coordinates: Most coordinates per request; defaults to OSRM_TABLE_MAX_COORDINATES
+        session: requests.Session to reuse (optional)
+
+    Returns:
+        tuple: (entries, number of requests), where entries maps 'distance' and
+            'time' to (rows of shape (N, M + N), columns of shape (M + N, N))
+    """
+    max_coordinates = max_coordinates or config.OSRM_TABLE_MAX_COORDINATES
+    if session is None:
+        import requests  # imported on first use, so importing the package stays fast
+        session = requests.Session()
+    num_new, num_total = len(new_coords), len(all_coords)
+    entries = {
+        metric_name: (np.full((num_new, num_total), np.nan), np.full((num_total, num_new), np.nan))
+        for metric_name in ('distance', 'time')
+    }
+
+    num_requests = 0
+    for new_slice, target_slice in table_blocks(num_new, num_total, max_coordinates):
+        block = new_coords[new_slice]
+        coords = block + all_coords[target_slice]
+        new_indices = range(len(block))
+        target_indices = range(len(block), len(coords))
+
+        # New stores to all stores, then all stores back to the new stores
+        outgoing = osrm_table(session, coords, new_indices, target_indices, base_url, profile)
+        incoming = osrm_table(session, coords, target_indices, new_indices, base_url, profile)
+        for (rows, columns), out_values, in_values in zip(entries.values(), outgoing, incoming):
+            rows[new_slice, target_slice] = out_values
+            columns[target_slice, new_slice] = in_values
+        num_requests += 2
+        logger.debug("Fetched stores %d-%d against %d-%d", new_slice.start, new_slice.stop,
+                     target_slice.start, target_slice.stop)
+
+    return entries, num_requests
+
+
+def extend_matrix(matrix_df, new_codes, rows, columns):
+    """
+    Append the rows and columns of new stores to a matrix.
+
+    Args:
+        matrix_df: DataFrame containing the existing matrix
+        new_codes: Codes of the new stores
+        rows: Array of shape (N, M + N) from the new stores to all stores
+        columns: Array of shape (M + N, N) from all stores to the new stores
+
+    Returns:
+        DataFrame: The extended matrix, existing codes first
+    """
+    num_existing = len(matrix_df)
+    num_total = num_existing + len(new_codes)
+    values = np.empty((num_total, num_total))
+    values[:num_existing, :num_existing] = matrix_df.to_numpy(dtype=float)
+    values[num_existing:, :] = rows
+    values[:, num_existing:] = columns
+    np.fill_diagonal(values, 0.0)
+
+    codes = list(matrix_df.index.astype(str)) + list(new_codes)
+    return pd.DataFrame(np.round(values, MATRIX_DECIMALS), index=codes, columns=codes)
+
+
+def load_manifest(versions_dir):
+    """
+    Load the version history of the master files.
+
+    Args:
+        versions_dir: Versions folder
+
+    Returns:
+        dict: 'current' version number and the list of 'versions'; version 0
+            is the master files as they were before the first extension
+    """
+    path = os.path.join(versions_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'current': 0, 'versions': []}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def publish_version(frames, versions_dir, entry):
+    """
+    Replace the master files with new versions, keeping the current ones.
+
+    The current files are kept in versions/v<current>/ (hard links where the
+    file system allows) and each new file is written beside its target and
+    moved over it, so a reader never sees a partly written master file.
+
+    Args:
+        frames: Dictionary of path -> (DataFrame, to_csv keyword arguments)
+        versions_dir: Versions folder
+        entry: Manifest details of the new version
+
+    Returns:
+        int: The new version number
+    """
+    manifest = load_manifest(versions_dir)
+    archive_dir = os.path.join(versions_dir, f"v{manifest['current']:04d}")
+    os.makedirs(archive_dir, exist_ok=True)
+
+    for path, (frame, csv_options) in frames.items():
+        temp_path = f"{path}.tmp"
+        frame.to_csv(temp_path, **csv_options)
+        archived = os.path.join(archive_dir, os.path.basename(path))
+        if os.path.exists(path) and not os.path.exists(archived):
+            try:
+                os.link(path, archived)
+            except OSError:
+                os.replace(path, archived)
+        os.replace(temp_path, path)
+
+    manifest['current'] += 1
+    manifest['versions'].append(dict(entry, version=manifest['current'],
+                                     previous=os.path.relpath(archive_dir, versions_dir)))
+    manifest_path = os.path.join(versions_dir, MANIFEST_NAME)
+    with open(f"{manifest_path}.tmp", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return manifest['current']
+
+
+def extend_master_matrices(stores_df, distance_path='data/master/osrm_distance_matrix.csv',
+                           duration_path='data/master/osrm_duration_matrix.csv',
+                           gps_path='data/master/master_gps.csv', base_url=None, profile=None,
+                           max_coordinates=None, dry_run=False, session=None):
+    """
+    Add new stores to the master matrices and GPS data.
+
+    Stores of stores_df that are not in the distance matrix get their rows
+    and columns from OSRM; the existing entries are kept as they are. The
+    matrices and master_gps.csv are then replaced as a new version (see
+    publish_version). VRPController picks the new files up on its next load.
+
+    Args:
+        stores_df: DataFrame with CODE, LATITUDE and LONGITUDE columns and
+            optionally the other master GPS columns
+        distance_path: Path to the master distance matrix
+        duration_path: Path to the master duration matrix
+        gps_path: Path to the master GPS file
+        base_url: OSRM server URL; defaults to OSRM_URL
+        profile: OSRM routing profile; defaults to OSRM_PROFILE
+        max_coordinates: Most coordinates per request; defaults to OSRM_TABLE_MAX_COORDINATES
+        dry_run: Boolean indicating whether to only compute, without writing
+        session: requests.Session to reuse (optional)
+
+    Returns:
+        dict: added_codes, num_stores, requests and version (None when nothing was written)
+
+    Raises:
+        ValueError: If existing stores lack coordinates or OSRM cannot route a new store
+    """
+    distance_df = load_matrix_df(distance_path)
+    distance_df.index = distance_df.index.astype(str)
+    distance_df.columns = distance_df.columns.astype(str)
+    duration_df = align_matrix(load_matrix_df(duration_path), distance_df)
+    gps_df = get_str_key(load_df(gps_path))
+    gps_df['CODE'] = gps_df['CODE'].astype(str)
+
+    new_stores = find_new_stores(stores_df, distance_df.index)
+    summary = {'added_codes': new_stores['CODE'].tolist(), 'num_stores': len(distance_df),
+               'requests': 0, 'version': None}
+    if new_stores.empty:
+        logger.info("No new stores; the master matrices are up to date")
+        return summary
+
+    # Existing stores in matrix order, then the new stores
+    coordinates = {'0': DEPOT_COORDS}
+    coordinates.update(zip(gps_df['CODE'], zip(gps_df['LATITUDE'], gps_df['LONGITUDE'])))
+    missing = [code for code in distance_df.index if code not in coordinates]
+    if missing:
+        raise ValueError(f"{len(missing)} matrix codes have no coordinates in {gps_path}: {', '.join(missing[:10])}")
+    new_coords = list(zip(new_stores['LATITUDE'], new_stores['LONGITUDE']))
+    all_coords = [coordinates[code] for code in distance_df.index] + new_coords
+
+    logger.info("Adding %d stores to a %d-store matrix", len(new_stores), len(distance_df))
+    entries, summary['requests'] = compute_new_entries(
+        new_coords, all_coords, base_url, profile, max_coordinates, session)
+
+    unroutable = set()
+    for rows, columns in entries.values():
+        unroutable.update(np.flatnonzero(np.isnan(rows).any(axis=1)))
+        unroutable.update(np.flatnonzero(np.isnan(columns).any(axis=0)))
+    if unroutable:
+        codes = [summary['added_codes'][i] for i in sorted(unroutable)]
+        raise ValueError(f"OSRM found no route to or from {len(codes)} new stores: {', '.join(codes[:10])}")
+
+    new_codes = summary['added_codes']
+    extended = {
+        distance_path: extend_matrix(distance_df, new_codes, *entries['distance']),
+        duration_path: extend_matrix(duration_df, new_codes, *entries['time'])
+    }
+    gps_df = pd.concat([gps_df, new_stores.reindex(columns=gps_df.columns)], ignore_index=True)
+    summary['num_stores'] = len(extended[distance_path])
+
+    if dry_run:
+        return summary
+
+    versions_dir = os.path.join(os.path.dirname(os.path.abspath(distance_path)), VERSIONS_DIRNAME)
+    frames = {path: (frame, {}) for path, frame in extended.items()}
+    frames[gps_path] = (gps_df, {'index': False})
+    summary['version'] = publish_version(frames, versions_dir, {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'added_codes': new_codes,
+        'num_stores': summary['num_stores'],
+        'osrm_url': base_url or config.OSRM_URL,
+        'requests': summary['requests']
+    })
+    logger.info("Master matrices extended to %d stores (version %d)", summary['num_stores'], summary['version'])
+    return summary
+
+
+def add_estimated_stores(matrix_df, gps_df, new_stores):
+    """
+    Append provisional entries for stores that are not in a matrix yet.
+
+    Entries are great-circle distances times a road factor fitted on the
+    matrix itself: road km per straight km for a distance matrix, minutes per
+    straight km for a duration matrix. The factor is fitted on a sample of
+    at most FIT_SAMPLE_STORES stores.
+
+    Args:
+        matrix_df: DataFrame containing the distance or duration matrix
+        gps_df: Master GPS DataFrame with the coordinates of the matrix codes
+        new_stores: DataFrame of the new stores (CODE, LATITUDE, LONGITUDE), as
+            returned by find_new_stores
+
+    Returns:
+        DataFrame: The matrix with the new stores appended
+
+    Raises:
+        ValueError: If matrix codes lack coordinates
+    """
+    if is_sparse(matrix_df):
+        # A sparse matrix estimates every pair it has no exact entry for
+        return matrix_df.with_stores(new_stores['CODE'].tolist(), new_stores['LATITUDE'].to_numpy(float),
+                                     new_stores['LONGITUDE'].to_numpy(float))
+
+    gps_df = gps_df.assign(CODE=gps_df['CODE'].astype(str))
+    sample = gps_df[gps_df['CODE'].isin(set(matrix_df.index.astype(str)))]
+    sample = sample.sample(n=min(len(sample), FIT_SAMPLE_STORES), random_state=0)
+    road_factor, _ = fit_road_factor(sample, matrix_df)
+
+    coords = gps_df.drop_duplicates(subset=['CODE']).set_index('CODE')[['LATITUDE', 'LONGITUDE']]
+    codes = matrix_df.index.astype(str)
+    missing = codes.difference(coords.index)
+    if len(missing):
+        raise ValueError(f"{len(missing)} matrix codes have no coordinates: {', '.join(missing[:10])}")
+    lat = np.concatenate([coords.loc[codes, 'LATITUDE'].to_numpy(), new_stores['LATITUDE'].to_numpy(float)])
+    lon = np.concatenate([coords.loc[codes, 'LONGITUDE'].to_numpy(), new_stores['LONGITUDE'].to_numpy(float)])
+    new_lat, new_lon = lat[len(codes):], lon[len(codes):]
+
+    rows = haversine_km(new_lat[:, None], new_lon[:, None], lat[None, :], lon[None, :]) * road_factor
+    logger.debug("Estimated %d stores with road factor %.3f", len(new_stores), road_factor)
+    return extend_matrix(matrix_df, new_stores['CODE'].tolist(), rows, rows.T)
+
+
+def queue_pending_stores(new_stores, path=None):
+    """
+    Queue stores with provisional matrix entries for a real matrix update.
+
+    Args:
+        new_stores: DataFrame of the new stores, as returned by find_new_stores
+        path: Queue file; defaults to PENDING_STORES_PATH
+
+    Returns:
+        int: Number of stores in the queue
+    """
+    path = path or config.PENDING_STORES_PATH
+    with _pending_lock:
+        queued = load_df(path) if os.path.exists(path) else pd.DataFrame(columns=new_stores.columns)
+        queued['CODE'] = queued['CODE'].astype(str)
+        queued = pd.concat([queued, new_stores], ignore_index=True).drop_duplicates(subset=['CODE'])
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        queued.to_csv(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+    return len(queued)
+
+
+def update_pending_stores(path=None, distance_path='data/master/osrm_distance_matrix.csv',
+                          duration_path='data/master/osrm_duration_matrix.csv',
+                          gps_path='data/master/master_gps.csv', **osrm_options):
+    """
+    Add the queued stores to the master matrices and clear them from the queue.
+
+    Stores queued while the update runs stay in the queue. If the update
+    fails, for example because OSRM is unreachable, the queue is kept.
+
+    Args:
+        path: Queue file; defaults to PENDING_STORES_PATH
+        distance_path: Path to the master distance matrix
+        duration_path: Path to the master duration matrix
+        gps_path: Path to the master GPS file
+        **osrm_options: base_url, profile or max_coordinates for extend_master_matrices
+
+    Returns:
+        dict: Summary of extend_master_matrices, or None if the queue is empty
+    """
+    path = path or config.PENDING_STORES_PATH
+    if not os.path.exists(path):
+        return None
+    queued = load_df(path)
+    if queued.empty:
+        return None
+
+    summary = extend_master_matrices(queued, distance_path, duration_path, gps_path, **osrm_options)
+
+    # Keep only the stores that are still missing from the matrices
+    with _pending_lock:
+        matrix_codes = set(load_matrix_df(distance_path).index.astype(str))
+        remaining = get_str_key(load_df(path))
+        remaining = remaining[~remaining['CODE'].astype(str).isin(matrix_codes)]
+        if remaining.empty:
+            os.remove(path)
+        else:
+            remaining.to_csv(f"{path}.tmp", index=False)
+            os.replace(f"{path}.tmp", path)
+    return summary
+
+
+def start_pending_update(**update_options):
+    """
+    Run update_pending_stores in a background thread, unless one is already running.
+
+    Args:
+        **update_options: Keyword arguments for update_pending_stores
+
+    Returns:
+        bool: Whether a new update was started
+    """
+    global _pending_thread
+
+    def run():
+        try:
+            summary = update_pending_stores(**update_options)
+            if summary:
+                logger.info("Pending stores added to the master matrices: %s", ', '.join(summary['added_codes']))
+        except Exception as e:
+            logger.warning("Pending store update failed, stores stay queued: %s", e)
+
+    with _pending_lock:
+        if _pending_thread is not None and _pending_thread.is_alive():
+            return False
+        _pending_thread = threading.Thread(target=run, name='pending-store-update', daemon=True)
+        _pending_thread.start()
+    return True
+
+
+if __name__ == '__main__':
+    import argparse
+    from vehi_rout.core.log_config import configure_logging
+
+    parser = argparse.ArgumentParser(description='Add new stores to the master distance and duration matrices')
+    parser.add_argument('stores', type=str, nargs='?', default=None,
+                        help='CSV file with CODE, LATITUDE and LONGITUDE columns (a PO file or a new master GPS file); '
+                             'defaults to the stores queued with provisional entries (PENDING_STORES_PATH)')
+    parser.add_argument('--matrix', type=str, default='data/master/osrm_distance_matrix.csv',
+                        help='Path to the master distance matrix')
+    parser.add_argument('--duration-matrix', type=str, default='data/master/osrm_duration_matrix.csv',
+                        help='Path to the master duration matrix')
+    parser.add_argument('--gps', type=str, default='data/master/master_gps.csv',
+                        help='Path to the master GPS file')
+    parser.add_argument('--osrm-url', type=str, default=None,
+                        help='OSRM server URL (default: VRP_OSRM_URL or OSRM_URL)')
+    parser.add_argument('--max-coordinates', type=int, default=None,
+                        help="Most coordinates per /table request (at most the server's --max-table-size)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Query OSRM but do not write the master files')
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.stores is None and not args.dry_run:
+        result = update_pending_stores(distance_path=args.matrix, duration_path=args.duration_matrix,
+                                       gps_path=args.gps, base_url=args.osrm_url,
+                                       max_coordinates=args.max_coordinates)
+    else:
+        stores_path = args.stores or config.PENDING_STORES_PATH
+        result = extend_master_matrices(
+            load_df(stores_path) if os.path.exists(stores_path) else pd.DataFrame(columns=['CODE']),
+            args.matrix, args.duration_matrix, args.gps,
+            base_url=args.osrm_url, max_coordinates=args.max_coordinates, dry_run=args.dry_run)
+    if not result or not result['added_codes']:
+        print("No new stores to add.")
+    else:
+        written = 'not written (dry run)' if result['version'] is None else f"version {result['version']}"
+        print(f"Added {len(result['added_codes'])} stores in {result['requests']} OSRM requests: "
+              f"{result['num_stores']} stores, {written}")
@@ -0,0 +1,249 @@
+"""
+Purchase order (PO) reader for the Vehicle Routing Problem.
+Reads PO files against a declared schema: every column is read as text and
+converted to its declared type, dates are parsed with the configured
+formats, every row is validated in one pass and stores listed more than
+once are merged into one row.
+"""
+
+import logging
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+import vehi_rout.config as config
+from vehi_rout.utils.code_table import normalize_codes
+
+try:
+    import pyarrow  # noqa: F401  (optional; enables the faster pyarrow CSV engine)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+# Columns every PO row needs
+REQUIRED_COLUMNS = ('CODE', 'DATE')
+
+# Declared dtypes of the numeric PO columns; other columns are kept as text
+NUMERIC_COLUMNS = {
+    'LATITUDE': 'float64',
+    'LONGITUDE': 'float64',
+    'DEMAND': 'float64',
+    'SERVICE_TIME': 'float64'
+}
+
+# Valid range of the coordinate columns
+COORDINATE_RANGES = {'LATITUDE': (-90, 90), 'LONGITUDE': (-180, 180)}
+
+# Rejected rows named in a log message or error
+MAX_REPORTED_ROWS = 10
+
+
+def csv_engine(engine=None):
+    """
+    Choose the pandas CSV engine for PO files.
+
+    Args:
+        engine: Engine to use; defaults to PO_CSV_ENGINE
+
+    Returns:
+        str: 'pyarrow' when requested or installed, else 'c'
+    """
+    engine = engine or config.PO_CSV_ENGINE
+    if engine is None:
+        return 'pyarrow' if HAS_PYARROW else 'c'
+    return engine
+
+
+def parse_dates(values, formats=None):
+    """
+    Parse PO dates with explicit formats instead of format inference.
+
+    Args:
+        values: Series of date strings or datetimes
+        formats: Formats tried in order; defaults to PO_DATE_FORMATS
+
+    Returns:
+        Series: datetime64 values, NaT where no format matches
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    text = values if pd.api.types.is_object_dtype(values) else values.astype(str).where(values.notna())
+    dates = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for date_format in formats or config.PO_DATE_FORMATS:
+        pending = dates.isna() & text.notna()
+        if not pending.any():
+            break
+        dates[pending] = pd.to_datetime(text[pending], format=date_format, errors='coerce')
+    return dates
+
+
+def _strip_text(values):
+    """Strip whitespace around text values, once per distinct value."""
+    if not pd.api.types.is_object_dtype(values):
+        return values
+    positions, uniques = pd.factorize(values)
+    stripped = np.array([value.strip() if isinstance(value, str) else value for value in uniques] + [np.nan],
+                        dtype=object)
+    return pd.Series(stripped[positions], index=values.index)  # position -1 (missing) takes the NaN
+
+
+def validate_po(df, first_row=2):
+    """
+    Convert PO rows to their declared types and separate the invalid rows.
+
+    Args:
+        df: Raw PO rows, e.g. read as text
+        first_row: Number reported for the first row; 2 is its line in a
+            CSV file with a header
+
+    Returns:
+        tuple: (valid rows, rejected rows); the rejected rows keep their raw
+            values and get ROW and REASON columns
+
+    Raises:
+        ValueError: If a required column is missing
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"PO is missing required columns: {', '.join(missing)}")
+
+    df = df.reset_index(drop=True)
+    typed = df.copy(deep=False)
+    problems = []
+
+    codes = _strip_text(df['CODE'])
+    blank = codes.isna() | (codes == '')
+    problems.append((blank, 'missing CODE'))
+    typed['CODE'] = ''
+    typed.loc[~blank, 'CODE'] = normalize_codes(codes[~blank]).to_numpy(dtype=object)
+
+    typed['DATE'] = parse_dates(df['DATE'])
+    problems.append((typed['DATE'].isna(), 'invalid DATE'))
+
+    for column, dtype in NUMERIC_COLUMNS.items():
+        if column not in df.columns:
+            continue
+        values = pd.to_numeric(df[column], errors='coerce').astype(dtype)
+        problems.append((values.isna() & df[column].notna(), f'invalid {column}'))
+        if column in COORDINATE_RANGES:
+            low, high = COORDINATE_RANGES[column]
+            problems.append(((values < low) | (values > high), f'{column} out of range'))
+        typed[column] = values
+
+    if 'DEMAND' not in typed.columns:
+        typed['DEMAND'] = 1.0
+    typed['DEMAND'] = typed['DEMAND'].fillna(1.0)
+    problems.append((typed['DEMAND'] < 0, 'negative DEMAND'))
+
+    # Every reason of every row, found in one pass over the columns
+    flags = pd.DataFrame({reason: mask.fillna(False).astype(bool) for mask, reason in problems})
+    bad = flags.any(axis=1)
+    if not bad.any():
+        return typed, df.iloc[:0].assign(ROW=pd.Series(dtype='int64'), REASON=pd.Series(dtype=object))
+
+    rejected = df[bad].copy()
+    rejected.insert(0, 'ROW', rejected.index + first_row)
+    rejected['REASON'] = [
+        '; '.join(flags.columns[row]) for row in flags[bad].to_numpy()
+    ]
+    return typed[~bad].reset_index(drop=True), rejected.reset_index(drop=True)
+
+
+def aggregate_po(df):
+    """
+    Merge the rows of stores listed more than once.
+
+    A merged store keeps its earliest DATE, so it is as urgent as its oldest
+    order, and the sum of its DEMAND; other columns come from its first row.
+
+    Args:
+        df: Validated PO rows
+
+    Returns:
+        DataFrame: One row per CODE, in order of first appearance
+    """
+    if not df['CODE'].duplicated().any():
+        return df
+    aggregations = {column: 'first' for column in df.columns if column != 'CODE'}
+    aggregations.update(DATE='min', DEMAND='sum')
+    merged = df.groupby('CODE', sort=False, as_index=False).agg(aggregations)
+    logger.info("Merged %d duplicate PO rows into %d stores", len(df) - len(merged), len(merged))
+    return merged[df.columns]
+
+
+def describe_rejected(rejected):
+    """
+    Summarise rejected rows for a log message or error.
+
+    Args:
+        rejected: Rejected rows as returned by validate_po
+
+    Returns:
+        str: e.g. "2 invalid PO rows: row 3 (invalid DATE), row 7 (missing CODE)"
+    """
+    rows = ', '.join(f"row {row} ({reason})" for row, reason in
+                     zip(rejected['ROW'][:MAX_REPORTED_ROWS], rejected['REASON'][:MAX_REPORTED_ROWS]))
+    more = f" and {len(rejected) - MAX_REPORTED_ROWS} more" if len(rejected) > MAX_REPORTED_ROWS else ''
+    return f"{len(rejected)} invalid PO rows: {rows}{more}"
+
+
+def prepare_po(df, strict=False, first_row=2):
+    """
+    Validate, type and merge PO rows.
+
+    Args:
+        df: Raw PO rows
+        strict: Raise on any invalid row instead of dropping it
+        first_row: Number reported for the first row (see validate_po)
+
+    Returns:
+        tuple: (demand DataFrame, rejected rows)
+
+    Raises:
+        ValueError: If a required column is missing, no row is valid, or
+            strict is set and a row is invalid
+    """
+    valid, rejected = validate_po(df, first_row)
+    if len(rejected):
+        if strict or valid.empty:
+            raise ValueError(describe_rejected(rejected))
+        logger.warning("Skipping %s", describe_rejected(rejected))
+    if valid.empty:
+        raise ValueError("PO has no rows")
+    return aggregate_po(valid), rejected
+
+
+def read_po(path, engine=None, strict=False):
+    """
+    Read a PO CSV file against the PO schema.
+
+    Args:
+        path: Path or file object of the PO CSV
+        engine: pandas CSV engine; defaults to csv_engine()
+        strict: Raise on any invalid row instead of dropping it
+
+    Returns:
+        tuple: (demand DataFrame, rejected rows)
+
+    Raises:
+        ValueError: If the file has no valid rows, or strict is set and a row is invalid
+    """
+    engine = csv_engine(engine)
+    if engine == 'pyarrow':
+        # The pyarrow engine applies dtypes after reading, so it reads text
+        # and validate_po converts the numeric columns
+        return prepare_po(pd.read_csv(path, dtype=str, engine=engine), strict=strict)
+
+    # Numeric columns are parsed by the CSV engine; a file with a malformed
+    # number is read again as text, so validate_po can report the bad rows
+    dtypes = defaultdict(lambda: str, NUMERIC_COLUMNS)
+    try:
+        raw = pd.read_csv(path, dtype=dtypes, engine=engine, skipinitialspace=True)
+    except ValueError:
+        if hasattr(path, 'seek'):
+            path.seek(0)
+        raw = pd.read_csv(path, dtype=str, engine=engine, skipinitialspace=True)
+    return prepare_po(raw, strict=strict)
@@ -2,17 +2,133 @@
 Route utilities for the Vehicle Routing Problem.
 """
 
-# No imports needed for this module
+import numpy as np
 
-def sort_nodes_by_distance(matrix):
+from vehi_rout.utils.code_table import demand_ids
+from vehi_rout.utils.knn_matrix import is_sparse
+
+# Units of the routing metrics, keyed by metric name
+METRIC_UNITS = {"distance": "km", "time": "mins"}
+
+# Shortest depot round trip (km or mins) used when scoring stores by penalty per km,
+# so stores at the depot's own location do not get an unbounded score
+MIN_ROUND_TRIP = 1.0
+
+def _depot_round_trips(matrix):
+    """Distance or time from the depot to every node and back."""
+    if is_sparse(matrix):
+        return matrix.depot_row + matrix.depot_column
+    values = np.asarray(matrix, dtype=float)
+    return values[0] + values[:, 0]
+
+def node_penalties(matrix, demand_dict, penalty_list):
+    """
+    Spread the penalties of the demand keys over the matrix nodes.
+
+    Args:
+        matrix: Distance/time matrix DataFrame or KnnMatrix, depot first
+        demand_dict: Dictionary containing demand information
+        penalty_list: Penalty per demand_dict key, as returned by get_penalty_list
+
+    Returns:
+        ndarray: Penalty per node, -inf for nodes not in the PO; a store
+            listed more than once keeps its highest penalty
+    """
+    ids = demand_ids(demand_dict, matrix.index)
+    found = ids > 0
+    penalties = np.full(len(matrix), -np.inf)
+    np.maximum.at(penalties, ids[found], np.asarray(penalty_list, dtype=float)[found])
+    return penalties
+
+def select_po_nodes(matrix, demand_dict, penalty_list, max_nodes=None, nodes=None):
+    """
+    Select the PO stores a day's model includes, most urgent per km first.
+
+    Only stores in the PO that are in the matrix are candidates. When there
+    are more than max_nodes of them, each is scored by its penalty for not
+    being visited divided by its round trip from the depot, and the
+    max_nodes highest scores are kept; ties go to the nearer store. Urgent
+    stores far from the depot are then kept ahead of nearby stores that can
+    wait, while the model stays bounded.
+
+    Args:
+        matrix: Distance/time matrix DataFrame or KnnMatrix, depot first
+        demand_dict: Dictionary containing demand information
+        penalty_list: Penalty per demand_dict key, as returned by get_penalty_list
+        max_nodes: Maximum number of nodes; None keeps every candidate
+        nodes: Node indices to choose from, such as the stores left over
+            from earlier days (optional; defaults to every node)
+
+    Returns:
+        list: Sorted list of node indices
+    """
+    penalties = node_penalties(matrix, demand_dict, penalty_list)
+    candidates = np.flatnonzero(np.isfinite(penalties))
+    if nodes is not None:
+        candidates = np.intersect1d(candidates, np.asarray(list(nodes), dtype=np.int64))
+
+    if max_nodes is None or max_nodes >= len(candidates):
+        return candidates.tolist()
+
+    round_trips = np.maximum(_depot_round_trips(matrix)[candidates], MIN_ROUND_TRIP)
+    scores = penalties[candidates] / round_trips
+    order = np.lexsort((round_trips, -scores))
+    return np.sort(candidates[order[:max_nodes]]).tolist()
+
+def summarize_routes(route_dicts, visited_sets, po_nodes, use_distance):
+    """
+    Compute the result statistics of a finished solve.
+
+    Args:
+        route_dicts: List of route dictionaries, one per day
+        visited_sets: List of sets of visited nodes, one per day
+        po_nodes: Set of nodes in the PO file
+        use_distance: Boolean indicating whether to use distance or time
+
+    Returns:
+        dict: nodes_visited, total_stops, total_metric and unvisited_count
+    """
+    metric_name = "distance" if use_distance else "time"
+    all_visited = set().union(*visited_sets) if visited_sets else set()
+    return {
+        'nodes_visited': len(all_visited & po_nodes),
+        'total_stops': sum(info.get('num_visits', 0) for routes in route_dicts for info in routes.values()),
+        'total_metric': round(float(sum(info.get(f'route_{metric_name}', 0) for routes in route_dicts for info in routes.values())), 2),
+        'unvisited_count': len(po_nodes - all_visited)
+    }
+
+def route_metric_names(route_dict, use_distance):
+    """
+    List the metrics recorded for a day's routes, the minimised metric first.
+
+    Solves with both a distance and a duration matrix record both metrics
+    for every route; other solves record only the minimised one.
+
+    Args:
+        route_dict: Dictionary containing route information for each vehicle
+        use_distance: Boolean indicating whether distance or time was minimised
+
+    Returns:
+        list: Metric names ('distance', 'time')
+    """
+    primary = "distance" if use_distance else "time"
+    return [primary] + [
+        name for name in METRIC_UNITS
+        if name != primary and any(f"route_{name}" in info for info in route_dict.values())
+    ]
+
+def format_arrival_times(arrival_times, start_time="08:00"):
     """
-    Sort nodes by distance from the depot.
+    Format a route's arrival times as clock times.
 
     Args:
-        matrix: Distance matrix
+        arrival_times: Minutes after leaving the depot, one per stop
+        start_time: Clock time (HH:MM) at which the vehicle leaves the depot
 
     Returns:
-        list: List of node indices sorted by distance from the depot
+        str: Clock times joined with arrows, e.g. '08:00 -> 08:35'
     """
-    distances = [(node, matrix[0][node]) for node in range(1, len(matrix))]
-    return [node for node, _ in sorted(distances, key=lambda x: x[1])]
\ No newline at end of file
+    hours, minutes = map(int, start_time.split(':'))
+    start = hours * 60 + minutes
+    clock = (divmod(int(round(start + arrival)), 60) for arrival in arrival_times)
+    return ' -> '.join(f"{hour:02d}:{minute:02d}" for hour, minute in clock)
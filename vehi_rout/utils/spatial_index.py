@@ -0,0 +1,180 @@
+"""
+Spatial index over store coordinates for the Vehicle Routing Problem.
+Answers nearest-store, radius and bounding-box queries for many points at
+once, using a KD-tree on unit-sphere coordinates when SciPy is installed and
+vectorised NumPy otherwise.
+"""
+
+import logging
+
+import numpy as np
+
+from vehi_rout.utils.synthetic_data import EARTH_RADIUS_KM
+
+logger = logging.getLogger(__name__)
+
+# Store columns returned by SpatialIndex.records, when present in the GPS data
+RECORD_COLUMNS = ['CODE', 'LOCATION', 'BRAND', 'DISTRICT', 'LATITUDE', 'LONGITUDE']
+
+
+def _kd_tree_class():
+    """cKDTree, imported on first use; None when SciPy is not installed."""
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:  # SciPy is optional; queries fall back to NumPy
+        return None
+    return cKDTree
+
+
+def _unit_vectors(lat, lon):
+    """Convert latitudes and longitudes in degrees to points on the unit sphere."""
+    lat, lon = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def _chord_to_km(chord):
+    """Convert straight-line distances between unit-sphere points to great-circle km."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+
+
+def _km_to_chord(km):
+    """Convert great-circle km to the straight-line distance between unit-sphere points."""
+    return 2 * np.sin(np.minimum(np.asarray(km, dtype=float) / (2 * EARTH_RADIUS_KM), np.pi / 2))
+
+
+class SpatialIndex:
+    """
+    Index of store coordinates for nearest, radius and bounding-box queries.
+
+    Stores are placed on the unit sphere, where straight-line distance grows
+    with great-circle distance, so a Euclidean KD-tree answers great-circle
+    queries exactly. Distances are returned in km.
+    """
+
+    def __init__(self, gps_df):
+        """
+        Args:
+            gps_df: DataFrame with CODE, LATITUDE and LONGITUDE columns; rows
+                without coordinates are left out
+        """
+        stores = gps_df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+        self.stores = stores.assign(CODE=stores['CODE'].astype(str)).reset_index(drop=True)
+        self.codes = self.stores['CODE'].to_numpy()
+        self.latitude = self.stores['LATITUDE'].to_numpy(dtype=float)
+        self.longitude = self.stores['LONGITUDE'].to_numpy(dtype=float)
+        self._points = _unit_vectors(self.latitude, self.longitude)
+        tree_class = _kd_tree_class() if len(self._points) else None
+        self._tree = tree_class(self._points) if tree_class is not None else None
+        logger.debug("Spatial index over %d stores (%s)", len(self), 'KD-tree' if self._tree else 'NumPy')
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _chords(self, points):
+        """Straight-line distances from each query point to every store."""
+        return np.linalg.norm(points[:, None, :] - self._points[None, :, :], axis=-1)
+
+    def nearest(self, lat, lon, k=1):
+        """
+        Find the k nearest stores of each point.
+
+        Args:
+            lat: Latitude or array of latitudes
+            lon: Longitude or array of longitudes
+            k: Number of stores per point
+
+        Returns:
+            tuple: (distances in km, store positions), each of shape (points, k),
+                nearest first; k is capped at the number of stores
+        """
+        points = _unit_vectors(np.atleast_1d(lat), np.atleast_1d(lon))
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty((len(points), 0)), np.empty((len(points), 0), dtype=int)
+
+        if self._tree is not None:
+            chords, positions = self._tree.query(points, k=k)
+            chords, positions = chords.reshape(len(points), k), positions.reshape(len(points), k)
+        else:
+            all_chords = self._chords(points)
+            positions = np.argpartition(all_chords, k - 1, axis=1)[:, :k]
+            chords = np.take_along_axis(all_chords, positions, axis=1)
+            order = np.argsort(chords, axis=1, kind='stable')
+            positions = np.take_along_axis(positions, order, axis=1)
+            chords = np.take_along_axis(chords, order, axis=1)
+        return _chord_to_km(chords), positions
+
+    def within_radius(self, lat, lon, radius_km):
+        """
+        Find the stores within a radius of each point.
+
+        Args:
+            lat: Latitude or array of latitudes
+            lon: Longitude or array of longitudes
+            radius_km: Radius in km, or one radius per point
+
+        Returns:
+            list: (distances in km, store positions) per point, nearest first
+        """
+        points = _unit_vectors(np.atleast_1d(lat), np.atleast_1d(lon))
+        radii = np.broadcast_to(_km_to_chord(radius_km), (len(points),))
+
+        if self._tree is not None:
+            candidates = [np.asarray(found, dtype=int) for found in
+                          self._tree.query_ball_point(points, radii)]
+        else:
+            chords = self._chords(points)
+            candidates = [np.flatnonzero(row <= radius) for row, radius in zip(chords, radii)]
+
+        results = []
+        for point, positions in zip(points, candidates):
+            chords = np.linalg.norm(self._points[positions] - point, axis=-1)
+            order = np.argsort(chords, kind='stable')
+            results.append((_chord_to_km(chords[order]), positions[order]))
+        return results
+
+    def in_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Find the stores inside a latitude/longitude box.
+
+        Args:
+            min_lat: Southern edge
+            min_lon: Western edge
+            max_lat: Northern edge
+            max_lon: Eastern edge
+
+        Returns:
+            ndarray: Store positions inside the box, in index order
+        """
+        return np.flatnonzero((self.latitude >= min_lat) & (self.latitude <= max_lat)
+                              & (self.longitude >= min_lon) & (self.longitude <= max_lon))
+
+    def records(self, positions, distances=None):
+        """
+        Describe stores found by a query.
+
+        Args:
+            positions: Store positions returned by a query
+            distances: Distances in km of those stores (optional)
+
+        Returns:
+            DataFrame: One row per store, with a distance_km column when distances are given
+        """
+        columns = [column for column in RECORD_COLUMNS if column in self.stores.columns]
+        result = self.stores.iloc[np.asarray(positions, dtype=int)][columns].reset_index(drop=True)
+        if distances is not None:
+            result['distance_km'] = np.round(np.asarray(distances, dtype=float), 3)
+        return result
+
+
+def stores_only(gps_df):
+    """
+    Drop the depot from GPS data, leaving the stores.
+
+    Args:
+        gps_df: DataFrame with a CODE column
+
+    Returns:
+        DataFrame: Rows of the stores
+    """
+    return gps_df[gps_df['CODE'].astype(str) != '0']
@@ -0,0 +1,279 @@
+"""
+Synthetic instance generator for the Vehicle Routing Problem.
+Creates master GPS data, distance/duration matrices and PO files of any size
+by sampling stores around the clusters of the real store network, so that the
+data model, solver and reports can be stress-tested beyond the real network.
+"""
+
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Depot (SMAK_KADAWATHA) coordinates, as added by VRPController.set_data
+DEPOT_COORDS = (7.0038321, 79.9394804)
+
+# Mean Earth radius in km
+EARTH_RADIUS_KM = 6371.0088
+
+# Standard deviation (km) of the offset of a synthetic store from the real store it is sampled around
+DEFAULT_JITTER_KM = 2.0
+
+# Spread of the per-store detour factor around the fitted road factor
+DEFAULT_CIRCUITY_SIGMA = 0.08
+
+# Matrix rows computed and written at a time, bounding memory for large instances
+MATRIX_BLOCK_ROWS = 256
+
+# Default first PO date, the date of the bundled PO files, so instances are reproducible
+DEFAULT_ORDER_DATE = datetime(2025, 3, 4)
+
+# PO columns written for synthetic orders, matching the bundled PO files
+PO_COLUMNS = ['CODE', 'LOCATION', 'ADDRESS', 'LATITUDE', 'LONGITUDE', 'BRAND', 'DATE']
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km, broadcasting over NumPy arrays.
+
+    Args:
+        lat1: Latitude(s) of the origins in degrees
+        lon1: Longitude(s) of the origins in degrees
+        lat2: Latitude(s) of the destinations in degrees
+        lon2: Longitude(s) of the destinations in degrees
+
+    Returns:
+        ndarray: Distances in km
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def fit_road_factor(gps_df, distance_df, duration_df=None, min_km=1.0):
+    """
+    Fit the ratio of road to straight-line distance, and the driving pace, from real matrices.
+
+    Args:
+        gps_df: Master GPS DataFrame (CODE, LATITUDE, LONGITUDE)
+        distance_df: Road distance matrix in km, indexed by CODE
+        duration_df: Road duration matrix in minutes, indexed by CODE (optional)
+        min_km: Pairs closer than this are ignored
+
+    Returns:
+        tuple: (road factor, minutes per road km or None)
+    """
+    coords = gps_df.assign(CODE=gps_df['CODE'].astype(str)).set_index('CODE')[['LATITUDE', 'LONGITUDE']]
+    codes = [code for code in distance_df.index.astype(str) if code in coords.index]
+    lat = coords.loc[codes, 'LATITUDE'].to_numpy()
+    lon = coords.loc[codes, 'LONGITUDE'].to_numpy()
+
+    straight = haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    road = distance_df.loc[codes, codes].to_numpy(dtype=float)
+    mask = (straight >= min_km) & np.isfinite(road) & (road > 0)
+    road_factor = float(np.median(road[mask] / straight[mask]))
+
+    minutes_per_km = None
+    if duration_df is not None:
+        duration = duration_df.loc[codes, codes].to_numpy(dtype=float)
+        pace_mask = mask & np.isfinite(duration) & (duration > 0)
+        minutes_per_km = float(np.median(duration[pace_mask] / road[pace_mask]))
+
+    return road_factor, minutes_per_km
+
+
+def generate_stores(gps_df, num_stores, seed=0, jitter_km=DEFAULT_JITTER_KM):
+    """
+    Sample synthetic stores around the real ones.
+
+    Each synthetic store is placed near a randomly chosen real store, so the
+    synthetic network keeps the density of the real clusters (Colombo,
+    Gampaha, Kandy, ...). Brand and district are taken from that store.
+
+    Args:
+        gps_df: Master GPS DataFrame of the real network
+        num_stores: Number of synthetic stores
+        seed: Random seed
+        jitter_km: Standard deviation of the offset from the real store, in km
+
+    Returns:
+        DataFrame: Synthetic master GPS data with the same columns as master_gps.csv
+    """
+    rng = np.random.default_rng(seed)
+    real = gps_df[gps_df['CODE'].astype(str) != '0'].reset_index(drop=True)
+    parents = real.iloc[rng.integers(0, len(real), size=num_stores)].reset_index(drop=True)
+
+    # Offsets in km converted to degrees; a degree of longitude shrinks with latitude
+    offset_lat = rng.normal(0.0, jitter_km, size=num_stores) / 110.574
+    offset_lon = rng.normal(0.0, jitter_km, size=num_stores) / (111.320 * np.cos(np.radians(parents['LATITUDE'])))
+
+    codes = [f"SYN{i + 1:05d}" for i in range(num_stores)]
+    stores = pd.DataFrame({
+        'CODE': codes,
+        'LOCATION': [f"{location} #{i + 1}" for i, location in enumerate(parents['LOCATION'])],
+        'ADDRESS': parents['ADDRESS'].to_numpy(),
+        'LATITUDE': (parents['LATITUDE'] + offset_lat).round(7),
+        'LONGITUDE': (parents['LONGITUDE'] + offset_lon).round(7),
+        'BRAND': parents['BRAND'].to_numpy()
+    })
+    if 'DISTRICT' in parents.columns:
+        stores['DISTRICT'] = parents['DISTRICT'].to_numpy()
+    return stores
+
+
+def write_matrix_csv(path, codes, lat, lon, road_factor, circuity, scale=1.0):
+    """
+    Write a road-factor-adjusted haversine matrix in the master matrix CSV layout.
+
+    The matrix is computed and written in blocks of rows, so instances with
+    thousands of stores never hold the full matrix in memory. The detour
+    factor of a pair is the mean of the two stores' factors, which keeps the
+    matrix symmetric.
+
+    Args:
+        path: Output CSV path
+        codes: Node codes, depot first
+        lat: Node latitudes
+        lon: Node longitudes
+        road_factor: Median ratio of road to straight-line distance
+        circuity: Per-node detour factor around 1.0
+        scale: Multiplier applied to the distances (e.g. minutes per km for durations)
+    """
+    row_format = '%s,' + ','.join(['%g'] * len(codes)) + '\n'
+    with open(path, 'w', newline='') as f:
+        f.write(',' + ','.join(codes) + '\n')
+        for start in range(0, len(codes), MATRIX_BLOCK_ROWS):
+            stop = min(start + MATRIX_BLOCK_ROWS, len(codes))
+            straight = haversine_km(lat[start:stop, None], lon[start:stop, None], lat[None, :], lon[None, :])
+            factor = road_factor * (circuity[start:stop, None] + circuity[None, :]) / 2
+            block = np.round(straight * factor * scale, 2)
+            f.writelines(row_format % (codes[start + offset], *row)
+                         for offset, row in enumerate(block.tolist()))
+
+
+def generate_orders(stores, num_orders, start_date, days=1, seed=0):
+    """
+    Sample a PO file from the synthetic stores.
+
+    Args:
+        stores: Synthetic master GPS data
+        num_orders: Number of stores with an order
+        start_date: datetime of the first PO date
+        days: Number of consecutive PO dates to spread the orders over
+        seed: Random seed
+
+    Returns:
+        DataFrame: PO data with the same columns as the bundled PO files and
+            month-first dates
+    """
+    rng = np.random.default_rng(seed + 1)
+    picked = stores.iloc[rng.choice(len(stores), size=min(num_orders, len(stores)), replace=False)]
+    dates = [start_date + timedelta(days=int(offset)) for offset in rng.integers(0, max(days, 1), size=len(picked))]
+
+    orders = picked.reindex(columns=PO_COLUMNS).copy()
+    orders['DATE'] = [f"{date.month}/{date.day}/{date.year}" for date in dates]
+    return orders.reset_index(drop=True)
+
+
+def write_instance(output_dir, num_stores, num_orders=None, seed=0, gps_path='data/master/master_gps.csv',
+                   distance_path='data/master/osrm_distance_matrix.csv',
+                   duration_path='data/master/osrm_duration_matrix.csv',
+                   jitter_km=DEFAULT_JITTER_KM, circuity_sigma=DEFAULT_CIRCUITY_SIGMA,
+                   order_days=1, start_date=None):
+    """
+    Generate a complete synthetic instance and write it to a folder.
+
+    The road factor and driving pace are fitted on the real master data, so
+    synthetic distances and durations have the same scale as the OSRM ones.
+
+    Args:
+        output_dir: Folder to write the instance to
+        num_stores: Number of synthetic stores
+        num_orders: Number of stores with an order (default: 10% of the stores)
+        seed: Random seed
+        gps_path: Real master GPS data to sample around
+        distance_path: Real distance matrix used to fit the road factor
+        duration_path: Real duration matrix used to fit the driving pace
+        jitter_km: Standard deviation of the offset from the real stores, in km
+        circuity_sigma: Spread of the per-store detour factor
+        order_days: Number of consecutive PO dates
+        start_date: datetime of the first PO date (default: DEFAULT_ORDER_DATE)
+
+    Returns:
+        dict: Paths of the generated files (gps_path, distance_path,
+            duration_path, orders_path) and the instance parameters
+    """
+    real_gps = pd.read_csv(gps_path)
+    real_distance = pd.read_csv(distance_path, index_col=0)
+    real_duration = pd.read_csv(duration_path, index_col=0) if duration_path else None
+    real_distance.index = real_distance.index.astype(str)
+    if real_duration is not None:
+        real_duration.index = real_duration.index.astype(str)
+    road_factor, minutes_per_km = fit_road_factor(real_gps, real_distance, real_duration)
+    minutes_per_km = minutes_per_km or 1.0
+
+    stores = generate_stores(real_gps, num_stores, seed=seed, jitter_km=jitter_km)
+    rng = np.random.default_rng(seed + 2)
+    circuity = rng.lognormal(0.0, circuity_sigma, size=num_stores + 1)
+    circuity[0] = 1.0
+
+    codes = ['0'] + stores['CODE'].tolist()
+    lat = np.concatenate([[DEPOT_COORDS[0]], stores['LATITUDE'].to_numpy()])
+    lon = np.concatenate([[DEPOT_COORDS[1]], stores['LONGITUDE'].to_numpy()])
+
+    os.makedirs(os.path.join(output_dir, 'orders'), exist_ok=True)
+    paths = {
+        'gps_path': os.path.join(output_dir, 'master_gps.csv'),
+        'distance_path': os.path.join(output_dir, 'osrm_distance_matrix.csv'),
+        'duration_path': os.path.join(output_dir, 'osrm_duration_matrix.csv'),
+        'orders_path': os.path.join(output_dir, 'orders', 'synthetic-PO.csv')
+    }
+    stores.to_csv(paths['gps_path'], index=False)
+    write_matrix_csv(paths['distance_path'], codes, lat, lon, road_factor, circuity)
+    write_matrix_csv(paths['duration_path'], codes, lat, lon, road_factor, circuity, scale=minutes_per_km)
+
+    if num_orders is None:
+        num_orders = max(num_stores // 10, 1)
+    orders = generate_orders(stores, num_orders, start_date or DEFAULT_ORDER_DATE, days=order_days, seed=seed)
+    orders.to_csv(paths['orders_path'], index=False)
+
+    instance = dict(paths, num_stores=num_stores, num_orders=len(orders), seed=seed,
+                    road_factor=round(road_factor, 4), minutes_per_km=round(minutes_per_km, 4),
+                    jitter_km=jitter_km)
+    with open(os.path.join(output_dir, 'instance.json'), 'w') as f:
+        json.dump(instance, f, indent=2)
+
+    logger.info("Generated %d stores and %d orders in %s (road factor %.3f, %.2f min/km)",
+                num_stores, len(orders), output_dir, road_factor, minutes_per_km)
+    return instance
+
+
+if __name__ == '__main__':
+    import argparse
+    from vehi_rout.core.log_config import configure_logging
+
+    parser = argparse.ArgumentParser(description='Generate synthetic Vehicle Routing instances')
+    parser.add_argument('--stores', type=int, nargs='+', required=True,
+                        help='Number of stores; one instance is generated per value')
+    parser.add_argument('--orders', type=int, default=None,
+                        help='Number of stores with an order (default: 10%% of the stores)')
+    parser.add_argument('--order-days', type=int, default=1,
+                        help='Number of consecutive PO dates')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed')
+    parser.add_argument('--output', type=str, default='data/synthetic',
+                        help='Folder to write the instances to (one sub-folder per size)')
+    args = parser.parse_args()
+
+    configure_logging()
+    for num_stores in args.stores:
+        instance = write_instance(os.path.join(args.output, f'stores_{num_stores}'), num_stores,
+                                  num_orders=args.orders, seed=args.seed, order_days=args.order_days)
+        print(f"{num_stores} stores, {instance['num_orders']} orders: {os.path.dirname(instance['gps_path'])} "
+              f"(road factor {instance['road_factor']}, {instance['minutes_per_km']} min/km)")
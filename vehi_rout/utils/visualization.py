@@ -1,6 +1,8 @@
 """
 Visualization module for the Vehicle Routing Problem.
 Provides functions to visualize routes on a map.
+folium and the route cache are loaded on the first map, so importing this
+module for the text and CSV reports stays fast.
 """
 
 import pandas as pd
@@ -8,11 +10,17 @@ import csv
 import os
 import random
 import ast
+import time
+import logging
+import threading
 from collections import defaultdict
 from functools import reduce
 from vehi_rout.utils.helper_utils import get_osrm_data
-import folium
-import folium.plugins
+from vehi_rout.utils.route_utils import METRIC_UNITS, route_metric_names, format_arrival_times
+from vehi_rout.config import ROUTE_START_TIME
+from vehi_rout.core.metrics import timed, record_stage, record_cache
+
+logger = logging.getLogger(__name__)
 
 # Global cache to store route paths (key: tuple of (origin_code, dest_code), value: path_coordinates)
 route_cache = defaultdict(list)
@@ -20,24 +28,66 @@ route_cache = defaultdict(list)
 # Cache file path for CSV
 cache_file = '../data/csv/route_cache.csv'
 
-# Load existing cache from CSV file at the start
-if os.path.exists(cache_file):
+# Whether route_cache has been filled from cache_file yet
+_cache_loaded = False
+_cache_lock = threading.Lock()
+
+
+def load_route_cache():
+    """
+    Fill route_cache from cache_file, once per process.
+
+    Returns:
+        defaultdict: The route cache
+    """
+    global _cache_loaded
+    with _cache_lock:
+        if _cache_loaded:
+            return route_cache
+        _cache_loaded = True
+        if not os.path.exists(cache_file):
+            logger.info("No cache file found at %s, starting fresh", cache_file)
+            return route_cache
+        try:
+            df = pd.read_csv(cache_file, dtype=str)  # store codes are matched as strings
+            for origin_code, dest_code, path_str in zip(df['origin_code'], df['dest_code'], df['path_coordinates']):
+                # Reconstruct the path from the string (using ast.literal_eval for safety)
+                try:
+                    path_coords = ast.literal_eval(path_str)
+                    route_cache[tuple(sorted([origin_code, dest_code]))] = path_coords
+                except (ValueError, SyntaxError) as e:
+                    logger.warning("Could not parse path coordinates for %s to %s: %s", origin_code, dest_code, e)
+            logger.info("Loaded %d cached routes from %s", len(route_cache), cache_file)
+        except Exception as e:
+            logger.warning("Failed to load cache file %s: %s", cache_file, e)
+    return route_cache
+
+
+def save_route_cache():
+    """
+    Write route_cache to cache_file.
+
+    The cache is copied and written under the cache lock, and the file is
+    written to a temporary path and moved into place, so solves running in
+    parallel threads never leave a partly written file.
+    """
     try:
-        df = pd.read_csv(cache_file)
-        for _, row in df.iterrows():
-            origin_code, dest_code = row['origin_code'], row['dest_code']
-            # Reconstruct the path from the string (using ast.literal_eval for safety)
-            path_str = row['path_coordinates']
-            try:
-                path_coords = ast.literal_eval(path_str)
-                route_cache[tuple(sorted([origin_code, dest_code]))] = path_coords
-            except (ValueError, SyntaxError) as e:
-                print(f"Warning: Could not parse path coordinates for {origin_code} to {dest_code}: {e}")
-        print(f"Loaded {len(route_cache)} cached routes from {cache_file}")
+        with _cache_lock:
+            # Convert cache to list of rows for CSV
+            cache_rows = [
+                {'origin_code': origin_code, 'dest_code': dest_code, 'path_coordinates': str(value)}
+                for (origin_code, dest_code), value in route_cache.items()
+            ]
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            temp_file = f"{cache_file}.tmp"
+            with open(temp_file, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=['origin_code', 'dest_code', 'path_coordinates'])
+                writer.writeheader()
+                writer.writerows(cache_rows)
+            os.replace(temp_file, cache_file)
+        logger.debug("Saved %d cached routes to %s", len(cache_rows), cache_file)
     except Exception as e:
-        print(f"Warning: Failed to load cache file {cache_file}: {e}")
-else:
-    print(f"No cache file found at {cache_file}, starting fresh")
+        logger.warning("Failed to save cache file %s: %s", cache_file, e)
 
 
 def generate_random_color():
@@ -47,33 +97,45 @@ def generate_random_color():
     b = random.randint(0, 255)
     return f'#{r:02x}{g:02x}{b:02x}'
 
-def visualize_routes_per_vehicle(master_df, route_dict, day, use_distance=False):
+def visualize_routes_per_vehicle(master_df, route_dict, day, use_distance=False, output_dir=None):
     """
     Visualize the route for each vehicle on a separate map using folium, with cached route paths.
     :param master_df: DataFrame containing master GPS data (CODE, LATITUDE, LONGITUDE, etc.)
     :param route_dict: Dictionary containing route details for each vehicle
     :param day: Day number for the map title
     :param use_distance: Boolean indicating whether to use distance or time for route metrics
+    :param output_dir: Output root; when given, each map is saved to <output_dir>/maps as it is built
     :return: Dictionary of folium.Map objects keyed by vehicle_id
     """
     if not isinstance(route_dict, dict) or not route_dict:
-        print("Error: route_dict is not a valid dictionary or is empty")
+        logger.error("route_dict is not a valid dictionary or is empty")
         return {}
 
+    import folium
+    import folium.plugins
+    load_route_cache()
+
     maps_dict = {}  # Dictionary to store individual maps for each vehicle
 
+    if output_dir is not None:
+        os.makedirs(os.path.join(output_dir, "maps"), exist_ok=True)
+
     # Create a mapping from CODE to coordinates for quick lookup
     try:
         code_to_coords = dict(zip(master_df['CODE'], master_df[['LATITUDE', 'LONGITUDE']].values))
     except Exception as e:
-        print(f"Error creating code_to_coords mapping: {e}")
+        logger.error("Error creating code_to_coords mapping: %s", e)
         return {}
 
+    # Per-arc messages are only logged when debug output is enabled
+    debug = logger.isEnabledFor(logging.DEBUG)
+
     for vehicle_id, route_info in route_dict.items():
         route_nodes = route_info.get('route_nodes', [])
         path_coordinates = []
 
-        print(f"Processing route for vehicle {vehicle_id}: {route_nodes}")  # Debug: Print route nodes
+        if debug:
+            logger.debug("Processing route for vehicle %s: %s", vehicle_id, route_nodes)
 
         # Get the path between consecutive nodes using cached data or OSRM
         for i in range(len(route_nodes) - 1):
@@ -82,41 +144,52 @@ def visualize_routes_per_vehicle(master_df, route_dict, day, use_distance=False)
 
             # Check if path is in cache
             cache_key = tuple(sorted([origin_code, dest_code]))  # Use sorted tuple for bidirectional caching
-            if cache_key in route_cache and route_cache[cache_key]:
+            cache_hit = cache_key in route_cache and bool(route_cache[cache_key])
+            record_cache('route_geometry', cache_hit)
+            if cache_hit:
                 path_cords = route_cache[cache_key]
-                print(f"Using cached path for {origin_code} to {dest_code}")
+                if debug:
+                    logger.debug("Using cached path for %s to %s", origin_code, dest_code)
             else:
                 # Find coordinates for origin and destination
                 if origin_code not in code_to_coords or dest_code not in code_to_coords:
-                    print(f"Warning: Node {origin_code} or {dest_code} not found in master_df for vehicle {vehicle_id}")
+                    logger.warning("Node %s or %s not found in master_df for vehicle %s",
+                                   origin_code, dest_code, vehicle_id)
                     continue
 
                 origin = (code_to_coords[origin_code][0], code_to_coords[origin_code][1])
                 destination = (code_to_coords[dest_code][0], code_to_coords[dest_code][1])
 
-                print(f"Fetching path from {origin_code} ({origin}) to {dest_code} ({destination})")
-                path_cords, _, _ = get_osrm_data(origin, destination)
+                if debug:
+                    logger.debug("Fetching path from %s %s to %s %s", origin_code, origin, dest_code, destination)
+                with timed('geometry_fetch'):
+                    path_cords, _, _ = get_osrm_data(origin, destination)
                 if path_cords:
-                    route_cache[cache_key] = path_cords  # Store the path in cache
-                    print(f"Path cached for {origin_code} to {dest_code}: {path_cords[:5]}... (total {len(path_cords)} points)")
+                    with _cache_lock:
+                        route_cache[cache_key] = path_cords  # Store the path in cache
+                    if debug:
+                        logger.debug("Path cached for %s to %s (%d points)", origin_code, dest_code, len(path_cords))
                 else:
-                    print(f"Warning: No path found between {origin_code} and {dest_code} for vehicle {vehicle_id}")
+                    logger.warning("No path found between %s and %s for vehicle %s", origin_code, dest_code, vehicle_id)
                     continue
 
             # 🔥 Check if path has enough points
             if path_cords and len(path_cords) > 2:
                 path_coordinates.extend(path_cords)
-                print(f"Added path from {origin_code} to {dest_code} with {len(path_cords)} points")
-            else:
-                print(f"Skipping path from {origin_code} to {dest_code} — insufficient points ({len(path_cords)} points)")
+                if debug:
+                    logger.debug("Added path from %s to %s with %d points", origin_code, dest_code, len(path_cords))
+            elif debug:
+                logger.debug("Skipping path from %s to %s, insufficient points (%d points)",
+                             origin_code, dest_code, len(path_cords))
 
         # Create a new map centered at the first location of the route
+        render_started = time.perf_counter()
         if route_nodes and route_nodes[0] in code_to_coords:
             start_coords = [code_to_coords[route_nodes[0]][0], code_to_coords[route_nodes[0]][1]]
             m = folium.Map(location=start_coords, zoom_start=10)
         else:
             m = folium.Map(location=[master_df['LATITUDE'].mean(), master_df['LONGITUDE'].mean()], zoom_start=10)
-            print(f"Warning: No valid start coordinates for vehicle {vehicle_id}, using map center")
+            logger.warning("No valid start coordinates for vehicle %s, using map center", vehicle_id)
 
         # Add markers for each node in the route with sequence numbers
         for i, node in enumerate(route_nodes):
@@ -176,9 +249,10 @@ def visualize_routes_per_vehicle(master_df, route_dict, day, use_distance=False)
                 pulse_color='#FFFFFF'
             ).add_to(m)
 
-            print(f"Plotted path for vehicle {vehicle_id} with {len(path_coordinates)} coordinates")
+            if debug:
+                logger.debug("Plotted path for vehicle %s with %d coordinates", vehicle_id, len(path_coordinates))
         else:
-            print(f"No path coordinates available for vehicle {vehicle_id}. Route not plotted.")
+            logger.info("No path coordinates available for vehicle %s, route not plotted", vehicle_id)
 
         # Add title
         title_html = f'<h3 align="center" style="font-size:16px">Day {day + 1} - Vehicle {vehicle_id} Route</h3>'
@@ -186,136 +260,139 @@ def visualize_routes_per_vehicle(master_df, route_dict, day, use_distance=False)
 
         # Save the map and store in dictionary
         map_filename = f"day_{day + 1}_vehicle_{vehicle_id}_route.html"
+        if output_dir is not None:
+            m.save(os.path.join(output_dir, "maps", map_filename))
         maps_dict[vehicle_id] = m
+        record_stage('map_render', time.perf_counter() - render_started)
 
-    # Save the updated cache to CSV
-    try:
-        # Convert cache to list of rows for CSV
-        cache_rows = []
-        for key, value in route_cache.items():
-            origin_code, dest_code = key
-            # Convert path coordinates to a string (e.g., JSON string for simplicity)
-            path_str = str(value)  # Simple string representation; for safety, use json.dumps(value)
-            cache_rows.append({'origin_code': origin_code, 'dest_code': dest_code, 'path_coordinates': path_str})
-
-        # Save to CSV
-        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
-        with open(cache_file, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=['origin_code', 'dest_code', 'path_coordinates'])
-            writer.writeheader()
-            writer.writerows(cache_rows)
-        print(f"Saved {len(route_cache)} cached routes to {cache_file}")
-    except Exception as e:
-        print(f"Warning: Failed to save cache file {cache_file}: {e}")
+    save_route_cache()
 
     return maps_dict
 
 
+@timed('report')
 def print_route_summary(route_dict, use_distance=False, file_path=None):
     """
     Print a summary of the routes and optionally save to a file.
 
+    Routes solved with both a distance and a duration matrix get a column per metric.
+
     Args:
         route_dict: Dictionary containing route information for each vehicle
         use_distance: Boolean indicating whether to use distance or time
         file_path: Path to save the summary to (optional)
 
     Returns:
-        tuple: (total_metric, total_visits)
+        tuple: (total_metric, total_visits) with the total of the minimised metric
     """
-    metric_name = "distance" if use_distance else "time"
-    unit = "km" if use_distance else "mins"
+    metric_names = route_metric_names(route_dict, use_distance)
 
-    total_metric = 0
+    totals = dict.fromkeys(metric_names, 0)
     total_visits = 0
 
     # Create summary lines
+    header = f"{'':<3} {'Vehicle':<10} {'Stops':<10} "
+    header += ''.join(f"{metric_name.capitalize():<15} " for metric_name in metric_names)
     summary_lines = []
     summary_lines.append(f"Route Summary:")
-    summary_lines.append(f"{'':<3} {'Vehicle':<10} {'Stops':<10} {metric_name.capitalize():<15} {'Within Limit':<15}")
-    summary_lines.append("-" * 55)
+    summary_lines.append(header + f"{'Within Limit':<15}")
+    summary_lines.append("-" * (40 + 15 * len(metric_names)))
 
     for vehicle_id, route_info in route_dict.items():
-        route_metric = route_info.get(f"route_{metric_name}", 0)
         num_visits = route_info.get("num_visits", 0)
-        max_metric = route_info.get(f"max_{metric_name}_limit", 0)
         within_limit = route_info.get("within_limit", False)
 
-        summary_lines.append(f"{'':<3} {vehicle_id:<10} {num_visits:<10} {route_metric:<10} {unit:<4} {'Yes' if within_limit else 'No':<15}")
+        line = f"{'':<3} {vehicle_id:<10} {num_visits:<10} "
+        for metric_name in metric_names:
+            route_metric = route_info.get(f"route_{metric_name}", 0)
+            line += f"{route_metric:<10} {METRIC_UNITS[metric_name]:<4} "
+            totals[metric_name] += route_metric
+        summary_lines.append(line + f"{'Yes' if within_limit else 'No':<15}")
 
-        total_metric += route_metric
         total_visits += num_visits
 
-    summary_lines.append("-" * 55)
-    summary_lines.append(f"{'':<3} {'Total':<10} {total_visits:<10} {total_metric:<10} {unit:<4}")
+    summary_lines.append("-" * (40 + 15 * len(metric_names)))
+    totals = {metric_name: round(total, 2) for metric_name, total in totals.items()}
+    summary_lines.append(f"{'':<3} {'Total':<10} {total_visits:<10} " + ''.join(
+        f"{total:<10} {METRIC_UNITS[metric_name]:<4} " for metric_name, total in totals.items()).rstrip())
 
-    # Print summary
-    for line in summary_lines:
-        print(line)
+    # Log the summary as a single record
+    logger.info("\n".join(summary_lines))
 
     # Save to file if path is provided
     if file_path:
         with open(file_path, 'w') as f:
             for line in summary_lines:
                 f.write(line + '\n')
-            print(f"Summary saved to {file_path}")
+        logger.info("Summary saved to %s", file_path)
 
-    return total_metric, total_visits
+    return totals[metric_names[0]], total_visits
 
 
-def save_route_details_to_csv(demand_df, route_dict, day, use_distance=False, file_path=None):
+@timed('report')
+def save_route_details_to_csv(demand_df, route_dict, day, use_distance=False, file_path=None, output_dir="output"):
     """
     Save detailed route information to a CSV file.
 
+    Routes solved with both a distance and a duration matrix get columns for both metrics.
+    Routes with a time matrix also get the clock time of arrival at every stop.
+
     Args:
+        demand_df: DataFrame containing the PO demand data
         route_dict: Dictionary containing route information for each vehicle
         day: Day index (0-based)
         use_distance: Boolean indicating whether to use distance or time
         file_path: Path to save the CSV file (optional)
+        output_dir: Output root used to build the default path when file_path is not given
 
     Returns:
         str: Path to the saved file or None if not saved
     """
-    import csv
-    import os
-
     if file_path is None:
-        os.makedirs("output/csv", exist_ok=True)
-        file_path = f"output/csv/day_{day+1}_routes.csv"
+        os.makedirs(os.path.join(output_dir, "csv"), exist_ok=True)
+        file_path = os.path.join(output_dir, "csv", f"day_{day+1}_routes.csv")
 
-    metric_name = "distance" if use_distance else "time"
-    unit = "km" if use_distance else "mins"
+    metric_names = route_metric_names(route_dict, use_distance)
 
     with open(file_path, 'w', newline='') as csvfile:
-        fieldnames = ['Day', 'Vehicle', 'Stops', f'{metric_name.capitalize()} ({unit})',
-                     f'Max {metric_name.capitalize()} ({unit})', 'Within Limit','PO Value', 'Route']
+        fieldnames = ['Day', 'Vehicle', 'Stops']
+        for metric_name in metric_names:
+            unit = METRIC_UNITS[metric_name]
+            fieldnames += [f'{metric_name.capitalize()} ({unit})', f'Max {metric_name.capitalize()} ({unit})']
+        fieldnames += ['Within Limit', 'PO Value', 'Route']
+        has_arrivals = any("arrival_times" in info for info in route_dict.values())
+        if has_arrivals:
+            fieldnames.append('Arrival Times')
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
 
         writer.writeheader()
 
         for vehicle_id, route_info in route_dict.items():
-            route_metric = route_info.get(f"route_{metric_name}", 0)
             num_visits = route_info.get("num_visits", 0)
-            max_metric = route_info.get(f"max_{metric_name}_limit", 0)
             within_limit = route_info.get("within_limit", False)
             route_nodes = route_info.get("route_nodes", [])
-            po_value = demand_df[demand_df['CODE'].isin(route_nodes)]['SALE'].sum()
+            po_value = demand_df[demand_df['CODE'].isin(route_nodes)]['SALE'].sum() if 'SALE' in demand_df.columns else 0
             route_str = ' -> '.join(
                         f"{code} ({demand_df.loc[demand_df['CODE'] == code, 'LOCATION'].values[0]})"
-                        if code in demand_df['CODE'].values else str(code)
+                        if 'LOCATION' in demand_df.columns and code in demand_df['CODE'].values else str(code)
                         for code in route_nodes
                     )
 
-            writer.writerow({
+            row = {
                 'Day': day + 1,
                 'Vehicle': vehicle_id,
                 'Stops': num_visits,
-                f'{metric_name.capitalize()} ({unit})': route_metric,
-                f'Max {metric_name.capitalize()} ({unit})': max_metric,
                 'Within Limit': 'Yes' if within_limit else 'No',
                 'PO Value':po_value,
                 'Route': route_str
-            })
-
-    print(f"Route details saved to {file_path}")
+            }
+            for metric_name in metric_names:
+                unit = METRIC_UNITS[metric_name]
+                row[f'{metric_name.capitalize()} ({unit})'] = route_info.get(f"route_{metric_name}", 0)
+                row[f'Max {metric_name.capitalize()} ({unit})'] = route_info.get(f"max_{metric_name}_limit", 0)
+            if has_arrivals:
+                row['Arrival Times'] = format_arrival_times(route_info.get("arrival_times", []), ROUTE_START_TIME)
+            writer.writerow(row)
+
+    logger.info("Route details saved to %s", file_path)
     return file_path
\ No newline at end of file